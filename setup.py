@@ -10,6 +10,7 @@ setup(
     packages=['snake'],
     python_requires='>=3.6',
     install_requires=[
+        'numpy',
         'numpydoc',
     ]
 )
@@ -6,6 +6,7 @@ Runs a game of snake.
 import argparse
 from game import SnakeGame
 from game_io import GameIO
+from leaderboard import Leaderboard
 
 
 def get_args():
@@ -50,6 +51,37 @@ def get_args():
         help='The path to a file which stores player high scores.',
         default='scores'
     )
+    parser.add_argument(
+        '--leaderboard_files',
+        nargs='+',
+        help=(
+            'The paths to score files whose scores are merged into '
+            'the high scores, in addition to the score file.'
+        ),
+        default=[]
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['curses', 'ansi'],
+        help=(
+            'How the game is drawn. "ansi" writes each frame to the '
+            'terminal at once, which can reduce flicker over SSH.'
+        ),
+        default='curses'
+    )
+    parser.add_argument(
+        '--minimap',
+        action='store_true',
+        help='Show a downsampled map of the entire board.'
+    )
+    parser.add_argument(
+        '--trace_latency',
+        action='store_true',
+        help=(
+            'Trace the latency between key presses and the screen, '
+            'and print a report when the game ends.'
+        )
+    )
 
     return parser.parse_args()
 
@@ -68,11 +100,21 @@ def main():
         random_seed=args.random_seed
     )
 
+    leaderboard = None
+    if args.leaderboard_files:
+        leaderboard = Leaderboard(
+            paths=[args.score_file, *args.leaderboard_files],
+        )
+
     GameIO(
         game=game,
         speed=args.speed,
         player_name=args.player_name,
-        score_file=args.score_file
+        score_file=args.score_file,
+        minimap=args.minimap,
+        trace_latency=args.trace_latency,
+        leaderboard=leaderboard,
+        backend=args.backend
     )
 
 
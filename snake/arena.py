@@ -0,0 +1,631 @@
+"""
+Holds the multi-snake arena.
+
+:class:`Arena` is like :class:`.SnakeGame`, except that many snakes
+move on the same board at the same time.
+
+"""
+
+import random
+from collections import deque
+
+from .game import (
+    _Snake,
+    _VELOCITIES,
+    _ACTION_VELOCITIES,
+    _get_board,
+    _get_blocked_cells,
+    CounterRandom,
+)
+
+
+class _ArenaSnake(_Snake):
+    """
+    Represents a snake in the :class:`Arena`.
+
+    Collisions are found by the :class:`Arena` with its occupancy
+    index, so unlike :class:`.game._Snake`, the snake does not count
+    the segments on every cell of the board, which would cost memory
+    proportional to the size of the board for every snake. Therefore
+    :meth:`occupies`, :meth:`get_counts`, :meth:`hit`, :meth:`bite`
+    and :meth:`is_escaped` must not be used.
+
+    """
+
+    __slots__ = ()
+
+    def set_body(self, body):
+        """
+        Replace the body of the snake.
+
+        Parameters
+        ----------
+        body : :class:`iterable` of :class:`int`
+            The cells of the segments of the snake, from the tail to
+            the head.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._body = deque()
+        self._counts = None
+        self._num_cells = 0
+        self._hit = False
+        self._escaped = False
+        for cell in body:
+            self._add_head(cell)
+
+    def reset(self, walls, body, velocity):
+        """
+        Replace the body, velocity and walls of the snake.
+
+        Parameters
+        ----------
+        walls : :class:`bytes`
+            Holds ``1`` for every cell of the board which holds a
+            wall and ``0`` otherwise.
+
+        body : :class:`iterable` of :class:`int`
+            The cells of the segments of the snake, from the tail to
+            the head.
+
+        velocity : :class:`tuple`
+            The velocity of the snake.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._body.clear()
+        self._walls = walls
+        self._velocity_queue.clear()
+        self._steered = False
+        self._set_velocity(velocity)
+        for cell in body:
+            self._add_head(cell)
+
+    def _add_head(self, cell):
+        """
+        Add a new head to the snake.
+
+        Parameters
+        ----------
+        cell : :class:`int`
+            The cell of the new head.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._body.append(self._board.cells[cell])
+
+    def _remove_tail(self):
+        """
+        Remove the last segment of the snake.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._body.popleft()
+
+
+class Arena:
+    """
+    Represents a game of snake with many snakes.
+
+    All snakes move simultaneously, once per call to :meth:`step`.
+    Each snake follows the same rules as the snake in
+    :class:`.SnakeGame`, and in addition a snake dies if its head
+    moves onto any segment of another snake. If two heads move onto
+    the same position, both snakes die. Dead snakes are removed from
+    the board. The apples are shared by all snakes, and a snake grows
+    by at most one segment per step, even if the segment it grows
+    onto also holds an apple, in which case that apple is removed.
+
+    Collisions are resolved with an occupancy index, which maps the
+    cell of every occupied position to the snake on it. Because each
+    step only adds heads and removes tails, the cost of a step depends
+    on the number of snakes, not on their lengths.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        arena = Arena(
+            board_size=(50, 50),
+            walls=(),
+            snakes=[((0, 0), 'right'), ((49, 49), 'left')],
+            random_seed=12,
+        )
+
+        while arena.get_num_alive() > 0:
+            # Snake 0 turns up, snake 1 keeps its direction.
+            arena.step(['up', None])
+
+    """
+
+    def __init__(
+        self,
+        board_size,
+        walls,
+        snakes,
+        random_seed,
+        num_apples=1,
+        counter_rng=False,
+    ):
+        """
+        Initialize an :class:`Arena`.
+
+        Parameters
+        ----------
+        board_size : :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        walls : :class:`iterable` of :class:`tuple`
+            An :class:`iterable` holding the position of every
+            wall segment.
+
+        snakes : :class:`iterable` of :class:`tuple`
+            Holds a :class:`tuple` of the form ``((2, 3), 'up')`` for
+            every snake, giving its starting position and direction.
+
+        random_seed : :class:`int`
+            The random seed used to generate apple locations.
+
+        num_apples : :class:`int`, optional
+            The number of apples on the board at any time.
+
+        counter_rng : :class:`bool`, optional
+            If ``True``, apple locations are generated with a
+            :class:`.CounterRandom`.
+
+        """
+
+        if counter_rng:
+            self._generator = CounterRandom(random_seed)
+        else:
+            self._generator = random.Random(random_seed)
+        self._board_size = board_size
+        self._board = board = _get_board(board_size)
+        self._walls = frozenset(walls)
+        self._blocked = _get_blocked_cells(board, self._walls)
+
+        # Maps every cell occupied by a snake to the index of that
+        # snake.
+        self._occupancy = {}
+        self._snakes = []
+        for index, (position, direction) in enumerate(snakes):
+            cell = board.get_cell(position)
+            if (
+                cell is None
+                or cell in self._occupancy
+                or self._blocked[cell]
+            ):
+                raise ValueError(
+                    f'Snake {index} cannot start at {position}.'
+                )
+            self._occupancy[cell] = index
+            self._snakes.append(
+                _ArenaSnake(
+                    board, self._blocked, cell, _VELOCITIES[direction]
+                )
+            )
+        self._alive = [True for snake in self._snakes]
+        self._num_alive = len(self._snakes)
+
+        self._num_apples = num_apples
+        self._apples = set()
+        self._add_apples()
+
+    def _get_new_apple(self):
+        """
+        Generate the position of a new apple.
+
+        Positions are drawn at random until a free one is found, so
+        the cost does not depend on the lengths of the snakes unless
+        the board is almost full.
+
+        Returns
+        -------
+        :class:`int`
+            The cell of a new apple, or ``None`` if there is no free
+            position on the board.
+
+        """
+
+        board_x, board_y = self._board_size
+        stride = self._board.stride
+        max_index = board_x*board_y - 1
+        for attempt in range(64):
+            x, y = divmod(self._generator.randint(0, max_index), board_y)
+            cell = (x+1)*stride + y+1
+            if self._is_free(cell):
+                return cell
+
+        # The board is almost full, so pick among the free cells
+        # directly.
+        free_cells = [
+            cell for cell in range(self._board.num_cells)
+            if self._is_free(cell)
+        ]
+        if not free_cells:
+            return None
+        return free_cells[self._generator.randint(0, len(free_cells)-1)]
+
+    def _add_apples(self):
+        """
+        Add apples until there are `num_apples` or the board is full.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        while len(self._apples) < self._num_apples:
+            apple = self._get_new_apple()
+            if apple is None:
+                break
+            self._apples.add(apple)
+
+    def _is_free(self, cell):
+        """
+        Check if a new apple can be placed on `cell`.
+
+        Parameters
+        ----------
+        cell : :class:`int`
+            A cell of the board.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if `cell` is on the board and holds no wall,
+            snake or apple and ``False`` otherwise.
+
+        """
+
+        return (
+            not self._blocked[cell]
+            and cell not in self._occupancy
+            and cell not in self._apples
+        )
+
+    def step(self, actions=None):
+        """
+        Make every living snake take a step.
+
+        Parameters
+        ----------
+        actions : :class:`list`, optional
+            Holds the action of every snake, including dead ones. An
+            action can be ``'up'``, ``'down'``, ``'right'`` or
+            ``'left'``, an :class:`int` which indexes into
+            :data:`.ACTIONS`, or ``None``, in which case the snake
+            follows its queued directions. If `actions` is ``None``,
+            every snake follows its queued directions.
+
+        Returns
+        -------
+        :class:`list` of :class:`int`
+            The indices of the snakes which died during the step.
+
+        """
+
+        occupancy = self._occupancy
+        apples = self._apples
+        blocked = self._blocked
+        velocities = _ACTION_VELOCITIES
+
+        # Move every living snake and collect the cells its head moved
+        # onto.
+        moves = []
+        for index, snake in enumerate(self._snakes):
+            if not self._alive[index]:
+                continue
+            if actions is not None and actions[index] is not None:
+                snake.steer(velocities[actions[index]])
+
+            tail = snake.get_tail()
+            old_head = snake.get_head()
+            snake.take_step()
+            del occupancy[tail]
+            head = snake.get_head()
+            new_cells = [head]
+            if head in apples:
+                snake.eat(head)
+                new_cells.append(snake.get_head())
+            moves.append((index, old_head, new_cells))
+
+        # Count how many heads moved onto each cell, so that head-on
+        # collisions can be found.
+        claims = {}
+        # Maps the old head of every snake to its new head, so that
+        # snakes which swap places can be found.
+        head_moves = {}
+        for index, old_head, new_cells in moves:
+            head_moves[old_head] = new_cells[0]
+            for cell in new_cells:
+                claims[cell] = claims.get(cell, 0) + 1
+
+        dead = []
+        for index, old_head, new_cells in moves:
+            if (
+                head_moves.get(new_cells[0]) == old_head
+                and new_cells[0] != old_head
+            ) or any(
+                cell in occupancy
+                or claims[cell] > 1
+                or blocked[cell]
+                for cell in new_cells
+            ):
+                dead.append(index)
+
+        # Only update the occupancy index once every collision is
+        # known, so that all snakes move simultaneously.
+        # A snake which eats an apple also covers the cell in front of
+        # it. An apple on that cell is removed too, without making the
+        # snake grow a second time.
+        for index, old_head, new_cells in moves:
+            apples.difference_update(new_cells)
+        for index in dead:
+            self._alive[index] = False
+            self._num_alive -= 1
+            for cell in self._snakes[index].get_body():
+                if occupancy.get(cell) == index:
+                    del occupancy[cell]
+        for index, old_head, new_cells in moves:
+            if self._alive[index]:
+                for cell in new_cells:
+                    occupancy[cell] = index
+
+        self._add_apples()
+        return dead
+
+    def get_state(self):
+        """
+        Return a snapshot of the state of the arena.
+
+        Snapshots are kept in memory, rather than encoded like the
+        checkpoints of :meth:`.SnakeGame.to_bytes`, so that taking
+        and restoring them is fast enough to do every step, for
+        example to roll back a networked game.
+
+        Returns
+        -------
+        :class:`tuple`
+            The snapshot, which can be passed to :meth:`set_state`.
+            It must not be modified.
+
+        """
+
+        return (
+            self._generator.getstate(),
+            tuple(
+                (
+                    tuple(snake.get_body()),
+                    snake.get_velocity(),
+                    tuple(
+                        snake.get_velocity(step)
+                        for step in range(
+                            1, snake.get_num_queued_velocities()+1
+                        )
+                    ),
+                )
+                for snake in self._snakes
+            ),
+            tuple(self._alive),
+            frozenset(self._apples),
+            self._occupancy.copy(),
+        )
+
+    def set_state(self, state):
+        """
+        Restore a snapshot taken by :meth:`get_state`.
+
+        The cost depends on the lengths of the snakes, not on the
+        size of the board.
+
+        Parameters
+        ----------
+        state : :class:`tuple`
+            A snapshot of this arena, or of an arena created with the
+            same arguments.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        generator_state, snakes, alive, apples, occupancy = state
+        self._generator.setstate(generator_state)
+        for snake, (body, velocity, queue) in zip(self._snakes, snakes):
+            snake.reset(self._blocked, body, velocity)
+            for queued in queue:
+                snake.queue_velocity(queued)
+        self._alive = list(alive)
+        self._num_alive = sum(alive)
+        self._apples = set(apples)
+        self._occupancy = occupancy.copy()
+
+    def queue_snake_movement_direction(self, snake, direction):
+        """
+        Queue a movement direction for a snake.
+
+        Parameters
+        ----------
+        snake : :class:`int`
+            The index of the snake.
+
+        direction : :class:`str`
+            Can be ``'up'``, ``'down'``, ``'right'`` or ``'left'``.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if a movement direction was successfully queued
+            and ``False`` otherwise.
+
+        """
+
+        snake = self._snakes[snake]
+        if snake.get_num_queued_velocities() < 5:
+            snake.queue_velocity(_VELOCITIES[direction])
+            return True
+
+        return False
+
+    def get_num_snakes(self):
+        """
+        Return the number of snakes, including dead ones.
+
+        Returns
+        -------
+        :class:`int`
+            The number of snakes.
+
+        """
+
+        return len(self._snakes)
+
+    def get_num_alive(self):
+        """
+        Return the number of living snakes.
+
+        Returns
+        -------
+        :class:`int`
+            The number of living snakes.
+
+        """
+
+        return self._num_alive
+
+    def is_alive(self, snake):
+        """
+        Check if a snake is alive.
+
+        Parameters
+        ----------
+        snake : :class:`int`
+            The index of the snake.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake is alive and ``False`` otherwise.
+
+        """
+
+        return self._alive[snake]
+
+    def get_snake(self, snake):
+        """
+        Yield the positions occupied by a snake.
+
+        Parameters
+        ----------
+        snake : :class:`int`
+            The index of the snake.
+
+        Yields
+        ------
+        :class:`tuple`
+            The position of a segment of the snake's body.
+
+        """
+
+        yield from map(
+            self._board.positions.__getitem__,
+            self._snakes[snake].get_body(),
+        )
+
+    def get_snake_length(self, snake):
+        """
+        Return the length of a snake.
+
+        Parameters
+        ----------
+        snake : :class:`int`
+            The index of the snake.
+
+        Returns
+        -------
+        :class:`int`
+            The length of the snake.
+
+        """
+
+        return self._snakes[snake].get_length()
+
+    def get_occupant(self, position):
+        """
+        Return the index of the snake at `position`.
+
+        Parameters
+        ----------
+        position : :class:`tuple`
+            A :class:`tuple` of the form ``(21, 12)``.
+
+        Returns
+        -------
+        :class:`int`
+            The index of the living snake at `position`, or ``None``
+            if there is no living snake there.
+
+        """
+
+        return self._occupancy.get(self._board.get_cell(position))
+
+    def get_apples(self):
+        """
+        Yield the coordinates of the apples.
+
+        Yields
+        ------
+        :class:`tuple`
+            The position of an apple.
+
+        """
+
+        yield from map(self._board.positions.__getitem__, self._apples)
+
+    def get_walls(self):
+        """
+        Yield the coordinates of the walls.
+
+        Yields
+        ------
+        :class:`tuple`
+            The position of a wall segment.
+
+        """
+
+        yield from self._walls
+
+    def get_board_size(self):
+        """
+        Return the board size.
+
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        return self._board_size
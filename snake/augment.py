@@ -0,0 +1,330 @@
+"""
+Holds tools for augmenting recorded transitions with symmetries.
+
+The rules of snake do not change when the board is rotated or
+reflected, as long as the actions are remapped to match. A square
+board has 8 such symmetries, while a board which is not square only
+has the 4 which keep its width and height. Every recorded transition
+can therefore be turned into up to 8 equally valid transitions.
+
+The symmetries are applied to whole batches of transitions at once.
+Grids, as returned by :func:`.get_grid`, are transformed into NumPy
+views, which reverse or swap their strides without copying them.
+Actions, features and positions are small, and are transformed with
+lookup tables and vectorized arithmetic.
+
+Examples
+--------
+
+.. code-block:: python
+
+    transitions = Transitions(
+        grids=grids,
+        features=features,
+        actions=actions,
+        heads=heads,
+        apples=apples,
+    )
+    for augmented in augment(transitions, board_size=(25, 25)):
+        train(augmented)
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .game import ACTIONS, FEATURES, _VELOCITIES
+
+
+# A symmetry of the board. A position (x, y) is transformed by first
+# swapping x and y if transpose is True, and then reflecting x and y
+# if flip_x and flip_y are True, respectively.
+Symmetry = namedtuple('Symmetry', ['transpose', 'flip_x', 'flip_y'])
+
+# A batch of recorded transitions. Every field is an array whose
+# first axis indexes the transitions, or None if it is not recorded.
+# grids has the shape (num_transitions, ..., board_y, board_x) and
+# holds grids as returned by render.get_grid. features holds the
+# features returned by SnakeGame.get_features, actions holds indices
+# into ACTIONS and heads and apples hold positions of the form (x, y).
+# The head of a dead snake can be just off the board, and a missing
+# apple is recorded as NO_APPLE.
+Transitions = namedtuple(
+    'Transitions',
+    ['grids', 'features', 'actions', 'heads', 'apples'],
+)
+Transitions.__new__.__defaults__ = (None, ) * len(Transitions._fields)
+
+# The position recorded for the apple when there is no apple.
+NO_APPLE = (-1, -1)
+
+_DANGER_LEFT = FEATURES.index('danger_left')
+_DANGER_RIGHT = FEATURES.index('danger_right')
+_APPLE_DIRECTION = [
+    FEATURES.index('apple_direction_x'),
+    FEATURES.index('apple_direction_y'),
+]
+_FREE = [FEATURES.index(f'free_{action}') for action in ACTIONS]
+
+
+def get_symmetries(board_size):
+    """
+    Return the symmetries of a board.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Returns
+    -------
+    :class:`tuple` of :class:`Symmetry`
+        The symmetries, starting with the identity. There are 8 if
+        the board is square and 4 otherwise.
+
+    """
+
+    board_x, board_y = board_size
+    return tuple(
+        Symmetry(transpose, flip_x, flip_y)
+        for transpose in (
+            (False, True) if board_x == board_y else (False, )
+        )
+        for flip_x in (False, True)
+        for flip_y in (False, True)
+    )
+
+
+def _transform_vector(vector, symmetry):
+    """
+    Transform a direction, such as a velocity.
+
+    Parameters
+    ----------
+    vector : :class:`tuple`
+        A :class:`tuple` of the form ``(1, 0)``.
+
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    Returns
+    -------
+    :class:`tuple`
+        The transformed direction.
+
+    """
+
+    x, y = vector
+    if symmetry.transpose:
+        x, y = y, x
+    return (-x if symmetry.flip_x else x, -y if symmetry.flip_y else y)
+
+
+def get_action_map(symmetry):
+    """
+    Return the table which remaps actions under a symmetry.
+
+    Parameters
+    ----------
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.int64`
+        Holds, at the index of every action in :data:`.ACTIONS`, the
+        index of the transformed action.
+
+    """
+
+    velocity_actions = {
+        velocity: i for i, velocity in enumerate(
+            _VELOCITIES[action] for action in ACTIONS
+        )
+    }
+    return np.array([
+        velocity_actions[_transform_vector(_VELOCITIES[action], symmetry)]
+        for action in ACTIONS
+    ])
+
+
+def transform_grids(grids, symmetry):
+    """
+    Transform grids without copying them.
+
+    Parameters
+    ----------
+    grids : :class:`numpy.ndarray`
+        An array of shape ``(..., board_y, board_x)``, such as a
+        single grid or a batch of them. Row ``y`` holds the positions
+        with the y coordinate ``y``, as in :func:`.get_grid`.
+
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        A view of `grids`, holding the transformed grids.
+
+    """
+
+    # Index the grids by (x, y) instead of by (y, x).
+    grids = np.swapaxes(grids, -1, -2)
+    if symmetry.transpose:
+        grids = np.swapaxes(grids, -1, -2)
+    if symmetry.flip_x:
+        grids = grids[..., ::-1, :]
+    if symmetry.flip_y:
+        grids = grids[..., ::-1]
+    return np.swapaxes(grids, -1, -2)
+
+
+def transform_positions(positions, symmetry, board_size):
+    """
+    Transform positions.
+
+    Parameters
+    ----------
+    positions : :class:`numpy.ndarray`
+        An array of shape ``(..., 2)``, holding positions of the form
+        ``(x, y)``. Positions off the board are transformed too, so
+        that the head of a dead snake stays next to the same edge.
+
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The transformed positions.
+
+    """
+
+    positions = np.asarray(positions)
+    board_x, board_y = board_size
+    x = positions[..., 0]
+    y = positions[..., 1]
+    if symmetry.transpose:
+        x, y = y, x
+    if symmetry.flip_x:
+        x = board_x - 1 - x
+    if symmetry.flip_y:
+        y = board_y - 1 - y
+    return np.stack([x, y], axis=-1)
+
+
+def transform_features(features, symmetry):
+    """
+    Transform features returned by :meth:`.SnakeGame.get_features`.
+
+    Parameters
+    ----------
+    features : :class:`numpy.ndarray`
+        An array of shape ``(..., len(FEATURES))``.
+
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The transformed features.
+
+    """
+
+    features = np.array(features)
+    # A reflection turns left into right.
+    if (symmetry.transpose + symmetry.flip_x + symmetry.flip_y) % 2:
+        features[..., [_DANGER_LEFT, _DANGER_RIGHT]] = (
+            features[..., [_DANGER_RIGHT, _DANGER_LEFT]]
+        )
+
+    direction = features[..., _APPLE_DIRECTION]
+    if symmetry.transpose:
+        direction = direction[..., ::-1]
+    if symmetry.flip_x or symmetry.flip_y:
+        direction = direction * [
+            -1 if symmetry.flip_x else 1,
+            -1 if symmetry.flip_y else 1,
+        ]
+    features[..., _APPLE_DIRECTION] = direction
+
+    free = features[..., _FREE]
+    features[..., np.array(_FREE)[get_action_map(symmetry)]] = free
+    return features
+
+
+def transform(transitions, symmetry, board_size):
+    """
+    Transform a batch of transitions.
+
+    Parameters
+    ----------
+    transitions : :class:`Transitions`
+        The transitions.
+
+    symmetry : :class:`Symmetry`
+        The symmetry.
+
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Returns
+    -------
+    :class:`Transitions`
+        The transformed transitions. The grids are views of the
+        original grids.
+
+    """
+
+    grids, features, actions, heads, apples = transitions
+    if grids is not None:
+        grids = transform_grids(grids, symmetry)
+    if features is not None:
+        features = transform_features(features, symmetry)
+    if actions is not None:
+        actions = get_action_map(symmetry)[actions]
+    if heads is not None:
+        heads = transform_positions(heads, symmetry, board_size)
+    if apples is not None:
+        apples = np.asarray(apples)
+        missing = (apples == NO_APPLE).all(axis=-1, keepdims=True)
+        apples = np.where(
+            missing,
+            apples,
+            transform_positions(apples, symmetry, board_size),
+        )
+    return Transitions(grids, features, actions, heads, apples)
+
+
+def augment(transitions, board_size):
+    """
+    Yield a batch of transitions under every symmetry of the board.
+
+    Parameters
+    ----------
+    transitions : :class:`Transitions`
+        The transitions.
+
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Yields
+    ------
+    :class:`Transitions`
+        The transitions under a symmetry, starting with the
+        unchanged transitions, see :func:`get_symmetries`.
+
+    """
+
+    for symmetry in get_symmetries(board_size):
+        yield transform(transitions, symmetry, board_size)
@@ -0,0 +1,134 @@
+"""
+Holds utilities for working with many games of snake at once.
+
+"""
+
+import numpy as np
+
+from .game import FEATURES, _GOLDEN_GAMMA
+
+
+def _mix64(values):
+    """
+    Scramble the bits of an array of 64-bit integers.
+
+    This is a vectorized version of :func:`.game._mix64`.
+
+    Parameters
+    ----------
+    values : :class:`numpy.ndarray` of :class:`numpy.uint64`
+        The integers to scramble.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.uint64`
+        The scrambled integers.
+
+    """
+
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(
+        0xBF58476D1CE4E5B9
+    )
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(
+        0x94D049BB133111EB
+    )
+    return values ^ (values >> np.uint64(31))
+
+
+def counter_random(seeds, counters):
+    """
+    Return random numbers for arrays of seeds and counters.
+
+    The results are bit-identical to :func:`.game.counter_random`,
+    so a batch of games can generate the same apples as the
+    equivalent :class:`.SnakeGame` instances created with
+    ``counter_rng=True``.
+
+    Parameters
+    ----------
+    seeds : :class:`numpy.ndarray` of :class:`int`
+        The seed of each stream.
+
+    counters : :class:`numpy.ndarray` of :class:`int`
+        The position of each number in its stream.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.uint64`
+        The random numbers.
+
+    """
+
+    seeds = np.asarray(seeds).astype(np.uint64)
+    counters = np.asarray(counters).astype(np.uint64)
+    # The arithmetic is meant to wrap around, but NumPy warns when
+    # it does so for scalars.
+    with np.errstate(over='ignore'):
+        return _mix64(
+            _mix64(seeds)
+            + (counters+np.uint64(1))*np.uint64(_GOLDEN_GAMMA)
+        )
+
+
+def counter_randint(seeds, counters, a, b):
+    """
+    Return random integers in the range ``[a, b]``.
+
+    The results match :meth:`.CounterRandom.randint`.
+
+    Parameters
+    ----------
+    seeds : :class:`numpy.ndarray` of :class:`int`
+        The seed of each stream.
+
+    counters : :class:`numpy.ndarray` of :class:`int`
+        The position of each number in its stream.
+
+    a : :class:`int` or :class:`numpy.ndarray`
+        The smallest possible values.
+
+    b : :class:`int` or :class:`numpy.ndarray`
+        The largest possible values.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.int64`
+        The random integers.
+
+    """
+
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    values = counter_random(seeds, counters)
+    return a + (values % (b-a+1).astype(np.uint64)).astype(np.int64)
+
+
+def fill_features(games, out=None):
+    """
+    Fill a matrix with the features of many games.
+
+    Parameters
+    ----------
+    games : :class:`list` of :class:`.SnakeGame`
+        The games whose features are written.
+
+    out : :class:`numpy.ndarray`, optional
+        A preallocated array of shape ``(len(games), len(FEATURES))``
+        into which the features are written. Reusing the same array
+        on every step avoids an allocation. If ``None``, a new
+        :class:`numpy.ndarray` of :class:`numpy.int32` is created.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        `out`, where row ``i`` holds the features of ``games[i]``,
+        as described in :meth:`.SnakeGame.get_features`.
+
+    """
+
+    if out is None:
+        out = np.empty((len(games), len(FEATURES)), dtype=np.int32)
+
+    for i, game in enumerate(games):
+        out[i] = game.get_features()
+    return out
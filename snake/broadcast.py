@@ -0,0 +1,577 @@
+"""
+Holds tools for broadcasting a game of snake to spectators.
+
+A :class:`Broadcaster` sends every step of a :class:`.SnakeGame` to
+any number of :class:`Spectator` instances over local sockets. Most
+steps are sent as a small delta, holding the positions the snake
+moved onto, the position its tail left, the apple and the score.
+Keyframes, holding the entire state of the game, are sent
+periodically and to every spectator which joins, so that spectators
+can join at any time.
+
+Spectators which cannot keep up are dropped, so that a slow
+spectator never stalls the game.
+
+"""
+
+from collections import deque
+import socket
+import struct
+
+
+_LENGTH = struct.Struct('<I')
+# Positions are signed, so that a head which escaped the board and
+# the missing apple can be sent.
+_POSITION = struct.Struct('<hh')
+# The largest board size for which every position can be sent.
+_MAX_BOARD_SIZE = (1 << 15) - 1
+# Holds the message type, step number, apple position, score and
+# whether the game is over.
+_MESSAGE_HEADER = struct.Struct('<cIhhIB')
+# Sent as the apple position when there is no apple.
+_NO_APPLE = (-1, -1)
+# Holds the board size, number of walls and length of the snake. The
+# board size has the same width as the positions.
+_KEYFRAME_HEADER = struct.Struct('<hhII')
+# Holds the number of positions the snake moved onto and the position
+# its tail left.
+_DELTA_HEADER = struct.Struct('<Bhh')
+
+
+class Broadcaster:
+    """
+    Broadcasts a game of snake to spectators.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        game = SnakeGame(
+            board_size=(25, 25),
+            walls=(),
+            random_seed=12,
+        )
+        broadcaster = Broadcaster(game, ('127.0.0.1', 5000))
+        for step in game.run_stepwise():
+            broadcaster.publish()
+        broadcaster.close()
+
+    """
+
+    def __init__(
+        self,
+        game,
+        address=('127.0.0.1', 0),
+        keyframe_interval=100,
+        max_pending=1 << 16,
+    ):
+        """
+        Initialize a :class:`Broadcaster`.
+
+        Parameters
+        ----------
+        game : :class:`.SnakeGame`
+            The game to broadcast.
+
+        address : :class:`tuple`, optional
+            The address on which spectators can connect. If the port
+            is ``0``, a free port is chosen, see :meth:`get_address`.
+
+        keyframe_interval : :class:`int`, optional
+            The number of steps between keyframes.
+
+        max_pending : :class:`int`, optional
+            The maximum number of bytes which can be waiting to be
+            sent to a spectator. Spectators which fall further behind
+            are dropped.
+
+        Raises
+        ------
+        :class:`ValueError`
+            If the board of `game` is too large for its positions to
+            be sent.
+
+        """
+
+        if max(game.get_board_size()) > _MAX_BOARD_SIZE:
+            raise ValueError(
+                f'Boards larger than {_MAX_BOARD_SIZE} positions in '
+                'either direction cannot be broadcast.'
+            )
+        self._game = game
+        self._keyframe_interval = keyframe_interval
+        self._max_pending = max_pending
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen()
+        self._server.setblocking(False)
+
+        # Maps every spectator's socket to the bytes waiting to be
+        # sent to it.
+        self._spectators = {}
+
+        # The state of the game when it was last published, used to
+        # create the deltas.
+        self._num_steps = game.get_num_steps()
+        self._tail = game.get_snake_tail()
+        self._length = game.get_snake_length()
+
+    def get_address(self):
+        """
+        Return the address on which spectators can connect.
+
+        Returns
+        -------
+        :class:`tuple`
+            The host and port.
+
+        """
+
+        return self._server.getsockname()
+
+    def get_num_spectators(self):
+        """
+        Return the number of connected spectators.
+
+        Returns
+        -------
+        :class:`int`
+            The number of connected spectators.
+
+        """
+
+        return len(self._spectators)
+
+    def _get_message_header(self, kind):
+        """
+        Encode the part of a message shared by all message types.
+
+        Parameters
+        ----------
+        kind : :class:`bytes`
+            ``b'K'`` for a keyframe and ``b'D'`` for a delta.
+
+        Returns
+        -------
+        :class:`bytes`
+            The encoded header.
+
+        """
+
+        game = self._game
+        apple = game.get_apple()
+        apple_x, apple_y = _NO_APPLE if apple is None else apple
+        return _MESSAGE_HEADER.pack(
+            kind,
+            game.get_num_steps(),
+            apple_x,
+            apple_y,
+            game.get_snake_length(),
+            game.is_game_over(),
+        )
+
+    def _get_keyframe(self):
+        """
+        Encode the entire state of the game.
+
+        Returns
+        -------
+        :class:`bytes`
+            The encoded keyframe.
+
+        """
+
+        game = self._game
+        walls = list(game.get_walls())
+        board_x, board_y = game.get_board_size()
+        message = [
+            self._get_message_header(b'K'),
+            _KEYFRAME_HEADER.pack(
+                board_x,
+                board_y,
+                len(walls),
+                game.get_snake_length(),
+            ),
+        ]
+        message.extend(_POSITION.pack(*wall) for wall in walls)
+        message.extend(
+            _POSITION.pack(*segment) for segment in game.get_snake()
+        )
+        return _frame(b''.join(message))
+
+    def _get_delta(self):
+        """
+        Encode the changes made by the last step.
+
+        Returns
+        -------
+        :class:`bytes`
+            The encoded delta.
+
+        """
+
+        game = self._game
+        # The snake always moves onto one new position, and onto a
+        # second one if it ate the apple.
+        num_added = 1 + game.get_snake_length() - self._length
+        message = [
+            self._get_message_header(b'D'),
+            _DELTA_HEADER.pack(num_added, *self._tail),
+        ]
+        message.extend(
+            _POSITION.pack(*game.get_snake_segment(-i))
+            for i in range(num_added, 0, -1)
+        )
+        return _frame(b''.join(message))
+
+    def _accept(self):
+        """
+        Accept every waiting spectator and send it a keyframe.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        keyframe = None
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except BlockingIOError:
+                return
+            connection.setblocking(False)
+            connection.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+            )
+            if keyframe is None:
+                keyframe = self._get_keyframe()
+            self._spectators[connection] = bytearray(keyframe)
+
+    def publish(self):
+        """
+        Send the current state of the game to every spectator.
+
+        This should be called after every step. If the game took
+        more than one step since the last call, a keyframe is sent
+        instead of a delta.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        game = self._game
+        num_steps = game.get_num_steps()
+        if num_steps != self._num_steps:
+            if (
+                num_steps != self._num_steps + 1
+                or num_steps % self._keyframe_interval == 0
+            ):
+                message = self._get_keyframe()
+            else:
+                message = self._get_delta()
+
+            for pending in self._spectators.values():
+                pending += message
+
+            self._num_steps = num_steps
+            self._tail = game.get_snake_tail()
+            self._length = game.get_snake_length()
+
+        self._accept()
+        self._flush()
+
+    def _flush(self):
+        """
+        Send as many pending bytes as possible without blocking.
+
+        Spectators which have too many pending bytes, or which have
+        disconnected, are dropped.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        dropped = []
+        for connection, pending in self._spectators.items():
+            if not pending:
+                continue
+            try:
+                sent = connection.send(pending)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                dropped.append(connection)
+                continue
+            del pending[:sent]
+            if len(pending) > self._max_pending:
+                dropped.append(connection)
+
+        for connection in dropped:
+            del self._spectators[connection]
+            connection.close()
+
+    def close(self):
+        """
+        Disconnect every spectator and stop broadcasting.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        for connection in self._spectators:
+            connection.close()
+        self._spectators.clear()
+        self._server.close()
+
+
+def _frame(message):
+    """
+    Prefix a message with its length.
+
+    Parameters
+    ----------
+    message : :class:`bytes`
+        The message.
+
+    Returns
+    -------
+    :class:`bytes`
+        The length of `message` followed by `message`.
+
+    """
+
+    return _LENGTH.pack(len(message)) + message
+
+
+class Spectator:
+    """
+    Watches a game broadcast by a :class:`Broadcaster`.
+
+    The spectator holds a copy of the game's state, which is updated
+    by :meth:`receive`.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        spectator = Spectator(('127.0.0.1', 5000))
+        while not spectator.is_game_over():
+            spectator.receive()
+            print(spectator.get_snake_length())
+
+    """
+
+    def __init__(self, address, timeout=None):
+        """
+        Initialize a :class:`Spectator`.
+
+        Parameters
+        ----------
+        address : :class:`tuple`
+            The address of the :class:`Broadcaster`.
+
+        timeout : :class:`float`, optional
+            The maximum time in seconds :meth:`receive` waits for a
+            message. If ``None``, it waits forever.
+
+        """
+
+        self._socket = socket.create_connection(address, timeout)
+        self._buffer = bytearray()
+        self._board_size = None
+        self._walls = frozenset()
+        self._snake = deque()
+        self._apple = None
+        self._score = 0
+        self._num_steps = 0
+        self._game_over = False
+
+    def _read(self, size):
+        """
+        Read exactly `size` bytes.
+
+        Parameters
+        ----------
+        size : :class:`int`
+            The number of bytes to read.
+
+        Returns
+        -------
+        :class:`bytes`
+            The bytes read.
+
+        """
+
+        while len(self._buffer) < size:
+            data = self._socket.recv(1 << 16)
+            if not data:
+                raise ConnectionError('The broadcast has ended.')
+            self._buffer += data
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def receive(self):
+        """
+        Receive a message and update the state of the game.
+
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken by the game.
+
+        """
+
+        size, = _LENGTH.unpack(self._read(_LENGTH.size))
+        message = memoryview(self._read(size))
+        (
+            kind,
+            self._num_steps,
+            apple_x,
+            apple_y,
+            self._score,
+            game_over,
+        ) = _MESSAGE_HEADER.unpack_from(message)
+        self._apple = (
+            None if (apple_x, apple_y) == _NO_APPLE else (apple_x, apple_y)
+        )
+        self._game_over = bool(game_over)
+        offset = _MESSAGE_HEADER.size
+
+        if kind == b'K':
+            board_x, board_y, num_walls, length = (
+                _KEYFRAME_HEADER.unpack_from(message, offset)
+            )
+            offset += _KEYFRAME_HEADER.size
+            self._board_size = board_x, board_y
+            positions = list(_POSITION.iter_unpack(message[offset:]))
+            self._walls = frozenset(positions[:num_walls])
+            self._snake = deque(positions[num_walls:])
+
+        else:
+            num_added, tail_x, tail_y = _DELTA_HEADER.unpack_from(
+                message,
+                offset,
+            )
+            offset += _DELTA_HEADER.size
+            if self._snake and self._snake[0] == (tail_x, tail_y):
+                self._snake.popleft()
+            self._snake.extend(_POSITION.iter_unpack(message[offset:]))
+
+        return self._num_steps
+
+    def get_snake(self):
+        """
+        Yield the positions occupied by the snake.
+
+        Yields
+        ------
+        :class:`tuple`
+            The position of a segment of the snake's body.
+
+        """
+
+        yield from self._snake
+
+    def get_walls(self):
+        """
+        Yield the coordinates of the walls.
+
+        Yields
+        ------
+        :class:`tuple`
+            The position of a wall segment.
+
+        """
+
+        yield from self._walls
+
+    def get_apple(self):
+        """
+        Return the coordinates of the apple.
+
+        Returns
+        -------
+        :class:`tuple`
+            The position of the apple, or ``None`` if there is no
+            free position for an apple.
+
+        """
+
+        return self._apple
+
+    def get_board_size(self):
+        """
+        Return the board size.
+
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        return self._board_size
+
+    def get_snake_length(self):
+        """
+        Return the length of the snake.
+
+        Returns
+        -------
+        :class:`int`
+            The length of the snake.
+
+        """
+
+        return self._score
+
+    def get_num_steps(self):
+        """
+        Return the number of steps taken by the game.
+
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken.
+
+        """
+
+        return self._num_steps
+
+    def is_game_over(self):
+        """
+        Check if the game is over.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake has died and ``False`` otherwise.
+
+        """
+
+        return self._game_over
+
+    def close(self):
+        """
+        Disconnect from the broadcast.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._socket.close()
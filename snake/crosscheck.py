@@ -0,0 +1,672 @@
+"""
+Holds a harness which checks other engines against :class:`.SnakeGame`.
+
+Any other engine, whether faster, batched or restored from
+checkpoints, must behave exactly like :class:`.SnakeGame`. The harness
+plays many random cases, each with its own board, walls, random seed
+and stream of operations, on the reference engine and on another
+engine in lockstep, and compares the state of both after every
+operation. The operations queue directions, including more than the
+queue can hold and reversals, and take steps either from the queue or
+with an action applied directly, so the velocity rules, the velocity
+queue, growth and every cause of death are covered.
+
+On the first divergence, the case is shrunk to a minimal case which
+still diverges, by removing operations and walls for as long as the
+engines still disagree. Every case is also played on each engine
+separately and timed, so the speed of the other engine relative to
+the reference is reported along with its correctness.
+
+An engine is a callable which takes a board size, walls and random
+seed, like :class:`.SnakeGame`, and returns a game with the methods
+:meth:`~.SnakeGame.queue_snake_movement_direction`,
+:meth:`~.SnakeGame.step`, :meth:`~.SnakeGame.get_snake`,
+:meth:`~.SnakeGame.get_apple`, :meth:`~.SnakeGame.is_game_over` and
+:meth:`~.SnakeGame.get_num_steps`. The engines in :data:`ENGINES` can
+be checked from the command line with::
+
+    $ python -m snake.crosscheck checkpoint --num_cases 100000
+
+"""
+
+import argparse
+from collections import namedtuple
+import random
+import sys
+import time
+
+from .game import ACTIONS, GameObserver, SnakeGame
+
+
+# A case played by the harness. ops holds operations of the form
+# ('queue', direction), which queues a direction, or ('step', action),
+# which takes a step with action applied directly, or following the
+# queue if action is None.
+Case = namedtuple('Case', ['board_size', 'walls', 'random_seed', 'ops'])
+
+# The first difference found between two engines. index is the index
+# of the operation after which the states differ, or -1 if they
+# differ from the start.
+Divergence = namedtuple(
+    'Divergence',
+    ['case', 'index', 'reference_state', 'other_state'],
+)
+
+# The results of a cross-check, as returned by run. The times are the
+# seconds taken to play every case on each engine on its own.
+CrossCheckReport = namedtuple(
+    'CrossCheckReport',
+    [
+        'num_cases',
+        'num_steps',
+        'reference_time',
+        'other_time',
+        'divergence',
+    ],
+)
+
+
+class CheckpointGame:
+    """
+    A game which is saved and loaded again before every operation.
+
+    Checking it against :class:`.SnakeGame` checks that
+    :meth:`.SnakeGame.to_bytes` and :meth:`.SnakeGame.from_bytes` keep
+    the entire state of a game.
+
+    """
+
+    def __init__(self, board_size, walls, random_seed):
+        """
+        Initialize a :class:`CheckpointGame`.
+
+        Parameters
+        ----------
+        board_size : :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        walls : :class:`iterable` of :class:`tuple`
+            The positions of the walls.
+
+        random_seed : :class:`int`
+            The random seed of the game.
+
+        """
+
+        self._walls = frozenset(walls)
+        self._game = SnakeGame(board_size, self._walls, random_seed)
+
+    def _reload(self):
+        """
+        Replace the game with a copy loaded from a checkpoint.
+
+        Returns
+        -------
+        :class:`.SnakeGame`
+            The copy.
+
+        """
+
+        self._game = SnakeGame.from_bytes(
+            self._game.to_bytes(),
+            walls=self._walls,
+        )
+        return self._game
+
+    def queue_snake_movement_direction(self, direction):
+        """
+        Reload the game and queue a direction.
+
+        See :meth:`.SnakeGame.queue_snake_movement_direction`.
+
+        """
+
+        return self._reload().queue_snake_movement_direction(direction)
+
+    def step(self, action=None):
+        """
+        Reload the game and take a step.
+
+        See :meth:`.SnakeGame.step`.
+
+        """
+
+        return self._reload().step(action)
+
+    def __getattr__(self, name):
+        # Every other method only reads the state of the game.
+        return getattr(self._game, name)
+
+
+def _create_observed_game(board_size, walls, random_seed):
+    """
+    Create a game with an observer.
+
+    Games with observers take steps with
+    :meth:`.SnakeGame._take_tracked_step`, rather than with the
+    shorter path used by games without them.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    walls : :class:`iterable` of :class:`tuple`
+        The positions of the walls.
+
+    random_seed : :class:`int`
+        The random seed of the game.
+
+    Returns
+    -------
+    :class:`.SnakeGame`
+        The game.
+
+    """
+
+    game = SnakeGame(board_size, walls, random_seed)
+    game.add_observer(GameObserver())
+    return game
+
+
+# The games reused by _create_reset_game, by board size.
+_reset_games = {}
+
+
+def _create_reset_game(board_size, walls, random_seed):
+    """
+    Reset a game kept from an earlier case, instead of creating one.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    walls : :class:`iterable` of :class:`tuple`
+        The positions of the walls.
+
+    random_seed : :class:`int`
+        The random seed of the game.
+
+    Returns
+    -------
+    :class:`.SnakeGame`
+        The game.
+
+    """
+
+    game = _reset_games.get(board_size)
+    if game is None:
+        game = _reset_games[board_size] = SnakeGame(board_size, (), 0)
+    game.reset(random_seed=random_seed, walls=walls)
+    return game
+
+
+# The engines which can be checked from the command line.
+ENGINES = {
+    'reference': SnakeGame,
+    'observed': _create_observed_game,
+    'checkpoint': CheckpointGame,
+    'reset': _create_reset_game,
+}
+
+
+def _get_progress(game):
+    """
+    Rank a game by how close its snake is to eating.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    Returns
+    -------
+    :class:`tuple`
+        Smaller for longer snakes, and then for snakes closer to the
+        apple.
+
+    """
+
+    apple = game.get_apple()
+    if apple is None:
+        return (-game.get_snake_length(), 0)
+    head_x, head_y = game.get_snake_head()
+    apple_x, apple_y = apple
+    return (
+        -game.get_snake_length(),
+        abs(apple_x-head_x) + abs(apple_y-head_y),
+    )
+
+
+def get_case(
+    random_seed,
+    min_board_size=2,
+    max_board_size=12,
+    max_density=0.2,
+    max_ops=300,
+):
+    """
+    Generate a random case.
+
+    Parameters
+    ----------
+    random_seed : :class:`int`
+        The random seed of the case, which is also the random seed of
+        its games.
+
+    min_board_size : :class:`int`, optional
+        The minimum width and height of the board.
+
+    max_board_size : :class:`int`, optional
+        The maximum width and height of the board.
+
+    max_density : :class:`float`, optional
+        The maximum fraction of the board covered by walls.
+
+    max_ops : :class:`int`, optional
+        The maximum number of operations.
+
+    Returns
+    -------
+    :class:`Case`
+        The case.
+
+    """
+
+    generator = random.Random(random_seed)
+    board_x = generator.randint(min_board_size, max_board_size)
+    board_y = generator.randint(min_board_size, max_board_size)
+    num_walls = int(generator.uniform(0, max_density) * board_x*board_y)
+    walls = frozenset(
+        (generator.randrange(board_x), generator.randrange(board_y))
+        for i in range(num_walls)
+    ) - {(0, 0)}
+
+    # Random steps kill the snake within a few steps, so the steps
+    # are chosen while playing the reference engine, mostly avoiding
+    # death, so that the snake also grows long.
+    guide = SnakeGame((board_x, board_y), walls, random_seed)
+    actions = [None, *range(len(ACTIONS))]
+    ops = []
+    while len(ops) < max_ops and not guide.is_game_over():
+        checkpoint = guide.to_bytes()
+        if generator.random() < 0.1:
+            # Sometimes queue more directions than fit in the queue,
+            # keeping them only if the snake survives following them.
+            burst = [
+                generator.choice(ACTIONS)
+                for i in range(generator.randint(1, 7))
+            ]
+            for direction in burst:
+                guide.queue_snake_movement_direction(direction)
+            queued = guide.to_bytes()
+            while (
+                guide.get_num_queued_directions()
+                and not guide.is_game_over()
+            ):
+                guide.step()
+            if guide.is_game_over():
+                queued = checkpoint
+            else:
+                ops.extend(('queue', direction) for direction in burst)
+            checkpoint = queued
+
+        # Mostly head for the apple, so that the snake grows, and
+        # otherwise drift or turn at random, avoiding death if possible.
+        generator.shuffle(actions)
+        outcomes = []
+        for action in actions:
+            game = SnakeGame.from_bytes(checkpoint, walls=walls)
+            game.step(action)
+            if not game.is_game_over():
+                outcomes.append((action, game))
+        if not outcomes:
+            action = actions[-1]
+            guide = SnakeGame.from_bytes(checkpoint, walls=walls)
+            guide.step(action)
+        else:
+            drifts = [outcome for outcome in outcomes if outcome[0] is None]
+            if generator.random() < 0.5:
+                action, guide = min(
+                    outcomes,
+                    key=lambda outcome: _get_progress(outcome[1]),
+                )
+            elif drifts and generator.random() < 0.7:
+                action, guide = drifts[0]
+            else:
+                action, guide = generator.choice(outcomes)
+        ops.append(('step', action))
+
+    return Case((board_x, board_y), walls, random_seed, ops[:max_ops])
+
+
+def _get_state(game):
+    """
+    Return the state of a game which is compared between engines.
+
+    Parameters
+    ----------
+    game : :class:`object`
+        A game created by an engine.
+
+    Returns
+    -------
+    :class:`tuple`
+        The state of the game.
+
+    """
+
+    return (
+        tuple(game.get_snake()),
+        game.get_apple(),
+        game.is_game_over(),
+        game.get_num_steps(),
+    )
+
+
+def _play(engine, case, observe=False):
+    """
+    Play a case on an engine.
+
+    Parameters
+    ----------
+    engine : :class:`callable`
+        The engine.
+
+    case : :class:`Case`
+        The case.
+
+    observe : :class:`bool`, optional
+        If ``True``, the state of the game is recorded after every
+        operation.
+
+    Returns
+    -------
+    :class:`list`
+        The state of the game before any operation, and after every
+        operation if `observe` is ``True``, or only the final state
+        otherwise. Operations stop once the snake dies. If the engine
+        raises an error, the last state is the :func:`repr` of the
+        error.
+
+    """
+
+    try:
+        game = engine(case.board_size, case.walls, case.random_seed)
+        states = [_get_state(game)]
+        for kind, argument in case.ops:
+            if game.is_game_over():
+                break
+            if kind == 'queue':
+                result = game.queue_snake_movement_direction(argument)
+            else:
+                result = game.step(argument)
+            if observe:
+                states.append((result, _get_state(game)))
+        if not observe:
+            states.append(_get_state(game))
+    except Exception as error:
+        states.append(repr(error))
+    return states
+
+
+def find_divergence(reference, other, case):
+    """
+    Find the first difference between two engines on a case.
+
+    Parameters
+    ----------
+    reference : :class:`callable`
+        The reference engine.
+
+    other : :class:`callable`
+        The engine which is checked.
+
+    case : :class:`Case`
+        The case.
+
+    Returns
+    -------
+    :class:`Divergence`
+        The first difference, or ``None`` if the engines agree.
+
+    """
+
+    reference_states = _play(reference, case, observe=True)
+    other_states = _play(other, case, observe=True)
+    for index, (reference_state, other_state) in enumerate(
+        zip(reference_states, other_states)
+    ):
+        if reference_state != other_state:
+            return Divergence(case, index-1, reference_state, other_state)
+
+    if len(reference_states) != len(other_states):
+        index = min(len(reference_states), len(other_states))
+        return Divergence(
+            case,
+            index-1,
+            reference_states[index] if index < len(reference_states)
+            else None,
+            other_states[index] if index < len(other_states) else None,
+        )
+    return None
+
+
+def minimize(reference, other, divergence):
+    """
+    Shrink a diverging case as much as possible.
+
+    Operations are removed in chunks of halving size, and then walls
+    one at a time, as long as the engines still diverge.
+
+    Parameters
+    ----------
+    reference : :class:`callable`
+        The reference engine.
+
+    other : :class:`callable`
+        The engine which is checked.
+
+    divergence : :class:`Divergence`
+        The divergence to shrink.
+
+    Returns
+    -------
+    :class:`Divergence`
+        The divergence of the smallest case found.
+
+    """
+
+    case = divergence.case
+    case = case._replace(ops=case.ops[:divergence.index+1])
+    best = find_divergence(reference, other, case) or divergence
+
+    chunk_size = max(len(case.ops) // 2, 1)
+    while True:
+        index = 0
+        while index < len(best.case.ops):
+            ops = best.case.ops
+            candidate = best.case._replace(
+                ops=ops[:index] + ops[index+chunk_size:]
+            )
+            result = find_divergence(reference, other, candidate)
+            if result is None:
+                index += chunk_size
+            else:
+                best = result._replace(
+                    case=result.case._replace(
+                        ops=result.case.ops[:result.index+1]
+                    )
+                )
+        if chunk_size == 1:
+            break
+        chunk_size //= 2
+
+    for wall in sorted(best.case.walls):
+        candidate = best.case._replace(walls=best.case.walls - {wall})
+        result = find_divergence(reference, other, candidate)
+        if result is not None:
+            best = result
+
+    return best
+
+
+def format_divergence(divergence):
+    """
+    Describe a divergence as code which reproduces it.
+
+    Parameters
+    ----------
+    divergence : :class:`Divergence`
+        The divergence.
+
+    Returns
+    -------
+    :class:`str`
+        The description.
+
+    """
+
+    case = divergence.case
+    lines = [
+        f'game = engine({case.board_size}, {sorted(case.walls)}, '
+        f'{case.random_seed})',
+    ]
+    for kind, argument in case.ops:
+        if kind == 'queue':
+            lines.append(f'game.queue_snake_movement_direction({argument!r})')
+        else:
+            lines.append(f'game.step({argument!r})')
+    lines.append(f'# reference: {divergence.reference_state}')
+    lines.append(f'# other:     {divergence.other_state}')
+    return '\n'.join(lines)
+
+
+def run(other, reference=SnakeGame, num_cases=1000, random_seed=0, **kwargs):
+    """
+    Check an engine against the reference on many random cases.
+
+    Parameters
+    ----------
+    other : :class:`callable`
+        The engine which is checked.
+
+    reference : :class:`callable`, optional
+        The reference engine.
+
+    num_cases : :class:`int`, optional
+        The number of cases. The i-th case uses the random seed
+        ``random_seed + i``, see :func:`get_case`.
+
+    random_seed : :class:`int`, optional
+        The random seed of the first case.
+
+    **kwargs
+        Passed to :func:`get_case`.
+
+    Returns
+    -------
+    :class:`CrossCheckReport`
+        The results. The checks stop at the first divergence, which
+        is minimized, so `num_cases` then counts the cases played up
+        to and including the diverging one.
+
+    """
+
+    reference_time = 0.
+    other_time = 0.
+    num_played = 0
+    num_steps = 0
+    divergence = None
+    for i in range(num_cases):
+        case = get_case(random_seed+i, **kwargs)
+        num_played += 1
+
+        # The timed games only record their final states, so every
+        # operation is compared in a separate lockstep run. This also
+        # fills caches shared by the engines before they are timed.
+        divergence = find_divergence(reference, other, case)
+        if divergence is not None:
+            divergence = minimize(reference, other, divergence)
+            break
+
+        start = time.perf_counter()
+        reference_states = _play(reference, case)
+        reference_time += time.perf_counter() - start
+        start = time.perf_counter()
+        other_states = _play(other, case)
+        other_time += time.perf_counter() - start
+        if isinstance(reference_states[-1], tuple):
+            num_steps += reference_states[-1][3]
+
+    return CrossCheckReport(
+        num_cases=num_played,
+        num_steps=num_steps,
+        reference_time=reference_time,
+        other_time=other_time,
+        divergence=divergence,
+    )
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'engine',
+        choices=sorted(ENGINES),
+        help='The engine to check against the reference.'
+    )
+    parser.add_argument(
+        '--num_cases',
+        type=int,
+        help='The number of random cases.',
+        default=1000
+    )
+    parser.add_argument(
+        '--random_seed',
+        type=int,
+        help='The random seed of the first case.',
+        default=0
+    )
+    parser.add_argument(
+        '--max_board_size',
+        type=int,
+        help='The maximum width and height of the board.',
+        default=12
+    )
+    parser.add_argument(
+        '--max_ops',
+        type=int,
+        help='The maximum number of operations in a case.',
+        default=300
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    report = run(
+        other=ENGINES[args.engine],
+        num_cases=args.num_cases,
+        random_seed=args.random_seed,
+        max_board_size=args.max_board_size,
+        max_ops=args.max_ops,
+    )
+    if report.divergence is not None:
+        print('The engines diverge:')
+        print(format_divergence(report.divergence))
+    print(f'{report.num_cases} cases, {report.num_steps} steps', end='')
+    # No case is timed if the first case diverges.
+    if report.other_time > 0.:
+        speedup = report.reference_time / report.other_time
+        print(
+            f', {args.engine} is {speedup:.2f} times as fast as the '
+            'reference',
+            end='',
+        )
+    print()
+    if report.divergence is not None:
+        sys.exit(1)
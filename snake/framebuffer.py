@@ -0,0 +1,465 @@
+"""
+Holds a shared-memory framebuffer for watching games from other processes.
+
+A :class:`FramebufferWriter` publishes the board of a
+:class:`.SnakeGame` into a memory-mapped file, and any number of
+:class:`FramebufferReader` instances, in other processes, read it
+without locks. The framebuffer is guarded by a sequence counter,
+which is odd while a frame is being written, so a reader can detect
+when it has read a partially written frame and try again.
+
+A game can be watched in the terminal with::
+
+    $ python -m snake.framebuffer path/to/framebuffer
+
+"""
+
+import argparse
+import curses
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+
+# The header holds the magic bytes, the board size, the score, whether
+# the game is over and the sequence counter.
+_HEADER = struct.Struct('<4sIIIIQ')
+_MAGIC = b'SNFB'
+_SEQUENCE_OFFSET = _HEADER.size - 8
+_SEQUENCE = struct.Struct('<Q')
+
+# The values written into the framebuffer for each position on the
+# board.
+EMPTY = 0
+WALL = 1
+SNAKE = 2
+HEAD = 3
+APPLE = 4
+
+
+class FramebufferWriter:
+    """
+    Publishes the board of a game into a memory-mapped file.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        game = SnakeGame(
+            board_size=(25, 25),
+            walls=(),
+            random_seed=12,
+        )
+        writer = FramebufferWriter('/dev/shm/snake', game)
+        for step in game.run_stepwise():
+            writer.publish()
+
+    """
+
+    def __init__(self, path, game):
+        """
+        Initialize a :class:`FramebufferWriter`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the file which holds the framebuffer. It is
+            replaced if it exists, so readers which still map the old
+            file keep reading it, rather than crashing because it was
+            truncated. Using a path on a memory backed file system,
+            such as ``/dev/shm``, means the framebuffer never touches
+            the disk.
+
+        game : :class:`.SnakeGame`
+            The game which is published.
+
+        """
+
+        self._game = game
+        board_x, board_y = self._board_size = game.get_board_size()
+        size = _HEADER.size + board_x*board_y
+
+        # The first frame is written into a new file, which then
+        # replaces the file at `path`, so that readers only ever see
+        # complete framebuffers.
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with open(fd, 'r+b') as f:
+                f.truncate(size)
+                self._buffer = mmap.mmap(f.fileno(), size)
+            _HEADER.pack_into(
+                self._buffer, 0, _MAGIC, board_x, board_y, 0, 0, 0
+            )
+            self._sequence = 0
+
+            # The state of the game when it was last published, used
+            # to only write the positions which changed.
+            self._num_steps = None
+            self._tail = None
+            self._head = None
+            self._apple = None
+
+            self.publish()
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _set(self, position, value):
+        """
+        Write `value` at `position` of the board.
+
+        Parameters
+        ----------
+        position : :class:`tuple`
+            A :class:`tuple` of the form ``(21, 12)``.
+
+        value : :class:`int`
+            The value to write.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        x, y = position
+        board_x, board_y = self._board_size
+        if 0 <= x < board_x and 0 <= y < board_y:
+            self._buffer[_HEADER.size + y*board_x + x] = value
+
+    def _draw_board(self):
+        """
+        Write the entire board.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        board_x, board_y = self._board_size
+        start = _HEADER.size
+        self._buffer[start:start+board_x*board_y] = bytes(
+            board_x*board_y
+        )
+        for position in self._game.get_walls():
+            self._set(position, WALL)
+        for position in self._game.get_snake():
+            self._set(position, SNAKE)
+
+    def _draw_changes(self):
+        """
+        Write the positions which changed during the last step.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        game = self._game
+        self._set(self._head, SNAKE)
+        self._set(game.get_snake_segment(-2), SNAKE)
+        # The old head is the old tail if the snake grew from a single
+        # segment, so it is only cleared after being drawn.
+        if not game.snake_occupies(self._tail):
+            self._set(self._tail, EMPTY)
+
+    def publish(self):
+        """
+        Write the current state of the game into the framebuffer.
+
+        If the game has taken exactly one step since the last call,
+        only the positions which changed are written, otherwise the
+        entire board is.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        game = self._game
+        num_steps = game.get_num_steps()
+        if num_steps == self._num_steps:
+            return
+
+        buffer = self._buffer
+        self._sequence += 1
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, self._sequence)
+
+        if (
+            self._num_steps is not None
+            and num_steps == self._num_steps + 1
+            and game.get_snake_length() > 1
+        ):
+            self._draw_changes()
+        else:
+            self._draw_board()
+
+        if self._apple is not None and self._apple != game.get_apple():
+            if game.snake_occupies(self._apple):
+                self._set(self._apple, SNAKE)
+            else:
+                self._set(self._apple, EMPTY)
+        self._apple = game.get_apple()
+        if self._apple is not None:
+            self._set(self._apple, APPLE)
+
+        self._head = game.get_snake_head()
+        self._tail = game.get_snake_tail()
+        self._num_steps = num_steps
+        self._set(self._head, HEAD)
+
+        board_x, board_y = self._board_size
+        self._sequence += 1
+        _HEADER.pack_into(
+            buffer,
+            0,
+            _MAGIC,
+            board_x,
+            board_y,
+            game.get_snake_length(),
+            game.is_game_over(),
+            self._sequence,
+        )
+
+    def close(self):
+        """
+        Close the framebuffer.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._buffer.close()
+
+
+class FramebufferReader:
+    """
+    Reads a framebuffer written by a :class:`FramebufferWriter`.
+
+    """
+
+    def __init__(self, path):
+        """
+        Initialize a :class:`FramebufferReader`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the file which holds the framebuffer.
+
+        """
+
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, *self._board_size, _, _, _ = _HEADER.unpack_from(
+            self._buffer
+        )
+        if magic != _MAGIC:
+            raise ValueError(f'{path} does not hold a framebuffer.')
+
+        board_x, board_y = self._board_size
+        self._view = memoryview(self._buffer)
+        self._cells = self._view[
+            _HEADER.size:_HEADER.size+board_x*board_y
+        ]
+
+    def get_board_size(self):
+        """
+        Return the board size.
+
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        return tuple(self._board_size)
+
+    def get_sequence(self):
+        """
+        Return the current value of the sequence counter.
+
+        Returns
+        -------
+        :class:`int`
+            The sequence counter. It is odd while a frame is being
+            written and increases with every frame.
+
+        """
+
+        return _SEQUENCE.unpack_from(self._buffer, _SEQUENCE_OFFSET)[0]
+
+    def get_cells(self):
+        """
+        Return a view of the board, without copying it.
+
+        The view is only guaranteed to hold a complete frame if the
+        sequence counter is even and the same before and after it
+        is used, see :meth:`read`.
+
+        Returns
+        -------
+        :class:`memoryview`
+            Holds the value at position ``(x, y)`` at index
+            ``y*board_x + x``. The values are :data:`EMPTY`,
+            :data:`WALL`, :data:`SNAKE`, :data:`HEAD` or
+            :data:`APPLE`.
+
+        """
+
+        return self._cells
+
+    def read(self, callback, last_sequence=None):
+        """
+        Pass a consistent frame to `callback`.
+
+        Parameters
+        ----------
+        callback : :class:`callable`
+            Called as ``callback(cells, score, game_over)``, where
+            `cells` is the view returned by :meth:`get_cells`. It may
+            be called more than once if the frame is overwritten while
+            `callback` is running, in which case only the results of
+            the last call should be kept.
+
+        last_sequence : :class:`int`, optional
+            The sequence counter of the last frame which was read. If
+            no new frame was written since, `callback` is not called.
+
+        Returns
+        -------
+        :class:`int`
+            The sequence counter of the frame which was read.
+
+        """
+
+        while True:
+            _, _, _, score, game_over, sequence = _HEADER.unpack_from(
+                self._buffer
+            )
+            if sequence == last_sequence:
+                return sequence
+            if sequence % 2 == 0:
+                callback(self._cells, score, bool(game_over))
+                if self.get_sequence() == sequence:
+                    return sequence
+            time.sleep(0)
+
+    def close(self):
+        """
+        Close the framebuffer.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._cells.release()
+        self._view.release()
+        self._buffer.close()
+
+
+def view(path, refresh=0.02):
+    """
+    Show a framebuffer in the terminal until its game is over.
+
+    Parameters
+    ----------
+    path : :class:`str`
+        The path to the file which holds the framebuffer.
+
+    refresh : :class:`float`, optional
+        The time between checks for a new frame.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    reader = FramebufferReader(path)
+    curses.wrapper(_view, reader, refresh)
+    reader.close()
+
+
+def _view(stdscr, reader, refresh):
+    """
+    Show a framebuffer in the terminal until its game is over.
+
+    Parameters
+    ----------
+    stdscr : :class:`curses.window`
+        A :class:`curses.window` which represents the entire
+        terminal screen.
+
+    reader : :class:`FramebufferReader`
+        The framebuffer to show.
+
+    refresh : :class:`float`
+        The time between checks for a new frame.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    curses.curs_set(0)
+    board_x, board_y = reader.get_board_size()
+    window = curses.newwin(board_y+2, board_x+2, 0, 0)
+    characters = {WALL: '█', SNAKE: 'X', HEAD: 'X', APPLE: 'O'}
+    result = {}
+
+    def draw(cells, score, game_over):
+        window.erase()
+        window.border()
+        for index, value in enumerate(cells):
+            if value != EMPTY:
+                y, x = divmod(index, board_x)
+                window.addch(y+1, x+1, characters[value])
+        result['score'] = score
+        result['game_over'] = game_over
+
+    sequence = None
+    while not result.get('game_over'):
+        new_sequence = reader.read(draw, sequence)
+        if new_sequence != sequence:
+            sequence = new_sequence
+            window.addstr(0, 1, f'SCORE: {result["score"]}')
+            window.refresh()
+        time.sleep(refresh)
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'path',
+        help='The path to the file which holds the framebuffer.'
+    )
+    parser.add_argument(
+        '--refresh',
+        type=float,
+        help='The amount of seconds between checks for a new frame.',
+        default=0.02
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    view(args.path, args.refresh)
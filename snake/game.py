@@ -5,43 +5,219 @@ The only thing necessary to run a game of snake is :class:`.SnakeGame`.
 
 """
 
-from collections import deque
+from collections import deque, namedtuple
+from collections.abc import Sequence
+import functools
+import hashlib
 import random
-import itertools as it
+import struct
+
+
+# The velocity corresponding to each movement direction. Actions given
+# as integers index into ACTIONS.
+ACTIONS = ('up', 'down', 'right', 'left')
+_VELOCITIES = {
+    'up': (0, 1),
+    'down': (0, -1),
+    'right': (1, 0),
+    'left': (-1, 0),
+}
+_VALID_VELOCITIES = frozenset(_VELOCITIES.values())
+# Maps every velocity to the index of its action in ACTIONS.
+_VELOCITY_ACTIONS = {
+    _VELOCITIES[action]: i for i, action in enumerate(ACTIONS)
+}
+_ACTION_VELOCITIES = {
+    **_VELOCITIES,
+    **{i: _VELOCITIES[action] for i, action in enumerate(ACTIONS)},
+}
+
+# The names of the entries returned by SnakeGame.get_features, in
+# order.
+FEATURES = (
+    'danger_ahead',
+    'danger_left',
+    'danger_right',
+    'apple_direction_x',
+    'apple_direction_y',
+    'free_up',
+    'free_down',
+    'free_right',
+    'free_left',
+    'snake_length',
+)
+
+# Holds everything needed to replay a game. The actions are applied
+# with SnakeGame.run_actions.
+Replay = namedtuple(
+    'Replay',
+    [
+        'board_size',
+        'walls',
+        'random_seed',
+        'actions',
+        'counter_rng',
+        'reachable_apples',
+    ],
+)
+Replay.__new__.__defaults__ = (False, False)
+
+# The layout of the header of a checkpoint made by SnakeGame.to_bytes.
+# It holds the magic bytes, format version, flags, board size, number
+# of steps, number of dropped directions, velocity, number of queued
+# velocities, snake length, apple position and level digest,
+# respectively.
+_CHECKPOINT_HEADER = struct.Struct('<4sBBHHIIBBII8s')
+_CHECKPOINT_MAGIC = b'SNKC'
+_CHECKPOINT_VERSION = 2
+# The layout of the state of a CounterRandom in a checkpoint, which
+# holds the seed, reduced to 64 bits, and the counter.
+_COUNTER_STATE = struct.Struct('<QQ')
+# The flags of a checkpoint.
+_COUNTER_RNG = 1
+_INLINE_WALLS = 2
+_WIDE_CELLS = 4
+_REACHABLE_APPLES = 8
+# Marks a missing apple.
+_NO_APPLE = 0xFFFFFFFF
+
+# Turns the byte 0 into the digit 1, and every other byte into the
+# digit 0, with bytes.translate.
+_FREE_DIGITS = b'1' + b'0'*255
+# Turns the digits 0 and 1 into the bytes 0 and 1 with
+# bytes.translate.
+_DIGIT_VALUES = bytes.maketrans(b'01', b'\x00\x01')
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _mix64(value):
+    """
+    Scramble the bits of a 64-bit integer.
 
+    This is the finalizer of the SplitMix64 generator.
+
+    Parameters
+    ----------
+    value : :class:`int`
+        The integer to scramble.
+
+    Returns
+    -------
+    :class:`int`
+        A 64-bit integer.
 
-class _Snake:
     """
-    Represents a snake in the :class:`.SnakeGame`.
+
+    value &= _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def counter_random(seed, counter):
+    """
+    Return the random number at position `counter` of a stream.
+
+    The result depends only on `seed` and `counter`, so any number
+    in the stream can be generated without generating the ones
+    before it. :func:`.batch.counter_random` gives bit-identical
+    results for arrays of seeds and counters.
+
+    Parameters
+    ----------
+    seed : :class:`int`
+        The seed of the stream.
+
+    counter : :class:`int`
+        The position of the number in the stream.
+
+    Returns
+    -------
+    :class:`int`
+        A random 64-bit integer.
+
+    """
+
+    return _mix64(_mix64(seed) + (counter+1)*_GOLDEN_GAMMA)
+
+
+class CounterRandom:
+    """
+    A counter-based random number generator.
+
+    The state of the generator is just a seed and a counter, which
+    counts the numbers generated so far. The same numbers can
+    therefore be generated by a batch of games or a replay, see
+    :func:`counter_random`.
 
     """
 
-    def __init__(self):
+    __slots__ = ('_seed', '_counter')
+
+    def __init__(self, seed, counter=0):
         """
-        Initialize a :class:`_Snake`.
+        Initialize a :class:`CounterRandom`.
+
+        Parameters
+        ----------
+        seed : :class:`int`
+            The seed of the generator.
+
+        counter : :class:`int`, optional
+            The number of numbers already generated.
 
         """
 
-        self._body = deque([(0, 0)])
-        self._velocity = (1, 0)
-        self._velocity_queue = deque([])
+        self._seed = seed
+        self._counter = counter
 
-    def get_body(self):
+    def randint(self, a, b):
         """
-        Yield the positions occupied by the snake.
+        Return a random integer in the range ``[a, b]``.
 
-        Yields
-        ------
+        Parameters
+        ----------
+        a : :class:`int`
+            The smallest possible value.
+
+        b : :class:`int`
+            The largest possible value.
+
+        Returns
+        -------
+        :class:`int`
+            The random integer.
+
+        """
+
+        value = counter_random(self._seed, self._counter)
+        self._counter += 1
+        return a + value % (b-a+1)
+
+    def getstate(self):
+        """
+        Return the state of the generator.
+
+        Returns
+        -------
         :class:`tuple`
-            The position of a segment of the snake's body.
+            A :class:`tuple` of the form ``(seed, counter)``.
 
         """
 
-        yield from self._body
+        return self._seed, self._counter
 
-    def take_step(self):
+    def setstate(self, state):
         """
-        Make the snake take a step.
+        Set the state of the generator.
+
+        Parameters
+        ----------
+        state : :class:`tuple`
+            A :class:`tuple` of the form ``(seed, counter)``, as
+            returned by :meth:`getstate`.
 
         Returns
         -------
@@ -49,386 +225,2109 @@ class _Snake:
 
         """
 
-        if self._velocity_queue:
-            new_velocity = self._velocity_queue.popleft()
-            if self._is_valid_velocity(new_velocity):
-                self._velocity = new_velocity
+        self._seed, self._counter = state
 
-        head_x, head_y = self._body[-1]
-        velocity_x, velocity_y = self._velocity
-        new_head = head_x + velocity_x, head_y + velocity_y
-        self._body.append(new_head)
-        self._body.popleft()
 
-    def _is_valid_velocity(self, velocity):
+def _get_level_digest(walls):
+    """
+    Return a short digest identifying a set of walls.
+
+    Parameters
+    ----------
+    walls : :class:`frozenset` of :class:`tuple`
+        The positions of the walls.
+
+    Returns
+    -------
+    :class:`bytes`
+        An 8 byte digest, which is the same for equal sets of walls.
+
+    """
+
+    digest = hashlib.blake2b(digest_size=8)
+    for x, y in sorted(walls):
+        digest.update(struct.pack('<ii', x, y))
+    return digest.digest()
+
+
+class _Board:
+    """
+    Maps the positions of a board to flat integer cells.
+
+    The board is padded by one cell on every side, so that the head of
+    a snake which has just escaped the board still has a cell. Cells
+    are numbered in the same order as the positions of the board are
+    iterated by ``itertools.product(range(board_x), range(board_y))``.
+
+    Boards are immutable and shared between games of the same size,
+    see :func:`_get_board`.
+
+    Attributes
+    ----------
+    board_size : :class:`tuple`
+        The size of the board in the x and y directions, without the
+        padding.
+
+    num_cells : :class:`int`
+        The number of cells, including the padding.
+
+    stride : :class:`int`
+        The difference between the cells of positions next to each
+        other in the x direction.
+
+    cells : :class:`list` of :class:`int`
+        Holds every cell, so that games can share the same
+        :class:`int` objects instead of each creating their own.
+
+    positions : :class:`list` of :class:`tuple`
+        The position of every cell.
+
+    outside : :class:`bytearray`
+        Holds ``1`` for every cell in the padding and ``0`` for every
+        cell on the board.
+
+    offsets : :class:`dict`
+        Maps every velocity to the difference between the cell of a
+        position and the cell of the next position in the direction
+        of the velocity.
+
+    neighbours : :class:`tuple` of :class:`list`
+        Holds, for each direction in :data:`ACTIONS`, the neighbour
+        of every cell in that direction, or ``-1`` if the neighbour
+        is outside the padding.
+
+    """
+
+    def __init__(self, board_size):
         """
-        Check if `velocity` is valid.
+        Initialize a :class:`_Board`.
 
-        A snake velocity is invalid if the snake is going up and the
-        `velocity` is down, or vice versa. Equally, `velocity` is
-        invalid if the snake is going left and `velocity` is right and
-        vice versa.
+        Parameters
+        ----------
+        board_size : :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        board_x, board_y = self.board_size = tuple(board_size)
+        self.stride = board_y + 2
+        self.num_cells = (board_x+2) * self.stride
+        self.cells = list(range(self.num_cells))
+        self.positions = [
+            (x, y)
+            for x in range(-1, board_x+1)
+            for y in range(-1, board_y+1)
+        ]
+        self.outside = bytearray(
+            not (0 <= x < board_x and 0 <= y < board_y)
+            for x, y in self.positions
+        )
+        self.offsets = {
+            (velocity_x, velocity_y): velocity_x*self.stride + velocity_y
+            for velocity_x, velocity_y in _VALID_VELOCITIES
+        }
+        self.neighbours = tuple(
+            [
+                self.get_cell((x+velocity_x, y+velocity_y), -1)
+                for x, y in self.positions
+            ]
+            for velocity_x, velocity_y in (
+                _VELOCITIES[action] for action in ACTIONS
+            )
+        )
+
+    def get_cell(self, position, default=None):
+        """
+        Return the cell of `position`.
 
         Parameters
         ----------
-        velocity : :class:`tuple`
-            A :class:`tuple` of the form ``(1, 0)`` representing a
-            possible snake velocity.
+        position : :class:`tuple`
+            A :class:`tuple` of the form ``(21, 12)``.
+
+        default : :class:`object`, optional
+            Returned if `position` has no cell.
 
         Returns
         -------
-        :class:`bool`
-            ``True`` if `velocity` is valid and ``False`` otherwise.
+        :class:`int`
+            The cell, or `default` if `position` is neither on the
+            board nor in its padding.
 
         """
 
-        invalid = {
-            frozenset({(0, 1), (0, -1)}),
-            frozenset({(1, 0), (-1, 0)})
-        }
-        valid = {
-            (0, 1), (0, -1), (1, 0), (-1, 0)
-        }
-        velocities = frozenset({velocity, self._velocity})
-        return velocities not in invalid and velocity in valid
+        x, y = position
+        board_x, board_y = self.board_size
+        if -1 <= x <= board_x and -1 <= y <= board_y:
+            return (x+1)*self.stride + y+1
+        return default
+
+
+_boards = {}
+
+
+def _get_board(board_size):
+    """
+    Return the :class:`_Board` of a board size.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Returns
+    -------
+    :class:`_Board`
+        The board, which is shared by every game of the same size.
+
+    """
+
+    board_size = tuple(board_size)
+    board = _boards.get(board_size)
+    if board is None:
+        board = _boards[board_size] = _Board(board_size)
+    return board
+
+
+@functools.lru_cache(maxsize=256)
+def _get_blocked_cells(board, walls):
+    """
+    Mark the cells a snake cannot move onto.
+
+    The result is cached, so that games on the same level share it.
+
+    Parameters
+    ----------
+    board : :class:`_Board`
+        The board.
+
+    walls : :class:`frozenset` of :class:`tuple`
+        The positions of the walls.
+
+    Returns
+    -------
+    :class:`bytes`
+        Holds ``1`` for every cell which is in the padding of `board`
+        or holds a wall and ``0`` otherwise.
+
+    """
+
+    blocked = bytearray(board.outside)
+    for wall in walls:
+        cell = board.get_cell(wall)
+        if cell is not None:
+            blocked[cell] = 1
+    return bytes(blocked)
+
+
+def _find_free_cell(occupied, index, free=0):
+    """
+    Find the free cell with a given index.
+
+    Parameters
+    ----------
+    occupied : :class:`bytes`
+        Holds `free` for every free cell.
 
-    def hit(self, walls):
+    index : :class:`int`
+        The index of the free cell to find, counting only free cells.
+
+    free : :class:`int`, optional
+        The value of free cells in `occupied`.
+
+    Returns
+    -------
+    :class:`int`
+        The cell.
+
+    """
+
+    # Skip over whole chunks of cells with bytes.count, so that only
+    # the last chunk is searched one free cell at a time.
+    chunk_size = 256
+    start = 0
+    while True:
+        num_free = occupied.count(free, start, start+chunk_size)
+        if index < num_free:
+            break
+        index -= num_free
+        start += chunk_size
+
+    cell = occupied.index(free, start)
+    for i in range(index):
+        cell = occupied.index(free, cell+1)
+    return cell
+
+
+def _get_reachable_cells(board, occupied, cell):
+    """
+    Find the cells reachable from `cell` with a flood fill.
+
+    The flood fill grows the reachable region by one step in every
+    direction at once, with each cell held by a bit of a big integer,
+    so each step takes a few operations on the whole board instead
+    of one operation per cell.
+
+    Parameters
+    ----------
+    board : :class:`_Board`
+        The board.
+
+    occupied : :class:`bytes`
+        Holds ``0`` for every cell of `board` which can be entered.
+        Every cell in the padding must be non-zero.
+
+    cell : :class:`int`
+        The starting cell, which must hold ``0`` in `occupied`.
+
+    Returns
+    -------
+    :class:`int`
+        Bit ``i`` is set if cell ``i`` is reachable from `cell`,
+        including `cell` itself.
+
+    """
+
+    free = int(occupied.translate(_FREE_DIGITS)[::-1], 2)
+    stride = board.stride
+    reachable = 1 << cell
+    while True:
+        grown = free & (
+            reachable
+            | reachable << 1
+            | reachable >> 1
+            | reachable << stride
+            | reachable >> stride
+        )
+        if grown == reachable:
+            return reachable
+        reachable = grown
+
+
+class _Snake:
+    """
+    Represents a snake in the :class:`.SnakeGame`.
+
+    The snake works with the cells of a :class:`_Board` rather than
+    with positions.
+
+    """
+
+    __slots__ = (
+        '_board',
+        '_walls',
+        '_velocity',
+        '_offset',
+        '_velocity_queue',
+        '_steered',
+        '_body',
+        '_counts',
+        '_num_cells',
+        '_hit',
+        '_escaped',
+    )
+
+    def __init__(self, board, walls, cell, velocity=(1, 0)):
         """
-        Check if the snake has hit a wall.
+        Initialize a :class:`_Snake`.
+
+        Parameters
+        ----------
+        board : :class:`_Board`
+            The board the snake is on.
+
+        walls : :class:`bytes`
+            Holds ``1`` for every cell of `board` which holds a wall
+            and ``0`` otherwise.
+
+        cell : :class:`int`
+            The starting cell of the snake.
+
+        velocity : :class:`tuple`, optional
+            The starting velocity of the snake.
+
+        """
+
+        self._board = board
+        self._walls = walls
+        self._velocity = velocity
+        self._offset = board.offsets[velocity]
+        # Only a few velocities are ever queued, so a list is both
+        # fast enough and much smaller than a deque.
+        self._velocity_queue = []
+        self._steered = False
+        self.set_body([cell])
+
+    def set_body(self, body):
+        """
+        Replace the body of the snake.
 
         Parameters
         ----------
-        walls : :class:`frozenset`
-            A :class:`frozenset` of the form
+        body : :class:`iterable` of :class:`int`
+            The cells of the segments of the snake, from the tail to
+            the head.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._body = deque()
+        # Holds the number of segments on every cell, so that lookups
+        # do not need to scan the body.
+        self._counts = bytearray(self._board.num_cells)
+        # The number of cells with at least one segment.
+        self._num_cells = 0
+        self._hit = False
+        self._escaped = False
+        for cell in body:
+            self._add_head(cell)
+
+    def reset(self, walls, body, velocity):
+        """
+        Replace the body, velocity and walls of the snake.
+
+        Unlike :meth:`set_body`, only the cells of the old and new
+        bodies are touched, so the cost does not depend on the size
+        of the board.
 
-            .. code-block:: python
+        Parameters
+        ----------
+        walls : :class:`bytes`
+            Holds ``1`` for every cell of the board which holds a
+            wall and ``0`` otherwise.
 
-                walls = {(0,2), (3, 4), (5,4)}
+        body : :class:`iterable` of :class:`int`
+            The cells of the segments of the snake, from the tail to
+            the head.
 
-            holding the coordinates of each bit of the walls.
+        velocity : :class:`tuple`
+            The velocity of the snake.
 
         Returns
         -------
-        :class:`bool`
-            ``True`` if the snake overlaps with any walls and
-            ``False`` otherwise.
+        None : :class:`NoneType`
 
         """
 
-        return any(piece in walls for piece in self._body)
+        counts = self._counts
+        for cell in self._body:
+            counts[cell] = 0
+        self._body.clear()
+        self._num_cells = 0
+        self._hit = False
+        self._escaped = False
+        self._walls = walls
+        self._velocity_queue.clear()
+        self._steered = False
+        self._set_velocity(velocity)
+        for cell in body:
+            self._add_head(cell)
+
+    def get_body(self):
+        """
+        Yield the cells occupied by the snake.
+
+        Yields
+        ------
+        :class:`int`
+            The cell of a segment of the snake's body.
 
-    def bite(self):
         """
-        Check if the snake has bitten itself.
+
+        yield from self._body
+
+    def get_head(self):
+        """
+        Return the cell of the snake's head.
 
         Returns
         -------
-        :class:`bool`
-            ``True`` if the snake has bitten itself and ``False``
-            otherwise.
+        :class:`int`
+            The cell of the head.
 
         """
 
-        # If the snake has bitten itself, some of its body pieces
-        # will overlap, which means duplicates will be present in
-        # self.body.
-        return len(set(self._body)) != len(self._body)
+        return self._body[-1]
 
-    def is_escaped(self, board_size):
+    def get_segment(self, index):
         """
-        Check is the snake has escaped the board.
+        Return the cell of a segment of the snake.
 
         Parameters
         ----------
-        board_size : :class:`tuple`
-            A :class:`tuple` of the form ``(21, 33)`` represting the
-            size of the board in the x and y directions.
+        index : :class:`int`
+            The index of the segment. ``0`` is the tail and ``-1`` is
+            the head.
 
         Returns
         -------
-        :class:`bool`
-            ``True`` if the snake has escaped the board and
-            ``False`` otherwise.
+        :class:`int`
+            The cell of the segment.
 
         """
 
-        min_x = min(x for x, y in self._body)
-        max_x = max(x for x, y in self._body)
-        min_y = min(y for x, y in self._body)
-        max_y = max(y for x, y in self._body)
+        return self._body[index]
 
-        board_x, board_y = board_size
-        return (
-            min_x < 0
-            or min_y < 0
-            or max_x >= board_x
-            or max_y >= board_y
-        )
+    def get_tail(self):
+        """
+        Return the cell of the snake's last segment.
+
+        Returns
+        -------
+        :class:`int`
+            The cell of the last segment.
 
-    def eat(self, apple):
         """
-        Make the snake eat the apple.
 
-        The snake will only eat the `apple` if its head is at the
-        same position as the `apple`.
+        return self._body[0]
+
+    def occupies(self, cell):
+        """
+        Check if the snake occupies `cell`.
 
         Parameters
         ----------
-        apple : :class:`tuple`
-            A :class:`tuple` of the form ``(21, 12)``, holding the
-            coordinates of the apple the snake is meant to eat.
+        cell : :class:`int`
+            A cell of the board.
 
         Returns
         -------
         :class:`bool`
-            ``True`` if the snake successfully ate the `apple` and
+            ``True`` if a segment of the snake is on `cell` and
             ``False`` otherwise.
 
         """
 
-        head_x, head_y = head = self._body[-1]
-        ate = head == apple
+        return self._counts[cell] != 0
+
+    def get_counts(self):
+        """
+        Return the number of segments on every cell.
+
+        Returns
+        -------
+        :class:`bytearray`
+            The number of segments on every cell. It is updated as
+            the snake moves and must not be modified.
+
+        """
+
+        return self._counts
+
+    def _add_head(self, cell):
+        """
+        Add a new head to the snake.
+
+        Parameters
+        ----------
+        cell : :class:`int`
+            The cell of the new head.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        # Use the board's int objects, so that each segment only costs
+        # a reference.
+        cell = self._board.cells[cell]
+        self._body.append(cell)
+        counts = self._counts
+        if not counts[cell]:
+            self._num_cells += 1
+        counts[cell] += 1
+        # Only a new head can make the snake hit a wall or escape the
+        # board, so checking here means the whole body never has to
+        # be checked.
+        if self._board.outside[cell]:
+            self._escaped = True
+        elif self._walls[cell]:
+            self._hit = True
+
+    def _remove_tail(self):
+        """
+        Remove the last segment of the snake.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        cell = self._body.popleft()
+        counts = self._counts
+        counts[cell] -= 1
+        if not counts[cell]:
+            self._num_cells -= 1
+
+    def take_step(self):
+        """
+        Make the snake take a step.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        # A step the snake was steered for leaves the queue alone.
+        if self._steered:
+            self._steered = False
+        elif self._velocity_queue:
+            new_velocity = self._velocity_queue.pop(0)
+            if self._is_valid_velocity(new_velocity):
+                self._set_velocity(new_velocity)
+
+        self._add_head(self._body[-1] + self._offset)
+        self._remove_tail()
+
+    def _set_velocity(self, velocity):
+        """
+        Set the velocity of the snake.
+
+        Parameters
+        ----------
+        velocity : :class:`tuple`
+            The velocity the snake should have.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._velocity = velocity
+        self._offset = self._board.offsets[velocity]
+
+    def steer(self, velocity):
+        """
+        Set the velocity of the snake immediately.
+
+        Unlike :meth:`queue_velocity`, the velocity is applied to the
+        very next step, which does not take a velocity from the
+        queue. Invalid velocities are ignored, but the next step
+        still leaves the queue alone.
+
+        Parameters
+        ----------
+        velocity : :class:`tuple`
+            The velocity the snake should have.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._steered = True
+        if self._is_valid_velocity(velocity):
+            self._set_velocity(velocity)
+
+    def _is_valid_velocity(self, velocity):
+        """
+        Check if `velocity` is valid.
+
+        A snake velocity is invalid if the snake is going up and the
+        `velocity` is down, or vice versa. Equally, `velocity` is
+        invalid if the snake is going left and `velocity` is right and
+        vice versa.
+
+        Parameters
+        ----------
+        velocity : :class:`tuple`
+            A :class:`tuple` of the form ``(1, 0)`` representing a
+            possible snake velocity.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if `velocity` is valid and ``False`` otherwise.
+
+        """
+
+        velocity_x, velocity_y = self._velocity
+        return (
+            velocity in _VALID_VELOCITIES
+            and velocity != (-velocity_x, -velocity_y)
+        )
+
+    def hit(self):
+        """
+        Check if the snake has hit a wall.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake overlaps with any walls and
+            ``False`` otherwise.
+
+        """
+
+        return self._hit
+
+    def bite(self):
+        """
+        Check if the snake has bitten itself.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake has bitten itself and ``False``
+            otherwise.
+
+        """
+
+        # If the snake has bitten itself, some of its body pieces
+        # will overlap, which means there are fewer occupied cells
+        # than segments.
+        return self._num_cells != len(self._body)
+
+    def is_escaped(self):
+        """
+        Check is the snake has escaped the board.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake has escaped the board and
+            ``False`` otherwise.
+
+        """
+
+        return self._escaped
+
+    def eat(self, apple):
+        """
+        Make the snake eat the apple.
+
+        The snake will only eat the `apple` if its head is on the
+        same cell as the `apple`.
+
+        Parameters
+        ----------
+        apple : :class:`int`
+            The cell of the apple the snake is meant to eat.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake successfully ate the `apple` and
+            ``False`` otherwise.
+
+        """
+
+        head = self._body[-1]
+        ate = head == apple
+        if ate:
+            self._add_head(head + self._offset)
+        return ate
+
+    def queue_velocity(self, velocity):
+        """
+        Queue a future snake velocity.
+
+        Parameters
+        ----------
+        velocity : :class:`tuple`
+            The velocity the snake should have.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._velocity_queue.append(velocity)
+
+    def get_num_queued_velocities(self):
+        """
+        Return the numbered of queued velocities.
+
+        Returns
+        -------
+        :class:`int`
+            The number of queued velocities.
+
+        """
+
+        return len(self._velocity_queue)
+
+    def get_velocity(self, step=0):
+        """
+        Get the velocity of the snake a step.
+
+        Parameters
+        ----------
+        step : :class:`int`, optional
+            The velocity at a given step. If ``0``then the current
+            velocity is returned.
+
+        Returns
+        -------
+        :class:`tuple
+            The velocity.
+
+        """
+
+        if step == 0:
+            return self._velocity
+
+        return self._velocity_queue[step-1]
+
+    def get_offset(self):
+        """
+        Return the difference between the cells of successive heads.
+
+        Returns
+        -------
+        :class:`int`
+            The offset, see :attr:`_Board.offsets`, of the current
+            velocity.
+
+        """
+
+        return self._offset
+
+    def get_length(self):
+        """
+        Return the length of the snake.
+
+        Returns
+        -------
+        :class:`int`
+            The length of the snake.
+
+        """
+
+        return len(self._body)
+
+
+class GameObserver:
+    """
+    Receives the events of a :class:`SnakeGame`.
+
+    Subclasses override the methods of the events they need, see
+    :meth:`SnakeGame.add_observer`. Every method does nothing by
+    default. Positions are given as tuples of the form ``(21, 12)``.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        class Recorder(GameObserver):
+            def __init__(self):
+                self.heads = []
+
+            def on_head_added(self, game, position):
+                self.heads.append(position)
+
+        recorder = Recorder()
+        game.add_observer(recorder)
+        game.run_actions(actions)
+
+    """
+
+    def on_head_added(self, game, position):
+        """
+        Handle the snake moving its head onto a position.
+
+        This happens once per step, and a second time in a step where
+        the snake eats an apple.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game.
+
+        position : :class:`tuple`
+            The position of the new head.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def on_tail_removed(self, game, position):
+        """
+        Handle the snake removing its last segment.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game.
+
+        position : :class:`tuple`
+            The position of the removed segment. Another segment may
+            still be on the same position.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def on_apple_eaten(self, game, position):
+        """
+        Handle the snake eating the apple.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game.
+
+        position : :class:`tuple`
+            The position of the eaten apple.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def on_apple_respawned(self, game, position):
+        """
+        Handle a new apple being placed.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game.
+
+        position : :class:`tuple`
+            The position of the new apple, or ``None`` if there is
+            no free position for it.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def on_death(self, game, cause):
+        """
+        Handle the death of the snake.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game.
+
+        cause : :class:`str`
+            The cause of death, see :meth:`SnakeGame.get_death_cause`.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+
+class SnakeView(Sequence):
+    """
+    A read-only view of the positions occupied by a snake.
+
+    The view does not copy the snake's body, and always shows its
+    current state. Index ``0`` is the tail and ``-1`` is the head.
+    Checking if the view holds a position takes constant time.
+
+    """
+
+    __slots__ = ('_game', )
+
+    def __init__(self, game):
+        """
+        Initialize a :class:`SnakeView`.
+
+        Parameters
+        ----------
+        game : :class:`SnakeGame`
+            The game whose snake is viewed.
+
+        """
+
+        self._game = game
+
+    def __len__(self):
+        return self._game._snake.get_length()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        game = self._game
+        return game._board.positions[game._snake.get_segment(index)]
+
+    def __iter__(self):
+        return self._game.get_snake()
+
+    def __contains__(self, position):
+        return self._game.snake_occupies(position)
+
+
+class SnakeGame:
+    """
+    Represents a game of snake.
+
+    The game can be run with :meth:`run`, or stepwise with
+    :meth:`run_stepwise`. The game runs in a self
+    contained loop and will not take input from the keyboard or
+    display itself on the screen. The game is interacted with purely
+    programatically. However, you can write code that captures keyboard
+    input and sends it to the game. You can also write code that looks
+    at the state of the game, as contained in this class, and writes
+    it to the screen. :class:`.GameIO` does both of these things.
+
+    The snake is controlled by setting its movement direction. This can
+    be done with :meth:`queue_snake_movement_direction`. The user will
+    use this method to queue which direction the snake will move, the
+    next time the snake takes a step. The queue allows the user
+    to queue several steps ahead, which results in the game feeling
+    more responsive when played.
+
+    :class:`SnakeGame` can be initialized with walls, allowing the
+    user to create a level.
+
+    If you want to interact with the game in an automated way
+    you can do something like
+
+    .. code-block:: python
+
+        def get_next_direction(game):
+            # This is a user-defined function which decides on the
+            # direction the snake should take on the next turn.
+
+            ...
+
+
+        def apply_action(game):
+            # This is a user-defined function which looks at the
+            # state of the game an decides on sending actions to it.
+
+            direction = get_next_direction(game)
+            game.queue_snake_movement_direction(direction)
+
+
+        game = SnakeGame(
+            board_size=(23, 34),
+            walls=((1, 1), (2, 2), (3, 3)),
+            random_seed=12,
+        )
+
+        for step_number in game.run_stepwise():
+            apply_action(game)
+
+    """
+
+    # Many games are often kept alive at once, so instances do not
+    # get a __dict__, see snake.memory.
+    __slots__ = (
+        '_generator',
+        '_board_size',
+        '_board',
+        '_walls',
+        '_blocked',
+        '_snake',
+        '_apple',
+        '_num_steps',
+        '_num_dropped_directions',
+        '_reachable',
+        '_reachable_stale',
+        '_observers',
+    )
+
+    def __init__(
+        self,
+        board_size,
+        walls,
+        random_seed,
+        counter_rng=False,
+        reachable_apples=False,
+    ):
+        """
+        Initialize a :class:`.SnakeGame`.
+
+        Parameters
+        ----------
+        board_size : :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        walls : :class:`iterable` of :class:`tuple`
+            An :class:`iterable` holding the position of every
+            wall segment.
+
+        random_seed : :class:`int`
+            The random seed to be used with the game. Used to generate
+            apple locations.
+
+        counter_rng : :class:`bool`, optional
+            If ``True``, apple locations are generated with a
+            :class:`CounterRandom`, so that the n-th apple depends
+            only on `random_seed` and n. This allows batched games
+            and replays to generate the same apples as this game.
+
+        reachable_apples : :class:`bool`, optional
+            If ``True``, apples are only placed on positions which
+            the snake's head can reach without crossing a wall or
+            its body, see :meth:`_update_reachable`.
+
+        """
+
+        if counter_rng:
+            self._generator = CounterRandom(random_seed)
+        else:
+            self._generator = random.Random(random_seed)
+        self._board_size = board_size
+        self._board = _get_board(board_size)
+        self._walls = frozenset(walls)
+        self._blocked = _get_blocked_cells(self._board, self._walls)
+        self._snake = _Snake(
+            board=self._board,
+            walls=self._blocked,
+            cell=self._board.get_cell((0, 0)),
+        )
+        self._observers = ()
+        self._set_reachable_apples(reachable_apples)
+        self._apple = self._get_new_apple()
+        self._num_steps = 0
+        self._num_dropped_directions = 0
+
+    @classmethod
+    def from_replay(cls, replay):
+        """
+        Create the game at the start of a :class:`Replay`.
+
+        Parameters
+        ----------
+        replay : :class:`Replay`
+            The replay.
+
+        Returns
+        -------
+        :class:`SnakeGame`
+            The game, before any of the actions of `replay` are
+            applied.
+
+        """
+
+        return cls(
+            board_size=replay.board_size,
+            walls=replay.walls,
+            random_seed=replay.random_seed,
+            counter_rng=replay.counter_rng,
+            reachable_apples=replay.reachable_apples,
+        )
+
+    def to_bytes(self, include_walls=False):
+        """
+        Save the state of the game into a compact checkpoint.
+
+        The checkpoint holds a header, the snake's body and velocity
+        queue, the apple and the state of the random number
+        generator. Positions are stored as the integer cells used by
+        the game, on a board padded by one position on every side.
+        The header takes 36 bytes, each queued velocity takes 1 byte
+        and each segment of the snake takes 2 bytes, or 4 bytes on
+        boards with more than 65535 cells. With ``counter_rng=True``,
+        the random number generator adds 16 bytes, so a checkpoint of
+        a short snake takes less than a hundred bytes. Otherwise, the
+        state of :class:`random.Random` adds 2510 bytes, about 2.5
+        kilobytes.
+
+        Parameters
+        ----------
+        include_walls : :class:`bool`, optional
+            If ``False``, the checkpoint only holds a digest of the
+            walls, and the walls must be passed to
+            :meth:`from_bytes`. This keeps checkpoints small when
+            many games are played on the same level. If ``True``,
+            the walls are stored in the checkpoint.
+
+        Returns
+        -------
+        :class:`bytes`
+            The checkpoint, which can be loaded with
+            :meth:`from_bytes`.
+
+        """
+
+        board_x, board_y = self._board_size
+        flags = 0
+        if (board_x+2)*(board_y+2) > 0xFFFF:
+            flags |= _WIDE_CELLS
+            cell_format = 'I'
+        else:
+            cell_format = 'H'
+        if include_walls:
+            flags |= _INLINE_WALLS
+        if self._reachable is not None:
+            flags |= _REACHABLE_APPLES
+
+        if isinstance(self._generator, CounterRandom):
+            flags |= _COUNTER_RNG
+            seed, counter = self._generator.getstate()
+            # Only the low 64 bits of the seed affect the numbers
+            # generated, so any int seed can be stored.
+            rng_state = _COUNTER_STATE.pack(seed & _MASK64, counter)
+        else:
+            version, internal_state, gauss_next = (
+                self._generator.getstate()
+            )
+            rng_state = struct.pack(
+                f'<B?d{len(internal_state)}I',
+                version,
+                gauss_next is not None,
+                gauss_next or 0.,
+                *internal_state,
+            )
+
+        velocity_codes = {
+            velocity: i for i, velocity in enumerate(_VELOCITIES.values())
+        }
+        snake = self._snake
+        queue = [
+            velocity_codes[snake.get_velocity(step)]
+            for step in range(1, snake.get_num_queued_velocities()+1)
+        ]
+        apple = _NO_APPLE if self._apple is None else self._apple
+        header = _CHECKPOINT_HEADER.pack(
+            _CHECKPOINT_MAGIC,
+            _CHECKPOINT_VERSION,
+            flags,
+            board_x,
+            board_y,
+            self._num_steps,
+            self._num_dropped_directions,
+            velocity_codes[snake.get_velocity()],
+            len(queue),
+            snake.get_length(),
+            apple,
+            _get_level_digest(self._walls),
+        )
+        body = struct.pack(
+            f'<{snake.get_length()}{cell_format}',
+            *snake.get_body(),
+        )
+        checkpoint = [header, bytes(queue), body, rng_state]
+        if include_walls:
+            walls = sorted(
+                cell for cell in map(self._board.get_cell, self._walls)
+                if cell is not None
+            )
+            checkpoint.append(
+                struct.pack(
+                    f'<I{len(walls)}{cell_format}',
+                    len(walls),
+                    *walls,
+                )
+            )
+        return b''.join(checkpoint)
+
+    @classmethod
+    def from_bytes(cls, checkpoint, walls=None):
+        """
+        Load a game from a checkpoint made by :meth:`to_bytes`.
+
+        Parameters
+        ----------
+        checkpoint : :class:`bytes`
+            The checkpoint.
+
+        walls : :class:`iterable` of :class:`tuple`, optional
+            The walls of the game. Must be provided if the checkpoint
+            was made with ``include_walls=False``.
+
+        Returns
+        -------
+        :class:`SnakeGame`
+            The game.
+
+        Raises
+        ------
+        :class:`ValueError`
+            If `checkpoint` is not a valid checkpoint, or if `walls`
+            are missing or are not the walls the checkpoint was made
+            with.
+
+        """
+
+        try:
+            return cls._from_bytes(memoryview(checkpoint), walls)
+        except (struct.error, IndexError) as error:
+            raise ValueError(
+                'The checkpoint is truncated or corrupt.'
+            ) from error
+
+    @classmethod
+    def _from_bytes(cls, checkpoint, walls):
+        """
+        Load a game from a checkpoint, without catching decoding errors.
+
+        Parameters
+        ----------
+        checkpoint : :class:`memoryview`
+            The checkpoint.
+
+        walls : :class:`iterable` of :class:`tuple`
+            The walls of the game, or ``None``.
+
+        Returns
+        -------
+        :class:`SnakeGame`
+            The game.
+
+        Raises
+        ------
+        :class:`struct.error`
+            If `checkpoint` is too short.
+
+        :class:`IndexError`
+            If `checkpoint` holds a cell or velocity which does not
+            exist.
+
+        """
+
+        (
+            magic,
+            version,
+            flags,
+            board_x,
+            board_y,
+            num_steps,
+            num_dropped_directions,
+            velocity,
+            num_queued,
+            length,
+            apple,
+            digest,
+        ) = _CHECKPOINT_HEADER.unpack_from(checkpoint)
+        if magic != _CHECKPOINT_MAGIC:
+            raise ValueError('This is not a snake game checkpoint.')
+        if version != _CHECKPOINT_VERSION:
+            raise ValueError(
+                f'Checkpoint version {version} is not supported.'
+            )
+
+        game = cls.__new__(cls)
+        game._board_size = board_x, board_y
+        game._board = board = _get_board(game._board_size)
+        cell_format = 'I' if flags & _WIDE_CELLS else 'H'
+        offset = _CHECKPOINT_HEADER.size
+
+        velocities = list(_VELOCITIES.values())
+        queue = checkpoint[offset:offset+num_queued]
+        offset += num_queued
+        body_format = f'<{length}{cell_format}'
+        body = struct.unpack_from(body_format, checkpoint, offset)
+        offset += struct.calcsize(body_format)
+
+        if flags & _COUNTER_RNG:
+            game._generator = CounterRandom(
+                *_COUNTER_STATE.unpack_from(checkpoint, offset)
+            )
+            offset += _COUNTER_STATE.size
+        else:
+            state_format = f'<B?d{len(random.Random().getstate()[1])}I'
+            version, has_gauss, gauss_next, *internal_state = (
+                struct.unpack_from(state_format, checkpoint, offset)
+            )
+            offset += struct.calcsize(state_format)
+            game._generator = random.Random()
+            game._generator.setstate((
+                version,
+                tuple(internal_state),
+                gauss_next if has_gauss else None,
+            ))
+
+        if flags & _INLINE_WALLS:
+            num_walls, = struct.unpack_from('<I', checkpoint, offset)
+            offset += 4
+            walls = map(
+                board.positions.__getitem__,
+                struct.unpack_from(
+                    f'<{num_walls}{cell_format}',
+                    checkpoint,
+                    offset,
+                ),
+            )
+        elif walls is None:
+            raise ValueError('The checkpoint does not hold the walls.')
+        game._walls = frozenset(walls)
+        if _get_level_digest(game._walls) != digest:
+            raise ValueError(
+                'The walls do not match the walls of the checkpoint.'
+            )
+        game._blocked = _get_blocked_cells(board, game._walls)
+
+        game._snake = _Snake(
+            board=board,
+            walls=game._blocked,
+            cell=body[0],
+            velocity=velocities[velocity],
+        )
+        game._snake.set_body(body)
+        game._observers = ()
+        for code in queue:
+            game._snake.queue_velocity(velocities[code])
+        game._set_reachable_apples(flags & _REACHABLE_APPLES)
+
+        game._apple = None if apple == _NO_APPLE else board.cells[apple]
+        game._num_steps = num_steps
+        game._num_dropped_directions = num_dropped_directions
+        return game
+
+    def reset(
+        self,
+        body=((0, 0), ),
+        direction='right',
+        apple=None,
+        random_seed=None,
+        walls=None,
+    ):
+        """
+        Restart the game from a new starting state.
+
+        Resetting a game is much cheaper than creating a new one,
+        because the board, the walls and the random number generator
+        are reused. Apart from placing a new apple, the cost only
+        depends on the lengths of the old and new snakes. Observers
+        stay registered.
+
+        Parameters
+        ----------
+        body : :class:`iterable` of :class:`tuple`, optional
+            The positions of the segments of the snake, from the tail
+            to the head.
+
+        direction : :class:`str`, optional
+            The direction the snake moves in. Can be ``'up'``,
+            ``'down'``, ``'right'`` or ``'left'``.
+
+        apple : :class:`tuple`, optional
+            The position of the apple. If ``None``, a new apple is
+            placed at random.
+
+        random_seed : :class:`int`, optional
+            A new random seed for the game. If ``None``, the random
+            number generator continues from its current state.
+
+        walls : :class:`iterable` of :class:`tuple`, optional
+            The positions of the walls of the new level, which must
+            fit the same board size. If ``None``, the walls are kept.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        Raises
+        ------
+        :class:`ValueError`
+            If the snake or the apple is not on the board.
+
+        """
+
+        board = self._board
+        cells = [board.get_cell(position) for position in body]
+        if not cells or any(
+            cell is None or board.outside[cell] for cell in cells
+        ):
+            raise ValueError('The snake must be on the board.')
+        if apple is not None:
+            cell = board.get_cell(apple)
+            if cell is None or board.outside[cell]:
+                raise ValueError(f'The apple at {apple} is not on the board.')
+            apple = cell
+
+        self._reset(
+            body=cells,
+            velocity=_VELOCITIES[direction],
+            apple=apple,
+            random_seed=random_seed,
+            walls=walls,
+        )
+
+    def _reset(self, body, velocity, apple, random_seed, walls):
+        """
+        Restart the game from a starting state given as cells.
+
+        Parameters
+        ----------
+        body : :class:`iterable` of :class:`int`
+            The cells of the segments of the snake, from the tail to
+            the head.
+
+        velocity : :class:`tuple`
+            The velocity of the snake.
+
+        apple : :class:`int`
+            The cell of the apple, or ``None`` to place a new apple.
+
+        random_seed : :class:`int`
+            A new random seed, or ``None`` to keep the random number
+            generator.
+
+        walls : :class:`frozenset` of :class:`tuple`
+            The positions of the new walls, or ``None`` to keep them.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if walls is not None and walls is not self._walls:
+            self._walls = frozenset(walls)
+            self._blocked = _get_blocked_cells(self._board, self._walls)
+        if random_seed is not None:
+            if isinstance(self._generator, CounterRandom):
+                self._generator.setstate((random_seed, 0))
+            else:
+                self._generator.seed(random_seed)
+
+        self._snake.reset(self._blocked, body, velocity)
+        self._num_steps = 0
+        self._num_dropped_directions = 0
+        if self._reachable is not None:
+            self._reachable_stale = True
+        if apple is None:
+            self._apple = self._get_new_apple()
+        else:
+            self._apple = self._board.cells[apple]
+
+    def _set_reachable_apples(self, reachable_apples):
+        """
+        Turn placing apples only on reachable positions on or off.
+
+        Parameters
+        ----------
+        reachable_apples : :class:`bool`
+            If ``True``, apples are only placed on reachable
+            positions.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if reachable_apples:
+            # Holds 1 for every free cell which the head can reach.
+            # It is kept up to date by _update_reachable, and only
+            # found again with a flood fill when it is stale.
+            self._reachable = bytearray(self._board.num_cells)
+            self._reachable_stale = True
+        else:
+            self._reachable = None
+            self._reachable_stale = False
+
+    def _find_reachable(self):
+        """
+        Find the free cells the head can reach with a flood fill.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        num_cells = self._board.num_cells
+        head = self._snake.get_head()
+        occupied = bytearray((
+            int.from_bytes(self._blocked, 'little')
+            | int.from_bytes(self._snake.get_counts(), 'little')
+        ).to_bytes(num_cells, 'little'))
+        occupied[head] = 0
+        reachable = _get_reachable_cells(self._board, occupied, head)
+        reachable &= ~(1 << head)
+        self._reachable[:] = (
+            format(reachable, f'0{num_cells}b')[::-1]
+            .encode()
+            .translate(_DIGIT_VALUES)
+        )
+        self._reachable_stale = False
+
+    def _update_reachable(self, old_head, tail):
+        """
+        Update the reachable cells after the snake moves.
+
+        The free cells reachable from the head, together with the
+        head, form a connected region. When the head moves, the old
+        head leaves this region, which can only split it if the
+        neighbours of the old head are not connected to each other
+        through the 8 positions around it. When the tail moves, the
+        cell it leaves joins the region if it is next to it, and can
+        only merge another region into it if it is also next to a
+        free cell outside the region. Only if one of these checks
+        fails is the region marked as stale, to be found again with
+        a flood fill when the next apple is placed.
+
+        Parameters
+        ----------
+        old_head : :class:`int`
+            The cell of the head before the move.
+
+        tail : :class:`int`
+            The cell the tail left, or ``None`` if the tail did not
+            move.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        snake = self._snake
+        head = snake.get_head()
+        blocked = self._blocked
+        counts = snake.get_counts()
+        reachable = self._reachable
+        if self._reachable_stale or blocked[head] or counts[head] > 1:
+            # The snake died, or the region must be found again
+            # anyway.
+            self._reachable_stale = True
+            return
+
+        reachable[head] = 0
+        stride = self._board.stride
+        # The positions around the old head, in order around it,
+        # starting above it.
+        ring = [
+            old_head+offset
+            for offset in (
+                1, stride+1, stride, stride-1,
+                -1, -stride-1, -stride, -stride+1,
+            )
+        ]
+        # Positions in the region are free or hold the head.
+        in_region = [
+            not blocked[cell] and (not counts[cell] or cell == head)
+            for cell in ring
+        ]
+        # Count the groups of neighbours of the old head which are
+        # connected through the ring. The neighbours are at the even
+        # indices of the ring, with the corners between them at the
+        # odd indices.
+        num_groups = 0
+        for i in range(0, 8, 2):
+            if in_region[i] and not (in_region[i-2] and in_region[i-1]):
+                num_groups += 1
+        if num_groups > 1:
+            self._reachable_stale = True
+            return
+
+        if tail is None or counts[tail] or blocked[tail]:
+            return
+        joins = False
+        merges = False
+        for neighbours in self._board.neighbours:
+            neighbour = neighbours[tail]
+            if neighbour == head or reachable[neighbour]:
+                joins = True
+            elif not blocked[neighbour] and not counts[neighbour]:
+                merges = True
+        if joins:
+            reachable[tail] = 1
+            self._reachable_stale = merges
+
+    def _get_new_apple(self):
+        """
+        Generate the cell of a new apple.
+
+        The apple is placed on a random position of the board which
+        holds no wall and no segment of the snake. If apples are
+        only placed on reachable positions, but the snake has closed
+        itself off from every free position, any free position is
+        used.
+
+        Returns
+        -------
+        :class:`int`
+            The cell of a new apple, or ``None`` if there are no
+            free positions.
+
+        """
+
+        if self._reachable is not None:
+            if self._reachable_stale:
+                self._find_reachable()
+            num_reachable = self._reachable.count(1)
+            if num_reachable:
+                index = self._generator.randint(0, num_reachable-1)
+                return self._board.cells[
+                    _find_free_cell(self._reachable, index, 1)
+                ]
+
+        # The blocked cells and the cells of the snake are combined
+        # as big integers, which is much faster than doing it one
+        # cell at a time.
+        num_cells = self._board.num_cells
+        occupied = (
+            int.from_bytes(self._blocked, 'little')
+            | int.from_bytes(self._snake.get_counts(), 'little')
+        ).to_bytes(num_cells, 'little')
+        num_free = occupied.count(0)
+        if num_free == 0:
+            return None
+
+        # Avoid looping through all the free cells by generating the
+        # index of the chosen cell ahead of time.
+        index = self._generator.randint(0, num_free-1)
+        return self._board.cells[_find_free_cell(occupied, index)]
+
+    def _take_step(self):
+        """
+        Take a single game step.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake ate the apple during the step and
+            ``False`` otherwise.
+
+        """
+
+        self._num_steps += 1
+        snake = self._snake
+        if self._reachable is None and not self._observers:
+            snake.take_step()
+            if snake.eat(self._apple):
+                self._apple = self._get_new_apple()
+                return True
+            return False
+
+        return self._take_tracked_step()
+
+    def _take_tracked_step(self):
+        """
+        Take a step which updates the reachable cells or observers.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the snake ate the apple during the step and
+            ``False`` otherwise.
+
+        """
+
+        snake = self._snake
+        positions = self._board.positions
+        observers = self._observers
+        reachable = self._reachable is not None
+
+        old_head = snake.get_head()
+        tail = snake.get_tail()
+        snake.take_step()
+        if reachable:
+            self._update_reachable(old_head, tail)
+        for observer in observers:
+            observer.on_head_added(self, positions[snake.get_head()])
+            observer.on_tail_removed(self, positions[tail])
+
+        old_head = snake.get_head()
+        ate = snake.eat(self._apple)
         if ate:
-            velocity_x, velocity_y = self._velocity
-            new_head = head_x + velocity_x, head_y + velocity_y
-            self._body.append(new_head)
+            if reachable:
+                self._update_reachable(old_head, None)
+            apple = positions[self._apple]
+            for observer in observers:
+                observer.on_apple_eaten(self, apple)
+                observer.on_head_added(self, positions[snake.get_head()])
+            self._apple = self._get_new_apple()
+            apple = self.get_apple()
+            for observer in observers:
+                observer.on_apple_respawned(self, apple)
+
+        if observers and self.is_game_over():
+            cause = self.get_death_cause()
+            for observer in observers:
+                observer.on_death(self, cause)
         return ate
 
-    def queue_velocity(self, velocity):
+    def is_game_over(self):
         """
-        Queue a future snake velocity.
-
-        Parameters
-        ----------
-        velocity : :class:`tuple`
-            The velocity the snake should have.
+        Check if the snake has died.
 
         Returns
         -------
-        None : :class:`NoneType`
+        :class:`bool`
+            ``True`` if the snake has hit a wall, bitten itself or
+            escaped the board and ``False`` otherwise.
 
         """
 
-        self._velocity_queue.append(velocity)
+        return (
+            self._snake.hit()
+            or self._snake.bite()
+            or self._snake.is_escaped()
+        )
 
-    def get_num_queued_velocities(self):
+    def get_death_cause(self):
         """
-        Return the numbered of queued velocities.
+        Return the cause of the snake's death.
 
         Returns
         -------
-        :class:`int`
-            The number of queued velocities.
+        :class:`str`
+            ``'wall'`` if the snake hit a wall, ``'bite'`` if it bit
+            itself and ``'escape'`` if it left the board, or ``None``
+            if the snake is alive.
 
         """
 
-        return len(self._velocity_queue)
+        snake = self._snake
+        if snake.is_escaped():
+            return 'escape'
+        if snake.hit():
+            return 'wall'
+        if snake.bite():
+            return 'bite'
+        return None
 
-    def get_velocity(self, step=0):
+    def add_observer(self, observer):
         """
-        Get the velocity of the snake a step.
+        Send the events of every future step to `observer`.
+
+        Observers let renderers and recorders follow the game from
+        the changes made by each step, instead of reading the whole
+        state of the game after every step.
 
         Parameters
         ----------
-        step : :class:`int`, optional
-            The velocity at a given step. If ``0``then the current
-            velocity is returned.
+        observer : :class:`GameObserver`
+            The observer.
 
         Returns
         -------
-        :class:`tuple
-            The velocity.
+        None : :class:`NoneType`
 
         """
 
-        if step == 0:
-            return self._velocity
-
-        return self._velocity_queue[step-1]
+        self._observers = (*self._observers, observer)
 
-    def get_length(self):
+    def remove_observer(self, observer):
         """
-        Return the length of the snake.
+        Stop sending events to `observer`.
+
+        Parameters
+        ----------
+        observer : :class:`GameObserver`
+            An observer added with :meth:`add_observer`.
 
         Returns
         -------
-        :class:`int`
-            The length of the snake.
+        None : :class:`NoneType`
 
         """
 
-        return len(self._body)
-
-
-class SnakeGame:
-    """
-    Represents a game of snake.
-
-    The game can be run with :meth:`run`, or stepwise with
-    :meth:`run_stepwise`. The game runs in a self
-    contained loop and will not take input from the keyboard or
-    display itself on the screen. The game is interacted with purely
-    programatically. However, you can write code that captures keyboard
-    input and sends it to the game. You can also write code that looks
-    at the state of the game, as contained in this class, and writes
-    it to the screen. :class:`.GameIO` does both of these things.
-
-    The snake is controlled by setting its movement direction. This can
-    be done with :meth:`queue_snake_movement_direction`. The user will
-    use this method to queue which direction the snake will move, the
-    next time the snake takes a step. The queue allows the user
-    to queue several steps ahead, which results in the game feeling
-    more responsive when played.
+        observers = list(self._observers)
+        observers.remove(observer)
+        self._observers = tuple(observers)
+
+    def run(
+        self,
+        policy=None,
+        max_steps=None,
+        max_steps_without_apple=None,
+        on_event=None,
+        action_repeat=1,
+    ):
+        """
+        Run the game.
 
-    :class:`SnakeGame` can be initialized with walls, allowing the
-    user to create a level.
+        Without a `policy`, the snake follows the directions queued
+        with :meth:`queue_snake_movement_direction`. With a `policy`,
+        it is called directly inside the game loop before every step,
+        which is cheaper than driving the game through
+        :meth:`run_stepwise`.
 
-    If you want to interact with the game in an automated way
-    you can do something like
+        Parameters
+        ----------
+        policy : :class:`callable`, optional
+            Takes the game as its only argument and returns the action
+            for the next step, either ``'up'``, ``'down'``, ``'right'``
+            or ``'left'``, or an :class:`int` which indexes into
+            :data:`ACTIONS`. The action is applied to the next step
+            directly, bypassing the movement direction queue. If
+            ``None`` is returned, the snake follows its queued
+            directions instead.
+
+        max_steps : :class:`int`, optional
+            The maximum number of steps to take. If ``None``, there is
+            no limit.
+
+        max_steps_without_apple : :class:`int`, optional
+            The maximum number of consecutive steps the snake can take
+            without eating an apple, before the game is stopped. If
+            ``None``, there is no limit.
+
+        on_event : :class:`callable`, optional
+            Called as ``on_event(event, game)`` when something
+            interesting happens. `event` is ``'apple'`` when the snake
+            eats an apple, ``'death'`` when the snake dies,
+            ``'max_steps'`` when `max_steps` is reached and
+            ``'starvation'`` when `max_steps_without_apple` is
+            reached. It is not called on other steps.
+
+        action_repeat : :class:`int`, optional
+            The number of steps each action of `policy` is applied
+            for. `policy` is only called once every `action_repeat`
+            steps.
 
-    .. code-block:: python
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken.
 
-        def get_next_direction(game):
-            # This is a user-defined function which decides on the
-            # direction the snake should take on the next turn.
+        """
 
-            ...
+        num_steps = steps_without_apple = 0
+        velocities = _ACTION_VELOCITIES
+        steer = self._snake.steer
+        velocity = None
+        while not self.is_game_over():
+            if max_steps is not None and num_steps >= max_steps:
+                event = 'max_steps'
+                break
+            if (
+                max_steps_without_apple is not None
+                and steps_without_apple >= max_steps_without_apple
+            ):
+                event = 'starvation'
+                break
+
+            if policy is not None:
+                if num_steps % action_repeat == 0:
+                    action = policy(self)
+                    velocity = None if action is None else velocities[action]
+                if velocity is not None:
+                    steer(velocity)
+
+            num_steps += 1
+            if self._take_step():
+                steps_without_apple = 0
+                if on_event is not None:
+                    on_event('apple', self)
+            else:
+                steps_without_apple += 1
+        else:
+            event = 'death'
+
+        if on_event is not None:
+            on_event(event, self)
+        return num_steps
+
+    def run_actions(self, actions):
+        """
+        Run the game using a precomputed sequence of actions.
 
+        Each action sets the direction of the snake for exactly one
+        step, bypassing the movement direction queue, so sequences of
+        any length can be applied. Queued directions are kept for
+        later steps. All actions are executed in a single
+        loop, which stops as soon as the snake dies.
 
-        def apply_action(game):
-            # This is a user-defined function which looks at the
-            # state of the game an decides on sending actions to it.
+        Parameters
+        ----------
+        actions : :class:`iterable`
+            The actions to apply, one per step. Each action can be
+            ``'up'``, ``'down'``, ``'right'`` or ``'left'``, or an
+            :class:`int` which indexes into :data:`ACTIONS`, so that
+            arrays of integers can be used directly. Actions which
+            would reverse the snake are ignored, like they are in
+            :meth:`queue_snake_movement_direction`.
 
-            direction = get_next_direction(game)
-            game.queue_snake_movement_direction(direction)
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(alive, num_steps,
+            num_apples)``, holding whether the snake is still alive,
+            the number of steps taken and the number of apples eaten,
+            respectively.
 
+        """
 
-        game = SnakeGame(
-            board_size=(23, 34),
-            walls=((1, 1), (2, 2), (3, 3)),
-            random_seed=12,
-        )
+        num_steps = num_apples = 0
+        if self.is_game_over():
+            return False, num_steps, num_apples
 
-        for step_number in game.run_stepwise():
-            apply_action(game)
+        velocities = _ACTION_VELOCITIES
+        steer = self._snake.steer
+        for action in actions:
+            steer(velocities[action])
+            num_apples += self._take_step()
+            num_steps += 1
+            if self.is_game_over():
+                return False, num_steps, num_apples
 
-    """
+        return True, num_steps, num_apples
 
-    def __init__(self, board_size, walls, random_seed):
+    def step(self, action=None, repeat=1):
         """
-        Initialize a :class:`.SnakeGame`.
+        Take steps with the same action.
 
         Parameters
         ----------
-        board_size : :class:`tuple`
-            A :class:`tuple` of the form ``(23, 12)`` which represents
-            the size of the board in the x and y directions.
-
-        walls : :class:`iterable` of :class:`tuple`
-            An :class:`iterable` holding the position of every
-            wall segment.
+        action : :class:`str` or :class:`int`, optional
+            Can be ``'up'``, ``'down'``, ``'right'`` or ``'left'``, or
+            an :class:`int` which indexes into :data:`ACTIONS`. It is
+            applied to every step directly, bypassing the movement
+            direction queue, whose directions are kept for later
+            steps. If ``None``, the snake follows its queued
+            directions.
+
+        repeat : :class:`int`, optional
+            The number of steps to take. Fewer steps are taken if the
+            snake dies.
 
-        random_seed : :class:`int`
-            The random seed to be used with the game. Used to generate
-            apple locations.
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(num_apples, alive)``,
+            holding the number of apples eaten during the steps and
+            whether the snake is still alive, respectively.
 
         """
 
-        self._generator = random.Random(random_seed)
-        self._board_size = board_size
-        self._snake = _Snake()
-        self._walls = frozenset(walls)
-        self._apple = self._get_new_apple()
+        num_apples = 0
+        steer = self._snake.steer
+        velocity = None if action is None else _ACTION_VELOCITIES[action]
+        for i in range(repeat):
+            if self.is_game_over():
+                return num_apples, False
+            if velocity is not None:
+                steer(velocity)
+            num_apples += self._take_step()
 
-    def _get_new_apple(self):
+        return num_apples, not self.is_game_over()
+
+    def run_stepwise(self):
         """
-        Generate new :attr:`_apple` coordinates.
+        Run the game, but yield after every step.
 
-        Returns
-        -------
-        :class:`tuple`
-            The position of a new apple.
+        Yields
+        ------
+        :class:`int`
+            The step number.
 
         """
 
-        snake_body = self._snake.get_body()
-        board_x, board_y = self._board_size
-        board_positions = it.product(
-            range(0, board_x),
-            range(0, board_y),
-        )
-        valid_positions = (
-            pos for pos in board_positions
-            if pos not in set(snake_body) and pos not in self._walls
-        )
-        # The number of valid apple positions is given
-        # by the total board size minus the walls and the length of the
-        # snake, as each bit of the snake and each wall must occupy an
-        # empty position.
-        board_size = board_x * board_y
-        max_index = (
-            board_size-len(self._walls)-self._snake.get_length()-1
-        )
-        # Avoid looping through all the valid apple positions by
-        # generating the index of the chosen position ahead of time
-        # and returning as soon as the position with that index is
-        # found.
-        index = self._generator.randint(0, max_index)
-        for i, position in enumerate(valid_positions):
-            if i == index:
-                return position
+        step_number = 0
+        while not self.is_game_over():
+            self._take_step()
+            step_number += 1
+            yield step_number
 
-    def _take_step(self):
+    def _is_blocked(self, cell):
         """
-        Take a single game step.
+        Check if the snake would die by moving onto `cell`.
+
+        Parameters
+        ----------
+        cell : :class:`int`
+            A cell of the board, or ``-1`` for a position outside the
+            padding of the board.
 
         Returns
         -------
-        None : :class:`NoneType`
+        :class:`bool`
+            ``True`` if `cell` is outside the board or holds a wall
+            or a segment of the snake and ``False`` otherwise.
 
         """
 
-        self._snake.take_step()
-        if self._snake.eat(self._apple):
-            self._apple = self._get_new_apple()
+        return (
+            cell == -1
+            or self._blocked[cell] != 0
+            or self._snake.occupies(cell)
+        )
 
-    def run(self):
+    def _get_free_distance(self, direction):
         """
-        Run the game.
+        Count the free cells in front of the snake's head.
+
+        Parameters
+        ----------
+        direction : :class:`int`
+            The index, in :data:`ACTIONS`, of the direction in which
+            cells are counted.
 
         Returns
         -------
-        None : :class:`NoneType`
+        :class:`int`
+            The number of steps the snake could take in `direction`
+            before it dies.
 
         """
 
-        while (
-            not self._snake.hit(self._walls) and
-            not self._snake.bite() and
-            not self._snake.is_escaped(self._board_size)
-        ):
-            self._take_step()
+        neighbours = self._board.neighbours[direction]
+        is_blocked = self._is_blocked
+        cell = neighbours[self._snake.get_head()]
+        distance = 0
+        while not is_blocked(cell):
+            cell = neighbours[cell]
+            distance += 1
+        return distance
 
-    def run_stepwise(self):
+    def get_features(self):
         """
-        Run the game, but yield after every step.
+        Return a compact description of the game state.
 
-        Yields
-        ------
-        :class:`int`
-            The step number.
+        The features are computed from the game's internal
+        structures, so they are much cheaper than reconstructing
+        them from :meth:`get_snake` and :meth:`get_walls`. To fill
+        a matrix of features for many games at once, see
+        :func:`.fill_features`.
+
+        Returns
+        -------
+        :class:`tuple` of :class:`int`
+            The features, whose names are given by :data:`FEATURES`.
+            The danger features are ``1`` if the snake would die by
+            moving ahead, left or right, relative to its current
+            direction, and ``0`` otherwise. The apple direction
+            features are ``-1``, ``0`` or ``1``, giving the sign of
+            the apple's position relative to the snake's head, and
+            are ``0`` if there is no apple. The free features give
+            the number of steps the snake could take in each direction
+            before it dies.
 
         """
 
-        step_number = 0
-        while (
-            not self._snake.hit(self._walls) and
-            not self._snake.bite() and
-            not self._snake.is_escaped(self._board_size)
-        ):
-            self._take_step()
-            step_number += 1
-            yield step_number
+        board = self._board
+        head = self._snake.get_head()
+        velocity_x, velocity_y = self._snake.get_velocity()
+        neighbours = board.neighbours
+        ahead = _VELOCITY_ACTIONS[velocity_x, velocity_y]
+        left = _VELOCITY_ACTIONS[-velocity_y, velocity_x]
+        right = _VELOCITY_ACTIONS[velocity_y, -velocity_x]
+        is_blocked = self._is_blocked
+
+        head_x, head_y = board.positions[head]
+        if self._apple is None:
+            apple_x, apple_y = head_x, head_y
+        else:
+            apple_x, apple_y = board.positions[self._apple]
+
+        free_distance = self._get_free_distance
+        return (
+            int(is_blocked(neighbours[ahead][head])),
+            int(is_blocked(neighbours[left][head])),
+            int(is_blocked(neighbours[right][head])),
+            (apple_x > head_x) - (apple_x < head_x),
+            (apple_y > head_y) - (apple_y < head_y),
+            free_distance(0),
+            free_distance(1),
+            free_distance(2),
+            free_distance(3),
+            self._snake.get_length(),
+        )
 
     def get_snake_velocity(self, step=0):
         """
@@ -470,25 +2369,50 @@ class SnakeGame:
         -------
         :class:`bool`
             ``True`` if a movement direction was successfully queued
-            and ``False`` otherwise.
+            and ``False`` if the queue was full, in which case the
+            direction is dropped, see
+            :meth:`get_num_dropped_directions`.
 
         """
 
-        if direction == 'up':
-            velocity = (0, 1)
-        elif direction == 'down':
-            velocity = (0, -1)
-        elif direction == 'right':
-            velocity = (1, 0)
-        elif direction == 'left':
-            velocity = (-1, 0)
+        velocity = _VELOCITIES[direction]
 
         if self._snake.get_num_queued_velocities() < 5:
             self._snake.queue_velocity(velocity)
             return True
 
+        self._num_dropped_directions += 1
         return False
 
+    def get_num_queued_directions(self):
+        """
+        Return the number of queued movement directions.
+
+        Returns
+        -------
+        :class:`int`
+            The number of movement directions waiting to be applied.
+
+        """
+
+        return self._snake.get_num_queued_velocities()
+
+    def get_num_dropped_directions(self):
+        """
+        Return the number of movement directions dropped so far.
+
+        A movement direction is dropped if it is queued while the
+        queue is full.
+
+        Returns
+        -------
+        :class:`int`
+            The number of dropped movement directions.
+
+        """
+
+        return self._num_dropped_directions
+
     def get_snake(self):
         """
         Yield the positions occupied by the snake.
@@ -500,7 +2424,90 @@ class SnakeGame:
 
         """
 
-        yield from self._snake.get_body()
+        yield from map(
+            self._board.positions.__getitem__,
+            self._snake.get_body(),
+        )
+
+    def get_snake_view(self):
+        """
+        Return a read-only view of the positions occupied by the snake.
+
+        Returns
+        -------
+        :class:`SnakeView`
+            The view, which supports :func:`len`, ``in`` and indexing
+            without copying the snake, and follows the snake as the
+            game runs.
+
+        """
+
+        return SnakeView(self)
+
+    def get_snake_head(self):
+        """
+        Return the position of the snake's head.
+
+        Returns
+        -------
+        :class:`tuple`
+            The position of the head.
+
+        """
+
+        return self._board.positions[self._snake.get_head()]
+
+    def get_snake_tail(self):
+        """
+        Return the position of the snake's last segment.
+
+        Returns
+        -------
+        :class:`tuple`
+            The position of the last segment.
+
+        """
+
+        return self._board.positions[self._snake.get_tail()]
+
+    def get_snake_segment(self, index):
+        """
+        Return the position of a segment of the snake.
+
+        Parameters
+        ----------
+        index : :class:`int`
+            The index of the segment. ``0`` is the tail and ``-1`` is
+            the head.
+
+        Returns
+        -------
+        :class:`tuple`
+            The position of the segment.
+
+        """
+
+        return self._board.positions[self._snake.get_segment(index)]
+
+    def snake_occupies(self, position):
+        """
+        Check if the snake occupies `position`.
+
+        Parameters
+        ----------
+        position : :class:`tuple`
+            A :class:`tuple` of the form ``(21, 12)``.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if a segment of the snake is at `position` and
+            ``False`` otherwise.
+
+        """
+
+        cell = self._board.get_cell(position)
+        return cell is not None and self._snake.occupies(cell)
 
     def get_walls(self):
         """
@@ -515,6 +2522,20 @@ class SnakeGame:
 
         yield from self._walls
 
+    def get_walls_view(self):
+        """
+        Return a read-only view of the positions of the walls.
+
+        Returns
+        -------
+        :class:`frozenset` of :class:`tuple`
+            The positions of the walls. The walls never change, so
+            this is the set held by the game, not a copy.
+
+        """
+
+        return self._walls
+
     def get_apple(self):
         """
         Return the coordinates of the apple.
@@ -523,11 +2544,14 @@ class SnakeGame:
         -------
         :class:`tuple`
             A :class:`tuple` of the form ``(21, 12)``, holding the
-            coordinates of the apple the snake is meant to eat.
+            coordinates of the apple the snake is meant to eat, or
+            ``None`` if there is no free position for an apple.
 
         """
 
-        return self._apple
+        if self._apple is None:
+            return None
+        return self._board.positions[self._apple]
 
     def get_board_size(self):
         """
@@ -555,3 +2579,16 @@ class SnakeGame:
         """
 
         return self._snake.get_length()
+
+    def get_num_steps(self):
+        """
+        Return the number of steps taken so far.
+
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken.
+
+        """
+
+        return self._num_steps
@@ -3,6 +3,14 @@ import time
 import curses
 from threading import Thread, Lock
 import os
+import select
+import termios
+import tty
+
+
+# The width and height of the tiles used to index the walls by
+# position.
+_TILE_SIZE = 16
 
 
 class GameIO:
@@ -33,7 +41,11 @@ class GameIO:
         game,
         speed=0.1,
         player_name='player',
-        score_file='scores'
+        score_file='scores',
+        minimap=False,
+        trace_latency=False,
+        leaderboard=None,
+        backend='curses',
     ):
         """
         Initialize an instance of :class:`GameIO`.
@@ -54,14 +66,55 @@ class GameIO:
         score_file : :class:`str`, optional
             The path to a file which keeps track of scores.
 
+        minimap : :class:`bool`, optional
+            If ``True``, a downsampled map of the entire board is
+            shown, which is useful when the board is larger than the
+            terminal.
+
+        trace_latency : :class:`bool`, optional
+            If ``True``, the latency between key presses, the steps
+            which apply them and the frames which show them is
+            traced with a :class:`LatencyTracer`, and a report is
+            printed when the game ends.
+
+        leaderboard : :class:`.Leaderboard`, optional
+            If given, the high scores are taken from `leaderboard`,
+            which is updated before they are shown, instead of being
+            read from `score_file`.
+
+        backend : :class:`str` or :class:`object`, optional
+            The backend which draws to the terminal and reads the
+            keyboard. Can be ``'curses'`` for a
+            :class:`CursesBackend` or ``'ansi'`` for an
+            :class:`AnsiBackend`, or a backend instance.
+
         """
 
         self._game = game
         self._player_name = player_name
         self._speed = speed
         self._score_file = score_file
+        self._minimap = minimap
         self._lock = Lock()
-        curses.wrapper(self._run)
+        self._latency_tracer = LatencyTracer() if trace_latency else None
+        self._leaderboard = leaderboard
+        if isinstance(backend, str):
+            backend = BACKENDS[backend]()
+        self._backend = backend
+
+        # Index the walls by tile, so that only the walls near the
+        # visible part of the board need to be looked at.
+        self._wall_tiles = {}
+        for x, y in game.get_walls():
+            tile = x // _TILE_SIZE, y // _TILE_SIZE
+            self._wall_tiles.setdefault(tile, []).append((x, y))
+
+        self._backend.wrapper(self._run)
+
+        if self._latency_tracer is not None:
+            print(self._latency_tracer.get_report(
+                num_dropped=game.get_num_dropped_directions(),
+            ))
 
     def _run(self, stdscr):
         """
@@ -70,8 +123,8 @@ class GameIO:
         Parameters
         ----------
         stdscr : :class:`curses.window`
-            A :class:`curses.window` which represents the entire
-            terminal screen.
+            A :class:`curses.window`, or the window of another
+            backend, which represents the entire terminal screen.
 
         Returns
         -------
@@ -79,12 +132,9 @@ class GameIO:
 
         """
 
-        # Set up curses.
+        # Set up the terminal.
         self._stdscr = stdscr
-        stdscr.keypad(True)
-        curses.noecho()
-        curses.cbreak()
-        curses.curs_set(0)
+        self._backend.setup(stdscr)
 
         # Create the game window.
         self._create_game_window()
@@ -95,13 +145,22 @@ class GameIO:
         # Create the high scores window.
         self._create_high_scores_window()
 
+        # Create the minimap window.
+        self._minimap_window = None
+        if self._minimap:
+            self._create_minimap_window()
+
         # Start capturing input from the user.
         input_thread = Thread(target=self._capture_inputs)
         input_thread.start()
 
         # While the game is running, render it.
-        for step in self._game.run_stepwise():
+        tracer = self._latency_tracer
+        while not self._game.is_game_over():
+            self._take_step()
             self._render()
+            if tracer is not None:
+                tracer.frame_shown()
             time.sleep(self._speed)
 
         # When the game stops, do a cleanup.
@@ -113,6 +172,50 @@ class GameIO:
         with open(self._score_file, 'a') as f:
             f.write(f'{self._player_name} {score}\n')
 
+    def _take_step(self):
+        """
+        Make the game take a step.
+
+        The step and the record of it in the latency tracer happen
+        while the lock is held, like the key presses in
+        :meth:`_queue_direction`, so that every key press is credited
+        to the step which applies it.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        with self._lock:
+            self._game.step()
+            if self._latency_tracer is not None:
+                self._latency_tracer.step_taken()
+
+    def _queue_direction(self, direction, key_time):
+        """
+        Queue a movement direction of a key press.
+
+        Parameters
+        ----------
+        direction : :class:`str`
+            Can be ``'up'``, ``'down'``, ``'right'`` or ``'left'``.
+
+        key_time : :class:`float`
+            The value of :func:`time.perf_counter` when the first byte
+            of the key press was read.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        with self._lock:
+            queued = self._game.queue_snake_movement_direction(direction)
+            if self._latency_tracer is not None:
+                self._latency_tracer.key_pressed(key_time, queued)
+
     def _render(self):
         """
         Render the game.
@@ -127,20 +230,82 @@ class GameIO:
             self._game_window.erase()
             self._game_window.border()
 
-            for x, y in self._game.get_walls():
-                self._game_window.addch(y+1, x+1, '█')
-
-            for x, y in self._game.get_snake():
-                self._game_window.addch(y+1, x+1, 'X')
-
-            apple_x, apple_y = self._game.get_apple()
-            self._game_window.addch(apple_y+1, apple_x+1, 'O')
+            min_x, min_y = origin = self._get_view_origin()
+            view_x, view_y = self._view_size
+            max_x, max_y = min_x+view_x, min_y+view_y
+            draw = self._draw_position
+
+            for tile_x in range(
+                min_x // _TILE_SIZE,
+                (max_x-1) // _TILE_SIZE + 1,
+            ):
+                for tile_y in range(
+                    min_y // _TILE_SIZE,
+                    (max_y-1) // _TILE_SIZE + 1,
+                ):
+                    tile = tile_x, tile_y
+                    for wall in self._wall_tiles.get(tile, ()):
+                        draw(origin, wall, '█')
+
+            # If the snake is longer than the area of the view, it is
+            # cheaper to check every visible position for the snake
+            # than to go through its body.
+            if self._game.get_snake_length() > view_x*view_y:
+                for x in range(min_x, max_x):
+                    for y in range(min_y, max_y):
+                        if self._game.snake_occupies((x, y)):
+                            draw(origin, (x, y), 'X')
+            else:
+                for segment in self._game.get_snake():
+                    draw(origin, segment, 'X')
+
+            # There is no apple once the snake fills every free
+            # position.
+            apple = self._game.get_apple()
+            if apple is not None:
+                draw(origin, apple, 'O')
+
+            if self._minimap_window is not None:
+                self._render_minimap()
+
+            self._game_window.noutrefresh()
 
             # Write the score.
             score = self._game.get_snake_length()
             self._score_window.erase()
             self._score_window.addstr(0, 1, f'SCORE: {score}')
-            self._score_window.refresh()
+            self._score_window.noutrefresh()
+
+            # Write every window to the terminal at once.
+            self._backend.doupdate()
+
+    def _draw_position(self, origin, position, character):
+        """
+        Draw a character at a position on the board, if it is visible.
+
+        Parameters
+        ----------
+        origin : :class:`tuple`
+            The position on the board shown in the top-left corner of
+            the game window, as returned by :meth:`_get_view_origin`.
+
+        position : :class:`tuple`
+            The position on the board.
+
+        character : :class:`str`
+            The character to draw.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        x, y = position
+        min_x, min_y = origin
+        view_x, view_y = self._view_size
+        if 0 <= x-min_x < view_x and 0 <= y-min_y < view_y:
+            self._game_window.addch(y-min_y+1, x-min_x+1, character)
 
     def _cleanup(self):
         """
@@ -153,10 +318,7 @@ class GameIO:
         """
 
         self._capturing_inputs = False
-        curses.nocbreak()
-        self._stdscr.keypad(False)
-        curses.echo()
-        curses.endwin()
+        self._backend.cleanup(self._stdscr)
 
     def _capture_inputs(self):
         """
@@ -175,7 +337,17 @@ class GameIO:
         right = deque([27, 91, 67])
         left = deque([27, 91, 68])
 
+        directions = (
+            (up, 'up'),
+            (down, 'down'),
+            (left, 'left'),
+            (right, 'right'),
+        )
+
         input_bytes = deque(maxlen=3)
+        # The time at which the first byte of the last key press was
+        # read, used to trace latency.
+        key_time = None
         self._capturing_inputs = True
         while self._capturing_inputs:
             with self._lock:
@@ -185,16 +357,14 @@ class GameIO:
                 key = self._game_window.getch()
                 self._game_window.nodelay(False)
 
+            if key == 27:
+                key_time = time.perf_counter()
             input_bytes.append(key)
 
-            if input_bytes == up:
-                self._game.queue_snake_movement_direction('up')
-            elif input_bytes == down:
-                self._game.queue_snake_movement_direction('down')
-            elif input_bytes == left:
-                self._game.queue_snake_movement_direction('left')
-            elif input_bytes == right:
-                self._game.queue_snake_movement_direction('right')
+            for sequence, direction in directions:
+                if input_bytes == sequence:
+                    self._queue_direction(direction, key_time)
+                    break
 
     def _create_game_window(self):
         """
@@ -206,10 +376,110 @@ class GameIO:
 
         """
 
-        width, height = self._game.get_board_size()
+        # Only show as much of the board as fits into the terminal,
+        # leaving space for the score and high scores windows.
+        lines, columns = self._stdscr.getmaxyx()
+        board_x, board_y = self._game.get_board_size()
+        self._view_size = (
+            max(1, min(board_x, columns-32-2)),
+            max(1, min(board_y, lines-4-2)),
+        )
+        width, height = self._view_size
         # Allow space for the border.
         width, height = width+2, height+2
-        self._game_window = curses.newwin(height, width, 0, 0)
+        self._game_window = self._backend.newwin(height, width, 0, 0)
+
+    def _get_view_origin(self):
+        """
+        Get the position of the top-left corner of the view.
+
+        The view follows the head of the snake, but does not go past
+        the edges of the board.
+
+        Returns
+        -------
+        :class:`tuple`
+            The position on the board, shown in the top-left corner
+            of the game window.
+
+        """
+
+        head_x, head_y = self._game.get_snake_head()
+        board_x, board_y = self._game.get_board_size()
+        view_x, view_y = self._view_size
+        return (
+            max(0, min(head_x-view_x//2, board_x-view_x)),
+            max(0, min(head_y-view_y//2, board_y-view_y)),
+        )
+
+    def _create_minimap_window(self):
+        """
+        Create the window holding the minimap.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        width, height = self._view_size
+        width, height = width+2, height+2
+        lines, columns = self._stdscr.getmaxyx()
+        # Place the minimap under the high scores window, if there is
+        # space for it.
+        map_x, map_y = min(30, columns-width-2), min(12, lines-32-2)
+        if map_x < 1 or map_y < 1:
+            return
+
+        board_x, board_y = self._game.get_board_size()
+        # The number of board positions covered by each minimap
+        # position, in the x and y directions.
+        self._minimap_scale = (
+            max(1, -(-board_x // map_x)),
+            max(1, -(-board_y // map_y)),
+        )
+        scale_x, scale_y = self._minimap_scale
+        self._minimap_size = (
+            -(-board_x // scale_x),
+            -(-board_y // scale_y),
+        )
+        self._minimap_walls = {
+            (x // scale_x, y // scale_y)
+            for x, y in self._game.get_walls()
+        }
+        map_x, map_y = self._minimap_size
+        self._minimap_window = self._backend.newwin(
+            map_y+2, map_x+2, 32, width
+        )
+
+    def _render_minimap(self):
+        """
+        Render the minimap.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        window = self._minimap_window
+        window.erase()
+        window.border()
+        scale_x, scale_y = self._minimap_scale
+        map_x, map_y = self._minimap_size
+
+        for x, y in self._minimap_walls:
+            window.addch(y+1, x+1, '█')
+
+        apple = self._game.get_apple()
+        if apple is not None:
+            apple_x, apple_y = apple
+            window.addch(apple_y//scale_y+1, apple_x//scale_x+1, 'O')
+
+        head_x, head_y = self._game.get_snake_head()
+        if 0 <= head_x < map_x*scale_x and 0 <= head_y < map_y*scale_y:
+            window.addch(head_y//scale_y+1, head_x//scale_x+1, 'X')
+        window.noutrefresh()
 
     def _create_score_window(self):
         """
@@ -221,10 +491,10 @@ class GameIO:
 
         """
 
-        width, height = self._game.get_board_size()
+        width, height = self._view_size
         # Allow space for the border.
         width, height = width+2, height+2
-        self._score_window = curses.newwin(4, width, height, 0)
+        self._score_window = self._backend.newwin(4, width, height, 0)
 
     def _create_high_scores_window(self):
         """
@@ -237,24 +507,33 @@ class GameIO:
         """
 
         # Create the game window.
-        width, height = self._game.get_board_size()
+        width, height = self._view_size
         # Allow space for the border.
         width, height = width+2, height+2
 
-        self._high_scores_window = curses.newwin(32, 32, 0, width)
+        self._high_scores_window = self._backend.newwin(32, 32, 0, width)
         self._high_scores_window.border()
         self._high_scores_window.addstr(1, 10, 'HIGH SCORES')
         self._high_scores_window.addstr(2, 10, '-----------')
 
-        if os.path.exists(self._score_file):
-            scores = sorted(self._get_scores(), reverse=True)
-
-            for i, (score, _, name) in enumerate(scores[:15]):
-                self._high_scores_window.addstr(4+i, 1, f'{i+1}.')
-                self._high_scores_window.addstr(4+i, 4, name)
-                self._high_scores_window.addstr(4+i, 14, f'{score}')
-
-        self._high_scores_window.refresh()
+        if self._leaderboard is not None:
+            self._leaderboard.update()
+            scores = self._leaderboard.get_top_scores()
+        elif os.path.exists(self._score_file):
+            scores = [
+                (score, name)
+                for score, _, name in sorted(self._get_scores(), reverse=True)
+            ]
+        else:
+            scores = []
+
+        for i, (score, name) in enumerate(scores[:15]):
+            self._high_scores_window.addstr(4+i, 1, f'{i+1}.')
+            self._high_scores_window.addstr(4+i, 4, name)
+            self._high_scores_window.addstr(4+i, 14, f'{score}')
+
+        self._high_scores_window.noutrefresh()
+        self._backend.doupdate()
 
     def _get_scores(self):
         """
@@ -272,3 +551,735 @@ class GameIO:
             for i, line in enumerate(f):
                 name, score = line.split()
                 yield int(score), i, name
+
+
+class LatencyTracer:
+    """
+    Traces the latency between key presses and the screen.
+
+    Three latencies are traced. ``'key_to_step'`` is the time from the
+    first byte of a key press being read to the step which applies
+    it. ``'step_to_frame'`` is the time from a step to the frame
+    which shows it being drawn, and ``'key_to_frame'`` is the time
+    from a key press to that frame.
+
+    Because the snake applies one queued movement direction per step,
+    every queued key press is applied by the first step which follows
+    all the key presses queued before it.
+
+    """
+
+    # The upper bounds, in milliseconds, of the buckets of the
+    # histograms in the report.
+    _BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+    def __init__(self):
+        """
+        Initialize a :class:`LatencyTracer`.
+
+        """
+
+        # The times of queued key presses not yet applied by a step.
+        self._pending = deque()
+        # The times of key presses applied by the last step, which
+        # are not yet shown in a frame.
+        self._applied = []
+        self._step_time = None
+        self._num_keys = 0
+        self._latencies = {
+            'key_to_step': [],
+            'step_to_frame': [],
+            'key_to_frame': [],
+        }
+
+    def key_pressed(self, key_time, queued):
+        """
+        Record a key press.
+
+        Parameters
+        ----------
+        key_time : :class:`float`
+            The value of :func:`time.perf_counter` when the first byte
+            of the key press was read.
+
+        queued : :class:`bool`
+            ``True`` if the movement direction of the key press was
+            queued and ``False`` if it was dropped.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._num_keys += 1
+        if queued:
+            self._pending.append(key_time)
+
+    def step_taken(self):
+        """
+        Record that the game took a step.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._step_time = now = time.perf_counter()
+        if self._pending:
+            key_time = self._pending.popleft()
+            self._latencies['key_to_step'].append(now-key_time)
+            self._applied.append(key_time)
+
+    def frame_shown(self):
+        """
+        Record that the frame of the last step was drawn.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        now = time.perf_counter()
+        self._latencies['step_to_frame'].append(now-self._step_time)
+        for key_time in self._applied:
+            self._latencies['key_to_frame'].append(now-key_time)
+        self._applied.clear()
+
+    def get_percentile(self, latency, percentile):
+        """
+        Return a percentile of a latency.
+
+        Parameters
+        ----------
+        latency : :class:`str`
+            Can be ``'key_to_step'``, ``'step_to_frame'`` or
+            ``'key_to_frame'``.
+
+        percentile : :class:`float`
+            The percentile, between ``0`` and ``100``.
+
+        Returns
+        -------
+        :class:`float`
+            The percentile in seconds, or ``None`` if no latencies
+            were recorded.
+
+        """
+
+        latencies = sorted(self._latencies[latency])
+        if not latencies:
+            return None
+        index = round(percentile/100 * (len(latencies)-1))
+        return latencies[index]
+
+    def get_report(self, num_dropped=0):
+        """
+        Return a report of the traced latencies.
+
+        Parameters
+        ----------
+        num_dropped : :class:`int`, optional
+            The number of movement directions dropped because the
+            queue was full, see
+            :meth:`.SnakeGame.get_num_dropped_directions`.
+
+        Returns
+        -------
+        :class:`str`
+            The report, holding percentiles and a histogram of every
+            latency.
+
+        """
+
+        lines = [
+            f'key presses: {self._num_keys}, '
+            f'dropped by a full queue: {num_dropped}'
+        ]
+        for latency, values in self._latencies.items():
+            if not values:
+                lines.append(f'{latency}: no samples')
+                continue
+            percentiles = ', '.join(
+                f'p{percentile} '
+                f'{self.get_percentile(latency, percentile)*1000:.2f} ms'
+                for percentile in (50, 90, 99, 100)
+            )
+            lines.append(f'{latency} ({len(values)} samples): {percentiles}')
+
+            counts = [0 for bound in self._BUCKETS]
+            num_over = 0
+            for value in values:
+                for i, bound in enumerate(self._BUCKETS):
+                    if value*1000 < bound:
+                        counts[i] += 1
+                        break
+                else:
+                    num_over += 1
+
+            labels = [f'< {bound} ms' for bound in self._BUCKETS]
+            labels.append(f'>= {self._BUCKETS[-1]} ms')
+            counts.append(num_over)
+            for label, count in zip(labels, counts):
+                if count:
+                    bar = '#' * max(1, round(40*count/len(values)))
+                    lines.append(f'  {label:>12} {count:>7} {bar}')
+
+        return '\n'.join(lines)
+
+
+class CursesBackend:
+    """
+    Draws to the terminal and reads the keyboard with :mod:`curses`.
+
+    """
+
+    def wrapper(self, function):
+        """
+        Set up the terminal, run `function` and restore the terminal.
+
+        Parameters
+        ----------
+        function : :class:`callable`
+            Called with a window which represents the entire
+            terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        curses.wrapper(function)
+
+    def setup(self, stdscr):
+        """
+        Prepare the terminal for the game.
+
+        Parameters
+        ----------
+        stdscr : :class:`curses.window`
+            A :class:`curses.window` which represents the entire
+            terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        stdscr.keypad(True)
+        curses.noecho()
+        curses.cbreak()
+        curses.curs_set(0)
+
+    def newwin(self, lines, columns, y, x):
+        """
+        Create a window.
+
+        Parameters
+        ----------
+        lines : :class:`int`
+            The height of the window.
+
+        columns : :class:`int`
+            The width of the window.
+
+        y : :class:`int`
+            The row of the top-left corner of the window.
+
+        x : :class:`int`
+            The column of the top-left corner of the window.
+
+        Returns
+        -------
+        :class:`curses.window`
+            The window.
+
+        """
+
+        return curses.newwin(lines, columns, y, x)
+
+    def doupdate(self):
+        """
+        Write every window marked with ``noutrefresh`` to the terminal.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        curses.doupdate()
+
+    def cleanup(self, stdscr):
+        """
+        Restore the terminal.
+
+        Parameters
+        ----------
+        stdscr : :class:`curses.window`
+            A :class:`curses.window` which represents the entire
+            terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        curses.nocbreak()
+        stdscr.keypad(False)
+        curses.echo()
+        curses.endwin()
+
+
+class AnsiBackend:
+    """
+    Draws to the terminal with ANSI escape sequences.
+
+    The backend keeps a copy of the screen in memory. Windows are drawn
+    into the copy, and :meth:`doupdate` compares it with what is shown
+    on the terminal, turns only the changed characters into cursor
+    moves and text, and writes them with a single ``write`` system
+    call. This keeps the number of writes per frame at one, which
+    avoids flicker on slow terminals and over SSH.
+
+    The windows support the parts of :class:`curses.window` used by
+    :class:`GameIO`.
+
+    """
+
+    def __init__(self, input_fd=0, output_fd=1):
+        """
+        Initialize an :class:`AnsiBackend`.
+
+        Parameters
+        ----------
+        input_fd : :class:`int`, optional
+            The file descriptor of the keyboard.
+
+        output_fd : :class:`int`, optional
+            The file descriptor of the terminal.
+
+        """
+
+        self._input_fd = input_fd
+        self._output_fd = output_fd
+        self._attributes = None
+        self._lines, self._columns = 0, 0
+        # The characters which should be on the screen and the
+        # characters which are on it.
+        self._screen = []
+        self._shown = []
+
+    def wrapper(self, function):
+        """
+        Set up the terminal, run `function` and restore the terminal.
+
+        Parameters
+        ----------
+        function : :class:`callable`
+            Called with a window which represents the entire
+            terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        columns, lines = os.get_terminal_size(self._output_fd)
+        self._lines, self._columns = lines, columns
+        self._screen = [[' ']*columns for line in range(lines)]
+        self._shown = [[' ']*columns for line in range(lines)]
+        self._attributes = termios.tcgetattr(self._input_fd)
+        tty.setcbreak(self._input_fd)
+        # Switch to the alternate screen, hide the cursor and clear
+        # the screen.
+        self._write('\x1b[?1049h\x1b[?25l\x1b[2J')
+        try:
+            function(self.newwin(lines, columns, 0, 0))
+        finally:
+            self.cleanup(None)
+
+    def setup(self, stdscr):
+        """
+        Prepare the terminal for the game.
+
+        The terminal is already prepared by :meth:`wrapper`.
+
+        Parameters
+        ----------
+        stdscr : :class:`_AnsiWindow`
+            The window which represents the entire terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def newwin(self, lines, columns, y, x):
+        """
+        Create a window.
+
+        Parameters
+        ----------
+        lines : :class:`int`
+            The height of the window.
+
+        columns : :class:`int`
+            The width of the window.
+
+        y : :class:`int`
+            The row of the top-left corner of the window.
+
+        x : :class:`int`
+            The column of the top-left corner of the window.
+
+        Returns
+        -------
+        :class:`_AnsiWindow`
+            The window.
+
+        """
+
+        return _AnsiWindow(self, lines, columns, y, x)
+
+    def _copy(self, window):
+        """
+        Copy a window into the in-memory screen.
+
+        Parameters
+        ----------
+        window : :class:`_AnsiWindow`
+            The window.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        columns = max(0, min(window.columns, self._columns-window.x))
+        for i, line in enumerate(
+            window.cells[:max(0, self._lines-window.y)]
+        ):
+            self._screen[window.y+i][window.x:window.x+columns] = (
+                line[:columns]
+            )
+
+    def doupdate(self):
+        """
+        Write the changes to the in-memory screen to the terminal.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        output = []
+        for y, (line, shown) in enumerate(zip(self._screen, self._shown)):
+            if line == shown:
+                continue
+            x = 0
+            while x < self._columns:
+                if line[x] == shown[x]:
+                    x += 1
+                    continue
+                # Write every run of changed characters after a
+                # single cursor move.
+                start = x
+                while x < self._columns and line[x] != shown[x]:
+                    x += 1
+                output.append(f'\x1b[{y+1};{start+1}H')
+                output.append(''.join(line[start:x]))
+            shown[:] = line
+
+        if output:
+            self._write(''.join(output))
+
+    def _write(self, text):
+        """
+        Write text to the terminal.
+
+        Parameters
+        ----------
+        text : :class:`str`
+            The text.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        data = text.encode()
+        while data:
+            data = data[os.write(self._output_fd, data):]
+
+    def getch(self, nodelay):
+        """
+        Read a byte from the keyboard.
+
+        Parameters
+        ----------
+        nodelay : :class:`bool`
+            If ``True``, do not wait for a byte.
+
+        Returns
+        -------
+        :class:`int`
+            The byte, or ``-1`` if no byte was read.
+
+        """
+
+        ready, _, _ = select.select(
+            [self._input_fd], [], [], 0 if nodelay else None
+        )
+        if not ready:
+            return -1
+        data = os.read(self._input_fd, 1)
+        return data[0] if data else -1
+
+    def cleanup(self, stdscr):
+        """
+        Restore the terminal.
+
+        Parameters
+        ----------
+        stdscr : :class:`_AnsiWindow`
+            The window which represents the entire terminal screen.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if self._attributes is None:
+            return
+        # Show the cursor and leave the alternate screen.
+        self._write('\x1b[?25h\x1b[?1049l')
+        termios.tcsetattr(
+            self._input_fd, termios.TCSADRAIN, self._attributes
+        )
+        self._attributes = None
+
+
+class _AnsiWindow:
+    """
+    A window of an :class:`AnsiBackend`.
+
+    """
+
+    def __init__(self, backend, lines, columns, y, x):
+        """
+        Initialize an :class:`_AnsiWindow`.
+
+        Parameters
+        ----------
+        backend : :class:`AnsiBackend`
+            The backend the window belongs to.
+
+        lines : :class:`int`
+            The height of the window.
+
+        columns : :class:`int`
+            The width of the window.
+
+        y : :class:`int`
+            The row of the top-left corner of the window.
+
+        x : :class:`int`
+            The column of the top-left corner of the window.
+
+        """
+
+        self._backend = backend
+        self.lines = lines
+        self.columns = columns
+        self.y = y
+        self.x = x
+        self.cells = [[' ']*columns for line in range(lines)]
+        self._nodelay = False
+
+    def getmaxyx(self):
+        """
+        Return the size of the window.
+
+        Returns
+        -------
+        :class:`tuple`
+            The height and width of the window.
+
+        """
+
+        return self.lines, self.columns
+
+    def keypad(self, flag):
+        """
+        Do nothing, as escape sequences are never interpreted.
+
+        Parameters
+        ----------
+        flag : :class:`bool`
+            Ignored.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+    def nodelay(self, flag):
+        """
+        Set whether :meth:`getch` waits for a key press.
+
+        Parameters
+        ----------
+        flag : :class:`bool`
+            If ``True``, :meth:`getch` does not wait.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._nodelay = flag
+
+    def getch(self):
+        """
+        Read a byte from the keyboard.
+
+        Returns
+        -------
+        :class:`int`
+            The byte, or ``-1`` if no byte was read.
+
+        """
+
+        return self._backend.getch(self._nodelay)
+
+    def erase(self):
+        """
+        Clear the window.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        for line in self.cells:
+            line[:] = [' ']*self.columns
+
+    def addch(self, y, x, character):
+        """
+        Write a character into the window.
+
+        Parameters
+        ----------
+        y : :class:`int`
+            The row of the character.
+
+        x : :class:`int`
+            The column of the character.
+
+        character : :class:`str`
+            The character. It is not written if its position is
+            outside the window.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if 0 <= y < self.lines and 0 <= x < self.columns:
+            self.cells[y][x] = character
+
+    def addstr(self, y, x, text):
+        """
+        Write text into the window.
+
+        Parameters
+        ----------
+        y : :class:`int`
+            The row of the text.
+
+        x : :class:`int`
+            The column of the first character of the text.
+
+        text : :class:`str`
+            The text, which is cut off at the edges of the window.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if not 0 <= y < self.lines:
+            return
+        if x < 0:
+            text, x = text[-x:], 0
+        text = text[:max(0, self.columns-x)]
+        self.cells[y][x:x+len(text)] = text
+
+    def border(self):
+        """
+        Draw a border around the edge of the window.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        last_line, last_column = self.lines-1, self.columns-1
+        for line in self.cells[1:last_line]:
+            line[0] = line[last_column] = '│'
+        self.cells[0][1:last_column] = '─'*(last_column-1)
+        self.cells[last_line][1:last_column] = '─'*(last_column-1)
+        self.cells[0][0] = '┌'
+        self.cells[0][last_column] = '┐'
+        self.cells[last_line][0] = '└'
+        self.cells[last_line][last_column] = '┘'
+
+    def noutrefresh(self):
+        """
+        Mark the window to be written by :meth:`AnsiBackend.doupdate`.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._backend._copy(self)
+
+    def refresh(self):
+        """
+        Write the window to the terminal.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self.noutrefresh()
+        self._backend.doupdate()
+
+
+# The backends which can be chosen by name.
+BACKENDS = {
+    'curses': CursesBackend,
+    'ansi': AnsiBackend,
+}
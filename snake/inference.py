@@ -0,0 +1,684 @@
+"""
+Holds a scheduler which batches the policy calls of many games.
+
+Calling a policy once for every step of every game means the cost of
+each call, rather than the work done by the policy, sets how fast the
+games run. An :class:`InferenceScheduler` instead collects the
+observations of many games which are waiting for an action, calls the
+policy once for the whole batch, and sends every game its action.
+
+Games can wait for actions from threads, with
+:meth:`InferenceScheduler.get_action`, from :mod:`asyncio` tasks,
+with :meth:`InferenceScheduler.get_action_async`, or from other
+processes, through a :class:`RemotePolicy` connected with
+:meth:`InferenceScheduler.serve`.
+
+A batch is sent to the policy once it holds `max_batch_size`
+observations, or once its first observation has waited `max_wait`
+seconds, whichever comes first. The throughput for different batch
+sizes can be measured with::
+
+    $ python -m snake.inference --batch_sizes 1 8 32 64
+
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .game import ACTIONS, FEATURES, SnakeGame
+
+
+class NumpyPolicy:
+    """
+    A small neural network policy, written with NumPy.
+
+    The network has random weights, so it does not play well, but it
+    costs as much to call as a small trained model, which makes it a
+    stand-in for benchmarking.
+
+    """
+
+    def __init__(
+        self,
+        num_features=len(FEATURES),
+        num_actions=len(ACTIONS),
+        hidden_size=64,
+        random_seed=0,
+    ):
+        """
+        Initialize a :class:`NumpyPolicy`.
+
+        Parameters
+        ----------
+        num_features : :class:`int`, optional
+            The number of values in an observation.
+
+        num_actions : :class:`int`, optional
+            The number of actions.
+
+        hidden_size : :class:`int`, optional
+            The number of units in each of the two hidden layers.
+
+        random_seed : :class:`int`, optional
+            The random seed used to create the weights.
+
+        """
+
+        generator = np.random.default_rng(random_seed)
+        sizes = (num_features, hidden_size, hidden_size, num_actions)
+        self._layers = [
+            (
+                generator.normal(
+                    scale=size_in**-0.5,
+                    size=(size_in, size_out),
+                ).astype(np.float32),
+                np.zeros(size_out, dtype=np.float32),
+            )
+            for size_in, size_out in zip(sizes, sizes[1:])
+        ]
+
+    def __call__(self, observations):
+        """
+        Choose the actions for a batch of observations.
+
+        Parameters
+        ----------
+        observations : :class:`numpy.ndarray`
+            An array of shape ``(batch_size, num_features)``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The index into :data:`.ACTIONS` of the action chosen for
+            every observation.
+
+        """
+
+        values = np.asarray(observations, dtype=np.float32)
+        for i, (weights, biases) in enumerate(self._layers):
+            values = values @ weights + biases
+            if i < len(self._layers) - 1:
+                np.maximum(values, 0., out=values)
+        return values.argmax(axis=1)
+
+
+class InferenceScheduler:
+    """
+    Batches the policy calls of many games.
+
+    The policy is called from a background thread, which is started
+    when the scheduler is created and stopped by :meth:`close`.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        scheduler = InferenceScheduler(
+            policy=NumpyPolicy(),
+            max_batch_size=64,
+            max_wait=0.002,
+        )
+
+        def play(game):
+            while not game.is_game_over():
+                game.step(scheduler.get_action(game.get_features()))
+
+        threads = [
+            threading.Thread(target=play, args=(game, ))
+            for game in games
+        ]
+
+    """
+
+    def __init__(
+        self,
+        policy,
+        max_batch_size=64,
+        max_wait=0.002,
+        num_features=len(FEATURES),
+    ):
+        """
+        Initialize an :class:`InferenceScheduler`.
+
+        Parameters
+        ----------
+        policy : :class:`callable`
+            Called with an array of shape
+            ``(batch_size, num_features)`` holding a batch of
+            observations, and returns an array holding the action of
+            every observation, such as a :class:`NumpyPolicy`.
+
+        max_batch_size : :class:`int`, optional
+            The maximum number of observations in a batch.
+
+        max_wait : :class:`float`, optional
+            The maximum time in seconds the first observation of a
+            batch waits for the batch to fill up.
+
+        num_features : :class:`int`, optional
+            The number of values in an observation.
+
+        """
+
+        self._policy = policy
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        # The batch is written into the same array every time, so
+        # that no array is allocated for each batch.
+        self._observations = np.empty(
+            (max_batch_size, num_features),
+            dtype=np.float32,
+        )
+        # Holds a tuple of the form (observation, future) for every
+        # waiting game, and None once the scheduler is closed.
+        self._requests = queue.Queue()
+        self._num_batches = 0
+        self._num_requests = 0
+        self._closed = False
+        # Held while checking if the scheduler is closed and queueing
+        # a request, so that no request is queued after the None
+        # which stops the background thread.
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        Call the policy for batches of requests until closed.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        requests = self._requests
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.perf_counter() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                try:
+                    request = requests.get(
+                        timeout=max(deadline - time.perf_counter(), 0.)
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._run_batch(batch)
+                    return
+                batch.append(request)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        """
+        Call the policy for a batch of requests.
+
+        Parameters
+        ----------
+        batch : :class:`list` of :class:`tuple`
+            Holds a :class:`tuple` of the form
+            ``(observation, future)`` for every request. The result
+            of every future is set to its action.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        observations = self._observations[:len(batch)]
+        try:
+            for i, (observation, _) in enumerate(batch):
+                observations[i] = observation
+            actions = self._policy(observations).tolist()
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        self._num_batches += 1
+        self._num_requests += len(batch)
+        for (_, future), action in zip(batch, actions):
+            future.set_result(action)
+
+    def submit(self, observation):
+        """
+        Request the action for an observation.
+
+        Parameters
+        ----------
+        observation : :class:`iterable`
+            The observation, such as the one returned by
+            :meth:`.SnakeGame.get_features`.
+
+        Returns
+        -------
+        :class:`concurrent.futures.Future`
+            The future whose result is the index into
+            :data:`.ACTIONS` of the action chosen by the policy.
+
+        Raises
+        ------
+        :class:`RuntimeError`
+            If the scheduler is closed.
+
+        :class:`ValueError`
+            If `observation` does not hold `num_features` numbers.
+
+        """
+
+        # Check the observation here, so that an invalid observation
+        # fails in the caller instead of failing its whole batch.
+        observation = np.asarray(observation, dtype=np.float32)
+        num_features = self._observations.shape[1]
+        if observation.shape != (num_features, ):
+            raise ValueError(
+                f'The observation has the shape {observation.shape}, '
+                f'but the shape ({num_features},) is needed.'
+            )
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The scheduler is closed.')
+            self._requests.put((observation, future))
+        return future
+
+    def get_action(self, observation):
+        """
+        Wait for the action for an observation.
+
+        Parameters
+        ----------
+        observation : :class:`iterable`
+            The observation, such as the one returned by
+            :meth:`.SnakeGame.get_features`.
+
+        Returns
+        -------
+        :class:`int`
+            The index into :data:`.ACTIONS` of the action chosen by
+            the policy.
+
+        """
+
+        return self.submit(observation).result()
+
+    async def get_action_async(self, observation):
+        """
+        Wait for the action for an observation in an :mod:`asyncio` task.
+
+        Parameters
+        ----------
+        observation : :class:`iterable`
+            The observation, such as the one returned by
+            :meth:`.SnakeGame.get_features`.
+
+        Returns
+        -------
+        :class:`int`
+            The index into :data:`.ACTIONS` of the action chosen by
+            the policy.
+
+        """
+
+        return await asyncio.wrap_future(self.submit(observation))
+
+    def serve(self, connection):
+        """
+        Answer the requests sent over a connection by another process.
+
+        The requests are read by a background thread, which stops
+        when the connection is closed. If a request fails, for
+        example because the scheduler is closed, the exception is
+        sent back and raised by the :class:`RemotePolicy`.
+
+        Parameters
+        ----------
+        connection : :class:`multiprocessing.connection.Connection`
+            One end of a :func:`multiprocessing.Pipe`, whose other end
+            is used by a :class:`RemotePolicy`.
+
+        Returns
+        -------
+        :class:`threading.Thread`
+            The thread reading the requests.
+
+        """
+
+        def answer():
+            while True:
+                try:
+                    observation = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    action = self.get_action(observation)
+                except Exception as error:
+                    action = error
+                try:
+                    connection.send(action)
+                except OSError:
+                    return
+
+        thread = threading.Thread(target=answer, daemon=True)
+        thread.start()
+        return thread
+
+    def get_mean_batch_size(self):
+        """
+        Return the mean number of observations in a batch.
+
+        Returns
+        -------
+        :class:`float`
+            The mean batch size, or ``0.`` if the policy has not been
+            called yet.
+
+        """
+
+        if self._num_batches == 0:
+            return 0.
+        return self._num_requests / self._num_batches
+
+    def get_num_batches(self):
+        """
+        Return the number of times the policy was called.
+
+        Returns
+        -------
+        :class:`int`
+            The number of batches.
+
+        """
+
+        return self._num_batches
+
+    def close(self):
+        """
+        Stop the scheduler, once every waiting request is answered.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._requests.put(None)
+        self._thread.join()
+
+
+class RemotePolicy:
+    """
+    Requests actions from an :class:`InferenceScheduler` in another process.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        def worker(connection):
+            policy = RemotePolicy(connection)
+            game = SnakeGame((25, 25), (), 12)
+            while not game.is_game_over():
+                game.step(policy.get_action(game.get_features()))
+
+        connection, worker_connection = multiprocessing.Pipe()
+        scheduler.serve(connection)
+        multiprocessing.Process(
+            target=worker,
+            args=(worker_connection, ),
+        ).start()
+
+    """
+
+    def __init__(self, connection):
+        """
+        Initialize a :class:`RemotePolicy`.
+
+        Parameters
+        ----------
+        connection : :class:`multiprocessing.connection.Connection`
+            One end of a :func:`multiprocessing.Pipe`, whose other end
+            is passed to :meth:`InferenceScheduler.serve`.
+
+        """
+
+        self._connection = connection
+
+    def get_action(self, observation):
+        """
+        Wait for the action for an observation.
+
+        Parameters
+        ----------
+        observation : :class:`iterable`
+            The observation, such as the one returned by
+            :meth:`.SnakeGame.get_features`.
+
+        Returns
+        -------
+        :class:`int`
+            The index into :data:`.ACTIONS` of the action chosen by
+            the policy.
+
+        Raises
+        ------
+        :class:`Exception`
+            The exception raised by the scheduler, if the request
+            failed.
+
+        """
+
+        self._connection.send(observation)
+        action = self._connection.recv()
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+
+def _play(game, get_action, num_steps):
+    """
+    Play `num_steps` steps, restarting `game` whenever it ends.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    get_action : :class:`callable`
+        Called with the features of the game, and returns the action
+        of the next step.
+
+    num_steps : :class:`int`
+        The number of steps.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    for step in range(num_steps):
+        if game.is_game_over():
+            game.reset()
+        game.step(get_action(game.get_features()))
+
+
+async def _play_async(game, scheduler, num_steps):
+    """
+    Play `num_steps` steps in an :mod:`asyncio` task.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game, which is restarted whenever it ends.
+
+    scheduler : :class:`InferenceScheduler`
+        The scheduler which chooses the actions.
+
+    num_steps : :class:`int`
+        The number of steps.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    for step in range(num_steps):
+        if game.is_game_over():
+            game.reset()
+        game.step(await scheduler.get_action_async(game.get_features()))
+
+
+def benchmark(
+    policy,
+    max_batch_size,
+    num_games=64,
+    num_steps=200,
+    max_wait=0.002,
+    use_asyncio=False,
+    board_size=(25, 25),
+):
+    """
+    Measure the number of steps per second played with a scheduler.
+
+    Parameters
+    ----------
+    policy : :class:`callable`
+        The policy, see :class:`InferenceScheduler`.
+
+    max_batch_size : :class:`int`
+        The maximum number of observations in a batch.
+
+    num_games : :class:`int`, optional
+        The number of games played at the same time.
+
+    num_steps : :class:`int`, optional
+        The number of steps played in every game.
+
+    max_wait : :class:`float`, optional
+        The maximum time in seconds the first observation of a
+        batch waits for the batch to fill up.
+
+    use_asyncio : :class:`bool`, optional
+        If ``True``, every game is played by an :mod:`asyncio` task,
+        otherwise by a thread.
+
+    board_size : :class:`tuple`, optional
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    Returns
+    -------
+    :class:`tuple`
+        A :class:`tuple` of the form ``(steps_per_second,
+        mean_batch_size)``.
+
+    """
+
+    games = [
+        SnakeGame(board_size, (), random_seed)
+        for random_seed in range(num_games)
+    ]
+    scheduler = InferenceScheduler(policy, max_batch_size, max_wait)
+    start = time.perf_counter()
+
+    if use_asyncio:
+        async def play_all():
+            await asyncio.gather(*(
+                _play_async(game, scheduler, num_steps) for game in games
+            ))
+
+        asyncio.run(play_all())
+
+    else:
+        threads = [
+            threading.Thread(
+                target=_play,
+                args=(game, scheduler.get_action, num_steps),
+            )
+            for game in games
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.perf_counter() - start
+    scheduler.close()
+    return num_games*num_steps / elapsed, scheduler.get_mean_batch_size()
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--batch_sizes',
+        type=int,
+        nargs='+',
+        help='The maximum batch sizes to benchmark.',
+        default=[1, 8, 32, 64]
+    )
+    parser.add_argument(
+        '--num_games',
+        type=int,
+        help='The number of games played at the same time.',
+        default=64
+    )
+    parser.add_argument(
+        '--num_steps',
+        type=int,
+        help='The number of steps played in every game.',
+        default=200
+    )
+    parser.add_argument(
+        '--max_wait',
+        type=float,
+        help='The maximum time in seconds a batch waits to fill up.',
+        default=0.002
+    )
+    parser.add_argument(
+        '--hidden_size',
+        type=int,
+        help='The size of the hidden layers of the policy.',
+        default=64
+    )
+    parser.add_argument(
+        '--asyncio',
+        action='store_true',
+        help='Play every game in an asyncio task instead of a thread.'
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    policy = NumpyPolicy(hidden_size=args.hidden_size)
+    for max_batch_size in args.batch_sizes:
+        steps_per_second, mean_batch_size = benchmark(
+            policy=policy,
+            max_batch_size=max_batch_size,
+            num_games=args.num_games,
+            num_steps=args.num_steps,
+            max_wait=args.max_wait,
+            use_asyncio=args.asyncio,
+        )
+        print(
+            f'max batch size {max_batch_size}: '
+            f'{steps_per_second:.0f} steps per second, '
+            f'mean batch size {mean_batch_size:.1f}'
+        )
@@ -0,0 +1,388 @@
+"""
+Holds a leaderboard which merges the scores of many score files.
+
+Every :class:`.GameIO` appends lines of the form ``name score`` to
+its score file. A :class:`Leaderboard` remembers how many bytes of
+each file it has read, so every update only reads the lines added
+since the last one, and keeps the best scores and the statistics of
+every player up to date as it goes. The scores of each file are also
+kept apart, so that a file which is truncated or replaced can be
+read again without counting its old scores twice.
+
+"""
+
+from collections import namedtuple
+import heapq
+import os
+
+
+# The statistics of a player, as returned by
+# Leaderboard.get_player_stats.
+PlayerStats = namedtuple(
+    'PlayerStats',
+    ['num_games', 'total_score', 'best_score'],
+)
+
+
+class _ScoreFile:
+    """
+    Holds what a :class:`Leaderboard` has read from a score file.
+
+    Attributes
+    ----------
+    offset : :class:`int`
+        The number of bytes read from the file.
+
+    inode : :class:`int`
+        The inode number of the file when it was last read, or
+        ``None`` if it has not been read.
+
+    num_scores : :class:`int`
+        The number of scores read from the file.
+
+    top_scores : :class:`list`
+        A min-heap holding the top scores read from the file, like
+        the one held by :class:`Leaderboard`.
+
+    players : :class:`dict`
+        Maps every player with a score in the file to a list of the
+        form ``[num_games, total_score, best_score]``.
+
+    """
+
+    __slots__ = ('offset', 'inode', 'num_scores', 'top_scores', 'players')
+
+    def __init__(self):
+        """
+        Initialize a :class:`_ScoreFile`.
+
+        """
+
+        self.offset = 0
+        self.inode = None
+        self.num_scores = 0
+        self.top_scores = []
+        self.players = {}
+
+
+def _push_score(top_scores, top_k, entry):
+    """
+    Add a score to a min-heap of top scores.
+
+    Parameters
+    ----------
+    top_scores : :class:`list`
+        The min-heap, holding at most `top_k` entries.
+
+    top_k : :class:`int`
+        The number of top scores which are kept.
+
+    entry : :class:`tuple`
+        The score, of the form ``(score, sequence number, name)``.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    if len(top_scores) < top_k:
+        heapq.heappush(top_scores, entry)
+    elif entry > top_scores[0]:
+        heapq.heapreplace(top_scores, entry)
+
+
+def _add_stats(players, name, num_games, total_score, best_score):
+    """
+    Add games to the statistics of a player.
+
+    Parameters
+    ----------
+    players : :class:`dict`
+        Maps every player to a list of the form
+        ``[num_games, total_score, best_score]``.
+
+    name : :class:`str`
+        The name of the player.
+
+    num_games : :class:`int`
+        The number of games to add.
+
+    total_score : :class:`int`
+        The total score of the games.
+
+    best_score : :class:`int`
+        The best score of the games.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    stats = players.get(name)
+    if stats is None:
+        players[name] = [num_games, total_score, best_score]
+    else:
+        stats[0] += num_games
+        stats[1] += total_score
+        stats[2] = max(stats[2], best_score)
+
+
+class Leaderboard:
+    """
+    Merges the scores of many score files.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        leaderboard = Leaderboard(glob.glob('scores/*'), top_k=15)
+        # Later, only the lines added since the last update are read.
+        leaderboard.update()
+        for score, name in leaderboard.get_top_scores():
+            print(name, score)
+
+    A :class:`Leaderboard` can also be given to :class:`.GameIO`,
+    which then shows its top scores.
+
+    """
+
+    def __init__(self, paths=(), top_k=15):
+        """
+        Initialize a :class:`Leaderboard`.
+
+        Parameters
+        ----------
+        paths : :class:`iterable` of :class:`str`, optional
+            The paths to the score files. They are read by
+            :meth:`update`.
+
+        top_k : :class:`int`, optional
+            The number of top scores which are kept.
+
+        """
+
+        self._top_k = top_k
+        # Maps the path of every score file to a _ScoreFile.
+        self._files = {}
+        # A min-heap holding the top scores, each of the form
+        # (score, sequence number, name). The sequence number ranks
+        # later scores above earlier ones with the same value.
+        self._top_scores = []
+        self._num_scores = 0
+        self._sequence = 0
+        # Maps every player to a list of the form
+        # [num_games, total_score, best_score].
+        self._players = {}
+
+        for path in paths:
+            self.add_file(path)
+        self.update()
+
+    def add_file(self, path):
+        """
+        Start tracking a score file.
+
+        The file is read by the next call to :meth:`update`. It does
+        not need to exist yet.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the score file.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if path not in self._files:
+            self._files[path] = _ScoreFile()
+
+    def update(self):
+        """
+        Read the lines added to every score file since the last update.
+
+        Only complete lines are read, so a line which is still being
+        written is read by a later update. If a file shrinks or is
+        replaced by a new file, the scores read from it before are
+        dropped and it is read again from the start.
+
+        Returns
+        -------
+        :class:`int`
+            The number of new scores.
+
+        """
+
+        num_scores = 0
+        for path, score_file in self._files.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if score_file.inode is not None and (
+                stat.st_size < score_file.offset
+                or stat.st_ino != score_file.inode
+            ):
+                score_file = self._remove_scores(path)
+            score_file.inode = stat.st_ino
+            if stat.st_size == score_file.offset:
+                continue
+
+            with open(path, 'rb') as f:
+                f.seek(score_file.offset)
+                data = f.read(stat.st_size-score_file.offset)
+            end = data.rfind(b'\n') + 1
+            score_file.offset += end
+            for line in data[:end].splitlines():
+                num_scores += self._add_line(score_file, line)
+
+        return num_scores
+
+    def _remove_scores(self, path):
+        """
+        Drop the scores read from a score file.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the score file.
+
+        Returns
+        -------
+        :class:`_ScoreFile`
+            The new, empty, record of the score file.
+
+        """
+
+        score_file = self._files[path]
+        self._num_scores -= score_file.num_scores
+        self._files[path] = _ScoreFile()
+
+        # Every file keeps its own top scores, so the top scores of
+        # all files hold the new top scores. Only the players of the
+        # dropped file need their statistics rebuilt.
+        self._top_scores = heapq.nlargest(
+            self._top_k,
+            (
+                entry
+                for other in self._files.values()
+                for entry in other.top_scores
+            ),
+        )
+        heapq.heapify(self._top_scores)
+        for name in score_file.players:
+            del self._players[name]
+            for other in self._files.values():
+                stats = other.players.get(name)
+                if stats is not None:
+                    _add_stats(self._players, name, *stats)
+        return self._files[path]
+
+    def _add_line(self, score_file, line):
+        """
+        Add the score held by a line of a score file.
+
+        Lines which do not hold a name and a score are skipped.
+
+        Parameters
+        ----------
+        score_file : :class:`_ScoreFile`
+            The score file holding the line.
+
+        line : :class:`bytes`
+            The line.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the line held a score and ``False``
+            otherwise.
+
+        """
+
+        try:
+            name, score = line.decode().split()
+            score = int(score)
+        except ValueError:
+            return False
+
+        self._num_scores += 1
+        score_file.num_scores += 1
+        self._sequence += 1
+        entry = score, self._sequence, name
+        _push_score(self._top_scores, self._top_k, entry)
+        _push_score(score_file.top_scores, self._top_k, entry)
+        _add_stats(self._players, name, 1, score, score)
+        _add_stats(score_file.players, name, 1, score, score)
+        return True
+
+    def get_top_scores(self):
+        """
+        Return the top scores.
+
+        Returns
+        -------
+        :class:`list` of :class:`tuple`
+            Holds up to `top_k` tuples of the form ``(score, name)``,
+            best first. Of equal scores, the most recently read is
+            first.
+
+        """
+
+        return [
+            (score, name)
+            for score, _, name in sorted(self._top_scores, reverse=True)
+        ]
+
+    def get_player_stats(self, name):
+        """
+        Return the statistics of a player.
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the player.
+
+        Returns
+        -------
+        :class:`PlayerStats`
+            The statistics of the player, or ``None`` if the player
+            has no scores.
+
+        """
+
+        stats = self._players.get(name)
+        if stats is None:
+            return None
+        return PlayerStats(*stats)
+
+    def get_players(self):
+        """
+        Yield the names of the players.
+
+        Yields
+        ------
+        :class:`str`
+            The name of a player with at least one score.
+
+        """
+
+        yield from self._players
+
+    def get_num_scores(self):
+        """
+        Return the number of scores read so far.
+
+        Returns
+        -------
+        :class:`int`
+            The number of scores.
+
+        """
+
+        return self._num_scores
@@ -0,0 +1,591 @@
+"""
+Holds tools for generating levels and storing them in level pools.
+
+A level is the set of wall positions passed to :class:`.SnakeGame`.
+:func:`generate_level` places random wall shapes on the board until
+a target density is reached, and only keeps a shape if every free
+position is still reachable from the spawn at ``(0, 0)``, checked
+with a flood fill.
+
+Because generating many levels takes time, levels can be written
+into a level pool, which stores every level as a bitmap of the
+board. A :class:`LevelPool` memory-maps the file, so any number of
+processes can sample levels from it without loading or copying it.
+
+A level pool can be created from the command line with::
+
+    $ python -m snake.levels levels.pool --num_levels 10000
+
+"""
+
+import argparse
+import mmap
+import random
+import struct
+
+import numpy as np
+
+from .game import _get_board, _get_reachable_cells
+
+
+# The shapes which can be placed by generate_level.
+SHAPES = ('dot', 'line', 'block')
+
+# The header of a level pool holds the magic bytes, format version,
+# board size and number of levels.
+_POOL_HEADER = struct.Struct('<4sBHHI')
+_POOL_MAGIC = b'SNKL'
+_POOL_VERSION = 1
+
+# The snake starts at (0, 0) and moves right, so these positions
+# never hold a wall.
+_SPAWN = ((0, 0), (1, 0))
+
+
+def _get_shape(generator, shape, max_shape_size):
+    """
+    Return the positions of a random shape placed at ``(0, 0)``.
+
+    Parameters
+    ----------
+    generator : :class:`random.Random`
+        The random number generator.
+
+    shape : :class:`str`
+        Can be ``'dot'``, ``'line'`` or ``'block'``.
+
+    max_shape_size : :class:`int`
+        The maximum length of a line, or width and height of a
+        block.
+
+    Returns
+    -------
+    :class:`list` of :class:`tuple`
+        The positions of the shape.
+
+    """
+
+    if shape == 'dot':
+        return [(0, 0)]
+
+    if shape == 'line':
+        length = generator.randint(2, max(2, max_shape_size))
+        if generator.random() < 0.5:
+            return [(i, 0) for i in range(length)]
+        return [(0, i) for i in range(length)]
+
+    if shape == 'block':
+        max_side = max(2, max_shape_size // 2)
+        width = generator.randint(2, max_side)
+        height = generator.randint(2, max_side)
+        return [(x, y) for x in range(width) for y in range(height)]
+
+    raise ValueError(f'{shape!r} is not a valid shape.')
+
+
+def _is_connected(board, blocked, cell):
+    """
+    Check if every free cell can be reached from `cell`.
+
+    Parameters
+    ----------
+    board : :class:`._Board`
+        The board.
+
+    blocked : :class:`bytearray`
+        Holds ``1`` for every cell of `board` which cannot be
+        entered, which must include the padding.
+
+    cell : :class:`int`
+        The starting cell, which must not be blocked.
+
+    Returns
+    -------
+    :class:`bool`
+        ``True`` if every free cell can be reached from `cell`.
+
+    """
+
+    reachable = _get_reachable_cells(board, blocked, cell)
+    return bin(reachable).count('1') == blocked.count(0)
+
+
+def is_connected(board_size, walls, start=(0, 0)):
+    """
+    Check if every free position can be reached from `start`.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    walls : :class:`iterable` of :class:`tuple`
+        The positions of the walls.
+
+    start : :class:`tuple`, optional
+        The starting position.
+
+    Returns
+    -------
+    :class:`bool`
+        ``True`` if `start` holds no wall and every position which
+        holds no wall can be reached from it, and ``False``
+        otherwise.
+
+    """
+
+    board = _get_board(board_size)
+    blocked = bytearray(board.outside)
+    for wall in walls:
+        cell = board.get_cell(wall)
+        if cell is not None:
+            blocked[cell] = 1
+
+    cell = board.get_cell(start)
+    if cell is None or blocked[cell]:
+        return False
+    return _is_connected(board, blocked, cell)
+
+
+def generate_level(
+    board_size,
+    density,
+    random_seed,
+    shapes=SHAPES,
+    max_shape_size=6,
+    max_failures=100,
+):
+    """
+    Generate a random level.
+
+    Shapes are placed at random positions until the walls cover
+    `density` of the board. A shape is only kept if every free
+    position can still be reached from ``(0, 0)``, so the snake can
+    reach every apple when the game starts. The positions at which
+    the snake starts, ``(0, 0)`` and ``(1, 0)``, never hold a wall.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    density : :class:`float`
+        The fraction of the board covered by walls, between ``0``
+        and ``1``. Dense levels may end up with fewer walls, see
+        `max_failures`.
+
+    random_seed : :class:`int`
+        The random seed used to place the shapes.
+
+    shapes : :class:`tuple` of :class:`str`, optional
+        The shapes which can be placed, see :data:`SHAPES`. Each
+        shape is placed with the same probability.
+
+    max_shape_size : :class:`int`, optional
+        The maximum length of a line, or width and height of a
+        block.
+
+    max_failures : :class:`int`, optional
+        The maximum number of shapes in a row which are rejected
+        because they would make a position unreachable, before the
+        level is returned with fewer walls than requested.
+
+    Returns
+    -------
+    :class:`frozenset` of :class:`tuple`
+        The positions of the walls.
+
+    """
+
+    generator = random.Random(random_seed)
+    board = _get_board(board_size)
+    board_x, board_y = board_size
+    num_walls = round(density*board_x*board_y)
+    spawn = board.get_cell(_SPAWN[0])
+
+    blocked = bytearray(board.outside)
+    reserved = {board.get_cell(position) for position in _SPAWN}
+    walls = set()
+    num_failures = 0
+    while len(walls) < num_walls and num_failures < max_failures:
+        shape = _get_shape(
+            generator=generator,
+            shape=shapes[generator.randrange(len(shapes))],
+            max_shape_size=max_shape_size,
+        )
+        x = generator.randrange(board_x)
+        y = generator.randrange(board_y)
+        cells = {
+            board.get_cell((x+shape_x, y+shape_y))
+            for shape_x, shape_y in shape
+        }
+        cells = [
+            cell for cell in cells
+            if cell is not None
+            and not blocked[cell]
+            and cell not in reserved
+        ][:num_walls-len(walls)]
+        if not cells:
+            num_failures += 1
+            continue
+
+        for cell in cells:
+            blocked[cell] = 1
+        if _is_connected(board, blocked, spawn):
+            walls.update(board.positions[cell] for cell in cells)
+            num_failures = 0
+        else:
+            for cell in cells:
+                blocked[cell] = 0
+            num_failures += 1
+
+    return frozenset(walls)
+
+
+def generate_levels(board_size, num_levels, random_seed, **kwargs):
+    """
+    Generate many random levels.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    num_levels : :class:`int`
+        The number of levels.
+
+    random_seed : :class:`int`
+        The random seed of the first level. The i-th level uses
+        ``random_seed + i``, so any level can be generated again
+        on its own.
+
+    **kwargs
+        Passed to :func:`generate_level`.
+
+    Yields
+    ------
+    :class:`frozenset` of :class:`tuple`
+        The positions of the walls of a level.
+
+    """
+
+    for i in range(num_levels):
+        yield generate_level(
+            board_size=board_size,
+            random_seed=random_seed+i,
+            **kwargs,
+        )
+
+
+def _pack_level(board_size, walls):
+    """
+    Store a level as a bitmap of the board.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    walls : :class:`iterable` of :class:`tuple`
+        The positions of the walls.
+
+    Returns
+    -------
+    :class:`bytes`
+        Holds a bit for every position of the board, in the order
+        of the cells of the board, which is set if the position
+        holds a wall.
+
+    Raises
+    ------
+    :class:`ValueError`
+        If a wall is not on the board.
+
+    """
+
+    bitmap = np.zeros(board_size, dtype=bool)
+    walls = np.array(list(walls), dtype=np.int64).reshape(-1, 2)
+    # Negative positions would otherwise index the bitmap from its
+    # end.
+    if np.any((walls < 0) | (walls >= board_size)):
+        raise ValueError('Every wall of a level must be on the board.')
+    bitmap[walls[:, 0], walls[:, 1]] = True
+    return np.packbits(bitmap).tobytes()
+
+
+def _unpack_level(board_size, buffer, offset):
+    """
+    Read a level stored by :func:`_pack_level`.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    buffer : :class:`mmap.mmap`
+        The buffer holding the level.
+
+    offset : :class:`int`
+        The offset of the level in `buffer`.
+
+    Returns
+    -------
+    :class:`frozenset` of :class:`tuple`
+        The positions of the walls of the level.
+
+    """
+
+    board_x, board_y = board_size
+    bitmap = np.frombuffer(
+        buffer,
+        dtype=np.uint8,
+        count=-(-board_x*board_y // 8),
+        offset=offset,
+    )
+    cells, = np.nonzero(np.unpackbits(bitmap)[:board_x*board_y])
+    xs, ys = np.divmod(cells, board_y)
+    return frozenset(zip(xs.tolist(), ys.tolist()))
+
+
+def write_level_pool(path, board_size, levels):
+    """
+    Write levels into a level pool.
+
+    Parameters
+    ----------
+    path : :class:`str`
+        The path to the level pool file.
+
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    levels : :class:`iterable`
+        Holds the positions of the walls of every level. Levels are
+        written one at a time, so this can be a generator, such as
+        the one returned by :func:`generate_levels`.
+
+    Returns
+    -------
+    :class:`int`
+        The number of levels written.
+
+    Raises
+    ------
+    :class:`ValueError`
+        If a wall is not on the board. The file is then left without
+        a valid header.
+
+    """
+
+    board_x, board_y = board_size
+    num_levels = 0
+    with open(path, 'wb') as f:
+        f.write(_POOL_HEADER.pack(_POOL_MAGIC, 0, 0, 0, 0))
+        for walls in levels:
+            f.write(_pack_level(board_size, walls))
+            num_levels += 1
+
+        # Only write a valid header once every level is written, so
+        # that an interrupted pool cannot be read.
+        f.seek(0)
+        f.write(_POOL_HEADER.pack(
+            _POOL_MAGIC,
+            _POOL_VERSION,
+            board_x,
+            board_y,
+            num_levels,
+        ))
+    return num_levels
+
+
+class LevelPool:
+    """
+    Reads the levels of a level pool.
+
+    The file is memory-mapped and every level has the same size, so
+    any level can be read without reading the others, and processes
+    reading the same pool share its memory.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        pool = LevelPool('levels.pool')
+        generator = random.Random(12)
+        game = SnakeGame(
+            board_size=pool.get_board_size(),
+            walls=pool.sample(generator),
+            random_seed=12,
+        )
+
+    """
+
+    def __init__(self, path):
+        """
+        Initialize a :class:`LevelPool`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the level pool file, written by
+            :func:`write_level_pool`.
+
+        """
+
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, version, board_x, board_y, self._num_levels = (
+            _POOL_HEADER.unpack_from(self._buffer)
+        )
+        if magic != _POOL_MAGIC:
+            raise ValueError(f'{path} does not hold a level pool.')
+        if version != _POOL_VERSION:
+            raise ValueError(
+                f'{path} has unsupported version {version}.'
+            )
+        self._board_size = board_x, board_y
+        self._level_size = -(-board_x*board_y // 8)
+
+    def __len__(self):
+        return self._num_levels
+
+    def get_board_size(self):
+        """
+        Return the board size of the levels.
+
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        return self._board_size
+
+    def get_level(self, index):
+        """
+        Return a level.
+
+        Parameters
+        ----------
+        index : :class:`int`
+            The index of the level.
+
+        Returns
+        -------
+        :class:`frozenset` of :class:`tuple`
+            The positions of the walls of the level.
+
+        """
+
+        if not 0 <= index < self._num_levels:
+            raise IndexError(f'Level {index} is not in the pool.')
+
+        return _unpack_level(
+            board_size=self._board_size,
+            buffer=self._buffer,
+            offset=_POOL_HEADER.size + index*self._level_size,
+        )
+
+    def sample(self, generator):
+        """
+        Return a random level.
+
+        Parameters
+        ----------
+        generator : :class:`random.Random`
+            The random number generator used to pick the level.
+
+        Returns
+        -------
+        :class:`frozenset` of :class:`tuple`
+            The positions of the walls of the level.
+
+        """
+
+        return self.get_level(generator.randrange(self._num_levels))
+
+    def close(self):
+        """
+        Close the level pool.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._buffer.close()
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'path',
+        help='The path to the level pool file which is written.'
+    )
+    parser.add_argument(
+        '--board_size',
+        type=int,
+        nargs=2,
+        help='The size of the board in the x and y directions.',
+        default=[25, 25]
+    )
+    parser.add_argument(
+        '--num_levels',
+        type=int,
+        help='The number of levels to generate.',
+        default=1000
+    )
+    parser.add_argument(
+        '--density',
+        type=float,
+        help='The fraction of the board covered by walls.',
+        default=0.1
+    )
+    parser.add_argument(
+        '--shapes',
+        nargs='+',
+        choices=SHAPES,
+        help='The shapes which can be placed.',
+        default=list(SHAPES)
+    )
+    parser.add_argument(
+        '--max_shape_size',
+        type=int,
+        help='The maximum length of a line, or side of a block.',
+        default=6
+    )
+    parser.add_argument(
+        '--random_seed',
+        type=int,
+        help='The random seed of the first level.',
+        default=0
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    write_level_pool(
+        path=args.path,
+        board_size=tuple(args.board_size),
+        levels=generate_levels(
+            board_size=tuple(args.board_size),
+            num_levels=args.num_levels,
+            random_seed=args.random_seed,
+            density=args.density,
+            shapes=tuple(args.shapes),
+            max_shape_size=args.max_shape_size,
+        ),
+    )
@@ -0,0 +1,855 @@
+"""
+Holds a lockstep networking layer for two-player matches.
+
+An :class:`.Arena` is fully deterministic given its arguments and
+the actions of its snakes, so two players can share a match by only
+sending each other their actions. Each player runs a
+:class:`LockstepPeer`, which holds its own copy of the arena.
+
+A peer never waits for the actions of the remote player. It predicts
+that the remote player pressed no key, which keeps the remote snake
+moving in the same direction, and steps the arena right away, so the
+local player sees the result of their input on the very next step.
+When the action the remote player actually took at an earlier step
+arrives and differs from the prediction, the peer rolls back: it
+restores the snapshot of the arena taken before that step, see
+:meth:`.Arena.get_state`, and steps the arena again up to the
+current step with the actual actions. A peer only stops to wait if
+the remote player falls more than a given number of steps behind.
+
+Actions are sent over UDP. Every message holds every local action
+the remote peer has not acknowledged yet, so a lost or late message
+is made up for by the next one.
+
+:class:`DelayLink` forwards messages between two peers on the same
+machine with an artificial delay, jitter and loss, and
+:func:`run_match` uses it to play a match between two random players
+and check that both peers end up in the same state. A match can be
+run from the command line with::
+
+    $ python -m snake.lockstep --delay 0.05 --jitter 0.01 --loss 0.05
+
+"""
+
+import argparse
+from collections import namedtuple
+import heapq
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+
+from .arena import Arena
+from .game import ACTIONS
+
+
+# Holds the number of remote actions received so far, the step of the
+# first action in the message and the number of actions.
+_MESSAGE_HEADER = struct.Struct('<IIH')
+# The code sent for a step in which the player pressed no key.
+_NO_ACTION = 255
+# The maximum number of actions sent in one message.
+_MAX_ACTIONS = 1024
+
+# The results of a match, as returned by run_match.
+MatchReport = namedtuple(
+    'MatchReport',
+    [
+        'num_steps',
+        'num_rollbacks',
+        'num_resimulated_steps',
+        'num_stalls',
+        'in_sync',
+    ],
+)
+
+
+def _encode_action(action):
+    """
+    Encode an action as a single byte.
+
+    Parameters
+    ----------
+    action : :class:`str` or :class:`int`
+        Can be ``'up'``, ``'down'``, ``'right'`` or ``'left'``, an
+        :class:`int` which indexes into :data:`.ACTIONS`, or ``None``
+        if the player pressed no key.
+
+    Returns
+    -------
+    :class:`int`
+        The code of the action.
+
+    """
+
+    if action is None:
+        return _NO_ACTION
+    if isinstance(action, str):
+        return ACTIONS.index(action)
+    return action
+
+
+class LockstepPeer:
+    """
+    Plays one side of a two-player match over the network.
+
+    Examples
+    --------
+
+    Both players create the same arena, and each creates a peer for
+    the snake it controls.
+
+    .. code-block:: python
+
+        arena = Arena(
+            board_size=(30, 30),
+            walls=(),
+            snakes=[((5, 15), 'right'), ((24, 15), 'left')],
+            random_seed=12,
+        )
+        peer = LockstepPeer(arena, player=0, address=('0.0.0.0', 5000))
+        peer.connect(('192.168.0.2', 5000))
+        while arena.get_num_alive() > 0:
+            if peer.advance(get_pressed_key()):
+                draw(arena)
+            wait_for_next_step()
+
+    """
+
+    def __init__(
+        self,
+        arena,
+        player,
+        address=('127.0.0.1', 0),
+        max_rollback=8,
+    ):
+        """
+        Initialize a :class:`LockstepPeer`.
+
+        Parameters
+        ----------
+        arena : :class:`.Arena`
+            The arena, which must have two snakes and be created with
+            the same arguments as the arena of the remote peer.
+
+        player : :class:`int`
+            The index of the snake controlled by the local player,
+            either ``0`` or ``1``.
+
+        address : :class:`tuple`, optional
+            The address on which messages from the remote peer are
+            received. If the port is ``0``, a free port is chosen,
+            see :meth:`get_address`.
+
+        max_rollback : :class:`int`, optional
+            The maximum number of steps the local player can be ahead
+            of the last action received from the remote player. This
+            is also the maximum number of steps stepped again in a
+            rollback.
+
+        """
+
+        self._arena = arena
+        self._player = player
+        self._max_rollback = max_rollback
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(address)
+        self._socket.setblocking(False)
+        self._remote_address = None
+
+        # The number of steps taken by the arena.
+        self._num_steps = 0
+        # The codes of the actions of the local and remote player at
+        # every step. Remote actions are only held once received, so
+        # the steps after them used predicted actions.
+        self._local_actions = bytearray()
+        self._remote_actions = bytearray()
+        # The number of local actions the remote peer has received.
+        self._num_acknowledged = 0
+        # Maps every step which used a predicted remote action to a
+        # snapshot of the arena before the step.
+        self._snapshots = {}
+        self._first_snapshot = 0
+
+        self._num_rollbacks = 0
+        self._num_resimulated_steps = 0
+        self._num_stalls = 0
+
+    def get_address(self):
+        """
+        Return the address on which messages are received.
+
+        Returns
+        -------
+        :class:`tuple`
+            The host and port.
+
+        """
+
+        return self._socket.getsockname()
+
+    def connect(self, address):
+        """
+        Set the address of the remote peer.
+
+        Parameters
+        ----------
+        address : :class:`tuple`
+            The address of the remote peer, see :meth:`get_address`.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._remote_address = address
+
+    def _receive(self):
+        """
+        Receive every waiting message from the remote peer.
+
+        Returns
+        -------
+        :class:`int`
+            The first step which used a wrong prediction, or ``None``
+            if every prediction was right.
+
+        """
+
+        mispredicted = None
+        while True:
+            try:
+                message = self._socket.recv(1 << 16)
+            except BlockingIOError:
+                return mispredicted
+            except ConnectionRefusedError:
+                # The remote peer is not listening yet.
+                continue
+
+            num_acknowledged, first, num_actions = (
+                _MESSAGE_HEADER.unpack_from(message)
+            )
+            self._num_acknowledged = max(
+                self._num_acknowledged,
+                num_acknowledged,
+            )
+            num_received = len(self._remote_actions)
+            if not first <= num_received < first+num_actions:
+                continue
+
+            start = _MESSAGE_HEADER.size + num_received - first
+            actions = message[start:_MESSAGE_HEADER.size+num_actions]
+            if mispredicted is None:
+                for step in range(
+                    num_received,
+                    min(self._num_steps, num_received+len(actions)),
+                ):
+                    if actions[step-num_received] != _NO_ACTION:
+                        mispredicted = step
+                        break
+            self._remote_actions += actions
+
+    def _send(self):
+        """
+        Send every local action the remote peer has not received.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        if self._remote_address is None:
+            return
+
+        first = self._num_acknowledged
+        actions = self._local_actions[first:first+_MAX_ACTIONS]
+        message = _MESSAGE_HEADER.pack(
+            len(self._remote_actions),
+            first,
+            len(actions),
+        ) + actions
+        try:
+            self._socket.sendto(message, self._remote_address)
+        except (BlockingIOError, ConnectionRefusedError):
+            # The message is sent again with the next one.
+            pass
+
+    def _take_step(self):
+        """
+        Take the next step of the arena.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        step = self._num_steps
+        if step < len(self._remote_actions):
+            remote = self._remote_actions[step]
+        else:
+            self._snapshots[step] = self._arena.get_state()
+            remote = _NO_ACTION
+
+        actions = [None, None]
+        local = self._local_actions[step]
+        actions[self._player] = None if local == _NO_ACTION else local
+        actions[1-self._player] = None if remote == _NO_ACTION else remote
+        self._arena.step(actions)
+        self._num_steps += 1
+
+    def _roll_back(self, step):
+        """
+        Step the arena again from `step`, with the received actions.
+
+        Parameters
+        ----------
+        step : :class:`int`
+            The first step which used a wrong prediction.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        num_steps = self._num_steps
+        self._arena.set_state(self._snapshots[step])
+        self._num_steps = step
+        while self._num_steps < num_steps:
+            self._take_step()
+        self._num_rollbacks += 1
+        self._num_resimulated_steps += num_steps - step
+
+    def _synchronize(self):
+        """
+        Apply the messages received from the remote peer.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        mispredicted = self._receive()
+        if mispredicted is not None:
+            self._roll_back(mispredicted)
+
+        # Steps which used received actions never roll back.
+        num_confirmed = self.get_num_confirmed_steps()
+        while self._first_snapshot < num_confirmed:
+            self._snapshots.pop(self._first_snapshot, None)
+            self._first_snapshot += 1
+
+    def advance(self, action=None):
+        """
+        Take the next step with the action of the local player.
+
+        Parameters
+        ----------
+        action : :class:`str` or :class:`int`, optional
+            Can be ``'up'``, ``'down'``, ``'right'`` or ``'left'``, an
+            :class:`int` which indexes into :data:`.ACTIONS`, or
+            ``None`` if the local player pressed no key.
+
+        Returns
+        -------
+        :class:`bool`
+            ``True`` if the step was taken and ``False`` if the remote
+            player is too far behind, in which case the action was not
+            used and should be passed again to the next call.
+
+        """
+
+        self._synchronize()
+        if (
+            self._num_steps - len(self._remote_actions)
+            >= self._max_rollback
+        ):
+            self._num_stalls += 1
+            self._send()
+            return False
+
+        self._local_actions.append(_encode_action(action))
+        self._take_step()
+        self._send()
+        return True
+
+    def poll(self):
+        """
+        Exchange messages without taking a step.
+
+        This should be called regularly while the local player does
+        not advance, for example after the match has ended, so that
+        the remote peer still receives every action.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._synchronize()
+        self._send()
+
+    def get_arena(self):
+        """
+        Return the arena.
+
+        Returns
+        -------
+        :class:`.Arena`
+            The arena, which holds the state of the current step,
+            including predicted remote actions.
+
+        """
+
+        return self._arena
+
+    def get_num_steps(self):
+        """
+        Return the number of steps taken.
+
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken.
+
+        """
+
+        return self._num_steps
+
+    def get_num_confirmed_steps(self):
+        """
+        Return the number of steps which used no predicted actions.
+
+        Returns
+        -------
+        :class:`int`
+            The number of confirmed steps. These steps are the same
+            for both peers and never roll back.
+
+        """
+
+        return min(self._num_steps, len(self._remote_actions))
+
+    def get_num_acknowledged_steps(self):
+        """
+        Return the number of local actions the remote peer received.
+
+        Returns
+        -------
+        :class:`int`
+            The number of acknowledged local actions.
+
+        """
+
+        return self._num_acknowledged
+
+    def get_num_rollbacks(self):
+        """
+        Return the number of rollbacks.
+
+        Returns
+        -------
+        :class:`int`
+            The number of times a wrong prediction was corrected.
+
+        """
+
+        return self._num_rollbacks
+
+    def get_num_resimulated_steps(self):
+        """
+        Return the number of steps taken again in rollbacks.
+
+        Returns
+        -------
+        :class:`int`
+            The number of steps taken again.
+
+        """
+
+        return self._num_resimulated_steps
+
+    def get_num_stalls(self):
+        """
+        Return the number of times :meth:`advance` had to wait.
+
+        Returns
+        -------
+        :class:`int`
+            The number of calls to :meth:`advance` which did not take
+            a step.
+
+        """
+
+        return self._num_stalls
+
+    def close(self):
+        """
+        Close the socket of the peer.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._socket.close()
+
+
+class DelayLink:
+    """
+    Forwards UDP messages on this machine with an artificial delay.
+
+    Messages sent to the link are forwarded to a target address by a
+    background thread, after a fixed delay plus a random jitter, so
+    messages can also arrive out of order. A fraction of the messages
+    can be dropped.
+
+    """
+
+    def __init__(
+        self,
+        target_address,
+        delay,
+        jitter=0.,
+        loss=0.,
+        random_seed=0,
+    ):
+        """
+        Initialize a :class:`DelayLink`.
+
+        Parameters
+        ----------
+        target_address : :class:`tuple`
+            The address messages are forwarded to.
+
+        delay : :class:`float`
+            The minimum time in seconds a message is held.
+
+        jitter : :class:`float`, optional
+            The maximum time in seconds added to `delay`.
+
+        loss : :class:`float`, optional
+            The fraction of the messages which are dropped.
+
+        random_seed : :class:`int`, optional
+            The random seed used for the jitter and loss.
+
+        """
+
+        self._target_address = target_address
+        self._delay = delay
+        self._jitter = jitter
+        self._loss = loss
+        self._generator = random.Random(random_seed)
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._forward, daemon=True)
+        self._thread.start()
+
+    def get_address(self):
+        """
+        Return the address messages should be sent to.
+
+        Returns
+        -------
+        :class:`tuple`
+            The host and port.
+
+        """
+
+        return self._socket.getsockname()
+
+    def _forward(self):
+        """
+        Forward messages until the link is closed.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        # Holds the messages waiting to be forwarded, each of the form
+        # (time, sequence number, message).
+        pending = []
+        sequence = 0
+        while not self._closed.is_set():
+            timeout = 0.01
+            if pending:
+                timeout = min(timeout, pending[0][0] - time.perf_counter())
+            readable, _, _ = select.select(
+                [self._socket], [], [], max(timeout, 0.)
+            )
+            if readable:
+                message = self._socket.recv(1 << 16)
+                if self._generator.random() >= self._loss:
+                    due = (
+                        time.perf_counter()
+                        + self._delay
+                        + self._generator.uniform(0., self._jitter)
+                    )
+                    heapq.heappush(pending, (due, sequence, message))
+                    sequence += 1
+
+            now = time.perf_counter()
+            while pending and pending[0][0] <= now:
+                _, _, message = heapq.heappop(pending)
+                try:
+                    self._socket.sendto(message, self._target_address)
+                except OSError:
+                    pass
+
+    def close(self):
+        """
+        Stop forwarding messages.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._closed.set()
+        self._thread.join()
+        self._socket.close()
+
+
+def _get_actions(num_steps, turn_probability, random_seed):
+    """
+    Return the actions of a random player.
+
+    Parameters
+    ----------
+    num_steps : :class:`int`
+        The number of steps.
+
+    turn_probability : :class:`float`
+        The probability of pressing a key at each step.
+
+    random_seed : :class:`int`
+        The random seed.
+
+    Returns
+    -------
+    :class:`list`
+        The action of every step, either an :class:`int` which
+        indexes into :data:`.ACTIONS` or ``None``.
+
+    """
+
+    generator = random.Random(random_seed)
+    return [
+        generator.randrange(len(ACTIONS))
+        if generator.random() < turn_probability else None
+        for step in range(num_steps)
+    ]
+
+
+def run_match(
+    num_steps=600,
+    delay=0.05,
+    jitter=0.,
+    loss=0.,
+    step_time=1/60,
+    max_rollback=8,
+    board_size=(30, 30),
+    turn_probability=0.1,
+    random_seed=0,
+    timeout=10.,
+):
+    """
+    Play a match between two random players over a delayed link.
+
+    Both peers run on this machine and take a step every `step_time`
+    seconds, while their messages go through a :class:`DelayLink` in
+    each direction. Once both peers have confirmed every step, the
+    states of their arenas are compared.
+
+    Parameters
+    ----------
+    num_steps : :class:`int`, optional
+        The number of steps in the match.
+
+    delay : :class:`float`, optional
+        The one-way delay of the link, in seconds.
+
+    jitter : :class:`float`, optional
+        The maximum random delay added to each message, in seconds.
+
+    loss : :class:`float`, optional
+        The fraction of the messages which are dropped.
+
+    step_time : :class:`float`, optional
+        The time between steps, in seconds.
+
+    max_rollback : :class:`int`, optional
+        Passed to :class:`LockstepPeer`.
+
+    board_size : :class:`tuple`, optional
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    turn_probability : :class:`float`, optional
+        The probability that a player presses a key at each step.
+
+    random_seed : :class:`int`, optional
+        The random seed of the arena, players and links.
+
+    timeout : :class:`float`, optional
+        The maximum time in seconds to wait for the peers to confirm
+        every step after the last one is taken.
+
+    Returns
+    -------
+    :class:`MatchReport`
+        The results of the match. The rollbacks, steps taken again
+        and stalls are summed over both peers.
+
+    """
+
+    board_x, board_y = board_size
+    snakes = [
+        ((board_x//4, board_y//2), 'right'),
+        ((board_x-1-board_x//4, board_y//2), 'left'),
+    ]
+    peers = [
+        LockstepPeer(
+            arena=Arena(board_size, (), snakes, random_seed),
+            player=player,
+            max_rollback=max_rollback,
+        )
+        for player in range(2)
+    ]
+    links = [
+        DelayLink(
+            target_address=peers[1-player].get_address(),
+            delay=delay,
+            jitter=jitter,
+            loss=loss,
+            random_seed=random_seed+player,
+        )
+        for player in range(2)
+    ]
+    for peer, link in zip(peers, links):
+        peer.connect(link.get_address())
+    actions = [
+        _get_actions(num_steps, turn_probability, random_seed+player)
+        for player in range(2)
+    ]
+
+    next_step = time.perf_counter()
+    while any(peer.get_num_steps() < num_steps for peer in peers):
+        for peer, player_actions in zip(peers, actions):
+            if peer.get_num_steps() < num_steps:
+                peer.advance(player_actions[peer.get_num_steps()])
+            else:
+                peer.poll()
+        next_step += step_time
+        time.sleep(max(next_step - time.perf_counter(), 0.))
+
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end and any(
+        peer.get_num_confirmed_steps() < num_steps
+        or peer.get_num_acknowledged_steps() < num_steps
+        for peer in peers
+    ):
+        for peer in peers:
+            peer.poll()
+        time.sleep(step_time)
+
+    in_sync = all(
+        peer.get_num_confirmed_steps() == num_steps for peer in peers
+    ) and (
+        peers[0].get_arena().get_state()
+        == peers[1].get_arena().get_state()
+    )
+    report = MatchReport(
+        num_steps=num_steps,
+        num_rollbacks=sum(peer.get_num_rollbacks() for peer in peers),
+        num_resimulated_steps=sum(
+            peer.get_num_resimulated_steps() for peer in peers
+        ),
+        num_stalls=sum(peer.get_num_stalls() for peer in peers),
+        in_sync=in_sync,
+    )
+    for link in links:
+        link.close()
+    for peer in peers:
+        peer.close()
+    return report
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--num_steps',
+        type=int,
+        help='The number of steps in the match.',
+        default=600
+    )
+    parser.add_argument(
+        '--delay',
+        type=float,
+        help='The one-way delay of the link, in seconds.',
+        default=0.05
+    )
+    parser.add_argument(
+        '--jitter',
+        type=float,
+        help='The maximum random delay added to each message.',
+        default=0.
+    )
+    parser.add_argument(
+        '--loss',
+        type=float,
+        help='The fraction of messages which are dropped.',
+        default=0.
+    )
+    parser.add_argument(
+        '--step_time',
+        type=float,
+        help='The time between steps, in seconds.',
+        default=1/60
+    )
+    parser.add_argument(
+        '--max_rollback',
+        type=int,
+        help='The maximum number of steps a peer can roll back.',
+        default=8
+    )
+    parser.add_argument(
+        '--random_seed',
+        type=int,
+        help='The random seed of the arena, players and links.',
+        default=0
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    report = run_match(
+        num_steps=args.num_steps,
+        delay=args.delay,
+        jitter=args.jitter,
+        loss=args.loss,
+        step_time=args.step_time,
+        max_rollback=args.max_rollback,
+        random_seed=args.random_seed,
+    )
+    for name, value in zip(report._fields, report):
+        print(f'{name}: {value}')
+    if not report.in_sync:
+        sys.exit(1)
@@ -0,0 +1,426 @@
+"""
+Holds a benchmark of the memory used by each :class:`.SnakeGame`.
+
+The memory of a game is measured in two ways. :mod:`tracemalloc`
+gives the memory actually allocated when many games are created,
+while a walk with :func:`sys.getsizeof` breaks the memory of a single
+game down by attribute. Objects shared between games, such as the
+tables of the board, are not counted by either.
+
+The benchmark can be run with::
+
+    $ python -m snake.memory
+
+and exits with a non-zero status if a game of any benchmarked case
+uses more bytes than its budget. The budget of a game is a fixed
+number of bytes, plus a number of bytes for every cell of its board
+and for every segment of its snake.
+
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from .game import SnakeGame
+
+
+# The default budget of a game, in bytes, before adding the bytes
+# allowed for every cell of the board and every segment of the snake.
+BUDGET = 4096
+CELL_BUDGET = 2
+SEGMENT_BUDGET = 12
+
+# The cases which are benchmarked, each of the form
+# (board_size, num_walls, snake_length).
+CASES = (
+    ((25, 25), 0, 1),
+    ((25, 25), 0, 100),
+    ((25, 25), 100, 100),
+    ((25, 25), 0, 500),
+    ((50, 50), 250, 1000),
+)
+
+
+def get_walls(board_size, num_walls):
+    """
+    Return the positions of walls for a benchmark.
+
+    The walls fill the board column by column, starting from the
+    right edge, so that they do not overlap the snake made by
+    :func:`set_snake_length` unless the board is almost full.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    num_walls : :class:`int`
+        The number of walls.
+
+    Returns
+    -------
+    :class:`frozenset` of :class:`tuple`
+        The positions of the walls.
+
+    """
+
+    board_x, board_y = board_size
+    return frozenset(
+        (board_x-1-index//board_y, index % board_y)
+        for index in range(num_walls)
+    )
+
+
+def set_snake_length(game, length):
+    """
+    Replace the snake of `game` with one of a given length.
+
+    The snake winds through the board column by column, with its
+    head at ``(0, 0)``.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    length : :class:`int`
+        The length of the snake.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    board = game._board
+    board_x, board_y = board.board_size
+    body = []
+    for index in range(length):
+        x, y = divmod(index, board_y)
+        if x % 2:
+            y = board_y-1-y
+        body.append(board.get_cell((x, y)))
+    game._snake.set_body(reversed(body))
+
+
+def _get_referents(obj):
+    """
+    Return the objects `obj` refers to, other than types and modules.
+
+    Parameters
+    ----------
+    obj : :class:`object`
+        The object.
+
+    Returns
+    -------
+    :class:`list`
+        The objects referred to by `obj`.
+
+    """
+
+    return [
+        referent for referent in gc.get_referents(obj)
+        if not isinstance(referent, (type, type(sys)))
+    ]
+
+
+def _get_reachable(obj):
+    """
+    Return every object reachable from `obj`.
+
+    Parameters
+    ----------
+    obj : :class:`object`
+        The object.
+
+    Returns
+    -------
+    :class:`dict`
+        Maps the :func:`id` of every object reachable from `obj`,
+        including `obj` itself, to the object.
+
+    """
+
+    reachable = {}
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) not in reachable:
+            reachable[id(obj)] = obj
+            stack.extend(_get_referents(obj))
+    return reachable
+
+
+def get_sizes(game, other):
+    """
+    Break the memory used by `game` down by attribute.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    other : :class:`.SnakeGame`
+        Another game of the same case. Objects which can be reached
+        from both games are shared, and are not counted.
+
+    Returns
+    -------
+    :class:`dict`
+        Maps the name of every attribute of `game` to the number of
+        bytes used by the objects which can only be reached from
+        `game` through that attribute. The bytes used by the
+        :class:`.SnakeGame` instance itself are held under
+        ``'SnakeGame'``.
+
+    """
+
+    counted = _get_reachable(other)
+    counted[id(game)] = game
+    sizes = {'SnakeGame': sys.getsizeof(game)}
+    if hasattr(game, '__dict__'):
+        counted[id(game.__dict__)] = game.__dict__
+        sizes['SnakeGame'] += sys.getsizeof(game.__dict__)
+        names = list(vars(game))
+    else:
+        names = type(game).__slots__
+
+    for name in names:
+        size = 0
+        stack = [getattr(game, name)]
+        while stack:
+            obj = stack.pop()
+            if id(obj) not in counted:
+                counted[id(obj)] = obj
+                size += sys.getsizeof(obj)
+                stack.extend(_get_referents(obj))
+        sizes[name] = size
+    return sizes
+
+
+def measure(
+    board_size,
+    num_walls,
+    snake_length,
+    num_games=1000,
+    counter_rng=False,
+):
+    """
+    Measure the memory allocated for each game with :mod:`tracemalloc`.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    num_walls : :class:`int`
+        The number of walls, see :func:`get_walls`.
+
+    snake_length : :class:`int`
+        The length of the snake in every game.
+
+    num_games : :class:`int`, optional
+        The number of games which are created. The memory they use
+        is averaged.
+
+    counter_rng : :class:`bool`, optional
+        Passed to :class:`.SnakeGame`.
+
+    Returns
+    -------
+    :class:`float`
+        The number of bytes allocated for each game.
+
+    """
+
+    walls = get_walls(board_size, num_walls)
+    # Create a game first, so that objects shared between games are
+    # not counted.
+    SnakeGame(board_size, walls, 0, counter_rng)
+
+    games = []
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    for random_seed in range(num_games):
+        game = SnakeGame(board_size, walls, random_seed, counter_rng)
+        set_snake_length(game, snake_length)
+        games.append(game)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding the games is not part of their cost.
+    return (end - start - sys.getsizeof(games)) / num_games
+
+
+def get_budget(
+    board_size,
+    snake_length,
+    budget=BUDGET,
+    cell_budget=CELL_BUDGET,
+    segment_budget=SEGMENT_BUDGET,
+):
+    """
+    Return the maximum number of bytes a game can use.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    snake_length : :class:`int`
+        The length of the snake.
+
+    budget : :class:`int`, optional
+        The number of bytes allowed for every game.
+
+    cell_budget : :class:`int`, optional
+        The number of bytes allowed for every position of the board.
+
+    segment_budget : :class:`int`, optional
+        The number of bytes allowed for every segment of the snake.
+
+    Returns
+    -------
+    :class:`int`
+        The budget.
+
+    """
+
+    board_x, board_y = board_size
+    return (
+        budget
+        + cell_budget*board_x*board_y
+        + segment_budget*snake_length
+    )
+
+
+def run(
+    cases=CASES,
+    budget=BUDGET,
+    cell_budget=CELL_BUDGET,
+    segment_budget=SEGMENT_BUDGET,
+    num_games=1000,
+    counter_rng=False,
+):
+    """
+    Benchmark the memory used by each game and print a report.
+
+    Parameters
+    ----------
+    cases : :class:`iterable` of :class:`tuple`
+        Holds a :class:`tuple` of the form
+        ``((25, 25), num_walls, snake_length)`` for every benchmarked
+        case.
+
+    budget : :class:`int`, optional
+        The number of bytes allowed for every game.
+
+    cell_budget : :class:`int`, optional
+        The number of bytes allowed for every position of the board.
+
+    segment_budget : :class:`int`, optional
+        The number of bytes allowed for every segment of the snake.
+
+    num_games : :class:`int`, optional
+        The number of games created for each case.
+
+    counter_rng : :class:`bool`, optional
+        Passed to :class:`.SnakeGame`.
+
+    Returns
+    -------
+    :class:`bool`
+        ``True`` if the games of every case are within their budget
+        and ``False`` otherwise.
+
+    """
+
+    within_budget = True
+    for board_size, num_walls, snake_length in cases:
+        bytes_per_game = measure(
+            board_size=board_size,
+            num_walls=num_walls,
+            snake_length=snake_length,
+            num_games=num_games,
+            counter_rng=counter_rng,
+        )
+        walls = get_walls(board_size, num_walls)
+        game, other = (
+            SnakeGame(board_size, walls, random_seed, counter_rng)
+            for random_seed in range(2)
+        )
+        set_snake_length(game, snake_length)
+        set_snake_length(other, snake_length)
+        sizes = get_sizes(game, other)
+
+        case_budget = get_budget(
+            board_size=board_size,
+            snake_length=snake_length,
+            budget=budget,
+            cell_budget=cell_budget,
+            segment_budget=segment_budget,
+        )
+        status = 'ok' if bytes_per_game <= case_budget else 'OVER BUDGET'
+        print(
+            f'board {board_size[0]}x{board_size[1]}, '
+            f'{num_walls} walls, length {snake_length}: '
+            f'{bytes_per_game:.0f} of {case_budget} bytes per game '
+            f'({status})'
+        )
+        for name, size in sorted(sizes.items(), key=lambda x: -x[1]):
+            if size:
+                print(f'    {name:<16}{size:>8}')
+        within_budget = within_budget and bytes_per_game <= case_budget
+
+    return within_budget
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--budget',
+        type=int,
+        help='The number of bytes allowed for every game.',
+        default=BUDGET
+    )
+    parser.add_argument(
+        '--cell_budget',
+        type=int,
+        help='The number of bytes allowed for every board position.',
+        default=CELL_BUDGET
+    )
+    parser.add_argument(
+        '--segment_budget',
+        type=int,
+        help='The number of bytes allowed for every snake segment.',
+        default=SEGMENT_BUDGET
+    )
+    parser.add_argument(
+        '--num_games',
+        type=int,
+        help='The number of games created for each case.',
+        default=1000
+    )
+    parser.add_argument(
+        '--counter_rng',
+        action='store_true',
+        help='Generate apple locations with a counter-based RNG.'
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    if not run(
+        budget=args.budget,
+        cell_budget=args.cell_budget,
+        segment_budget=args.segment_budget,
+        num_games=args.num_games,
+        counter_rng=args.counter_rng,
+    ):
+        sys.exit(1)
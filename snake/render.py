@@ -0,0 +1,495 @@
+"""
+Holds tools for rendering games of snake to images and videos.
+
+Games are first turned into grids, which hold one value per position
+on the board, and the grids are then scaled into frames with NumPy,
+many at a time if needed. Frames are streamed into writers one by one,
+so episodes of any length can be exported without holding them in
+memory.
+
+Examples
+--------
+
+.. code-block:: python
+
+    replays = [
+        Replay(
+            board_size=(25, 25),
+            walls=(),
+            random_seed=seed,
+            actions=actions,
+        )
+        for seed, actions in episodes
+    ]
+    paths = [f'episode_{i}.gif' for i in range(len(replays))]
+    export_replays(replays, paths, processes=8)
+
+"""
+
+import multiprocessing
+import struct
+
+import numpy as np
+
+from .framebuffer import EMPTY, WALL, SNAKE, HEAD, APPLE
+from .game import SnakeGame
+
+
+# The RGB color of each grid value.
+PALETTE = np.zeros((8, 3), dtype=np.uint8)
+PALETTE[EMPTY] = (0, 0, 0)
+PALETTE[WALL] = (128, 128, 128)
+PALETTE[SNAKE] = (0, 170, 0)
+PALETTE[HEAD] = (120, 255, 120)
+PALETTE[APPLE] = (220, 0, 0)
+
+
+def get_walls_grid(game):
+    """
+    Return a grid holding only the walls of `game`.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.uint8`
+        An array of shape ``(board_y, board_x)``. Row ``y`` holds
+        the positions with the y coordinate ``y``, so row ``0`` is
+        shown at the top of the image, as in :class:`.GameIO`.
+
+    """
+
+    board_x, board_y = game.get_board_size()
+    grid = np.full((board_y, board_x), EMPTY, dtype=np.uint8)
+    walls = np.array(list(game.get_walls()), dtype=np.int64)
+    if len(walls):
+        grid[walls[:, 1], walls[:, 0]] = WALL
+    return grid
+
+
+def get_grid(game, walls_grid=None):
+    """
+    Return a grid holding the state of `game`.
+
+    Parameters
+    ----------
+    game : :class:`.SnakeGame`
+        The game.
+
+    walls_grid : :class:`numpy.ndarray`, optional
+        The grid returned by :func:`get_walls_grid` for `game`.
+        Passing it avoids redrawing the walls for every frame.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.uint8`
+        An array of shape ``(board_y, board_x)``, holding
+        :data:`.EMPTY`, :data:`.WALL`, :data:`.SNAKE`,
+        :data:`.HEAD` or :data:`.APPLE` for every position, with
+        rows ordered as in :func:`get_walls_grid`.
+
+    """
+
+    if walls_grid is None:
+        walls_grid = get_walls_grid(game)
+    grid = walls_grid.copy()
+    board_x, board_y = game.get_board_size()
+
+    snake = np.array(list(game.get_snake()), dtype=np.int64)
+    # A dead snake can be partly outside the board.
+    inside = (
+        (snake[:, 0] >= 0)
+        & (snake[:, 0] < board_x)
+        & (snake[:, 1] >= 0)
+        & (snake[:, 1] < board_y)
+    )
+    snake = snake[inside]
+    grid[snake[:, 1], snake[:, 0]] = SNAKE
+    if inside[-1]:
+        grid[snake[-1, 1], snake[-1, 0]] = HEAD
+
+    # There is no apple once the snake fills every free position.
+    apple = game.get_apple()
+    if apple is not None:
+        apple_x, apple_y = apple
+        grid[apple_y, apple_x] = APPLE
+    return grid
+
+
+def scale(grids, cell_size):
+    """
+    Scale grids so that every position covers a square of pixels.
+
+    Parameters
+    ----------
+    grids : :class:`numpy.ndarray`
+        An array of shape ``(..., board_y, board_x)``, such as a
+        single grid or a batch of them.
+
+    cell_size : :class:`int`
+        The width and height, in pixels, of each position.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        An array of shape
+        ``(..., board_y*cell_size, board_x*cell_size)``.
+
+    """
+
+    return np.repeat(
+        np.repeat(grids, cell_size, axis=-2),
+        cell_size,
+        axis=-1,
+    )
+
+
+def rasterize(grids, cell_size=8):
+    """
+    Turn grids into RGB frames.
+
+    Parameters
+    ----------
+    grids : :class:`numpy.ndarray`
+        An array of shape ``(..., board_y, board_x)``, such as a
+        single grid or a batch of them.
+
+    cell_size : :class:`int`, optional
+        The width and height, in pixels, of each position.
+
+    Returns
+    -------
+    :class:`numpy.ndarray` of :class:`numpy.uint8`
+        An array of shape
+        ``(..., board_y*cell_size, board_x*cell_size, 3)``.
+
+    """
+
+    return PALETTE[scale(grids, cell_size)]
+
+
+def iter_grids(replay):
+    """
+    Yield the grid of every step of a replay.
+
+    Parameters
+    ----------
+    replay : :class:`.Replay`
+        The replay.
+
+    Yields
+    ------
+    :class:`numpy.ndarray` of :class:`numpy.uint8`
+        The grid, as returned by :func:`get_grid`, before any
+        actions are applied and after every step. The replay stops
+        when the snake dies.
+
+    """
+
+    game = SnakeGame.from_replay(replay)
+    walls_grid = get_walls_grid(game)
+    yield get_grid(game, walls_grid)
+    for action in replay.actions:
+        alive, _, _ = game.run_actions((action, ))
+        yield get_grid(game, walls_grid)
+        if not alive:
+            break
+
+
+class RawVideoWriter:
+    """
+    Writes frames into a raw RGB video file.
+
+    The file holds the bytes of every frame, one after another, and
+    can be converted with, for example::
+
+        $ ffmpeg -f rawvideo -pix_fmt rgb24 -s 200x200 -i video.rgb video.mp4
+
+    """
+
+    def __init__(self, path):
+        """
+        Initialize a :class:`RawVideoWriter`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the video file.
+
+        """
+
+        self._file = open(path, 'wb')
+
+    def write(self, frame):
+        """
+        Write a frame.
+
+        Parameters
+        ----------
+        frame : :class:`numpy.ndarray` of :class:`numpy.uint8`
+            An RGB frame, as returned by :func:`rasterize`.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._file.write(np.ascontiguousarray(frame).data)
+
+    def write_grid(self, grid, cell_size):
+        """
+        Write a grid as a frame.
+
+        Parameters
+        ----------
+        grid : :class:`numpy.ndarray` of :class:`numpy.uint8`
+            The grid, as returned by :func:`get_grid`.
+
+        cell_size : :class:`int`
+            The width and height, in pixels, of each position.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self.write(rasterize(grid, cell_size))
+
+    def close(self):
+        """
+        Close the video file.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._file.close()
+
+
+class GifWriter:
+    """
+    Writes frames into an animated GIF file.
+
+    Frames are written as they arrive. Only the rectangle which
+    changed since the previous frame is written, and pixels are
+    encoded without compression, which can be done with NumPy for
+    the whole rectangle at once.
+
+    """
+
+    def __init__(self, path, frame_size, delay=0.1):
+        """
+        Initialize a :class:`GifWriter`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the GIF file.
+
+        frame_size : :class:`tuple`
+            A :class:`tuple` of the form ``(200, 120)``, holding the
+            width and height of the frames, in pixels.
+
+        delay : :class:`float`, optional
+            The time in seconds between frames.
+
+        """
+
+        self._file = open(path, 'wb')
+        self._previous = None
+        self._delay = round(delay*100)
+        width, height = frame_size
+        self._file.write(b'GIF89a')
+        # Use a global color table with the 8 colors of PALETTE.
+        self._file.write(struct.pack('<HHBBB', width, height, 0xA2, 0, 0))
+        self._file.write(PALETTE.tobytes())
+        # Loop forever.
+        self._file.write(
+            b'\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00'
+        )
+
+    def write_grid(self, grid, cell_size):
+        """
+        Write a grid as a frame.
+
+        Parameters
+        ----------
+        grid : :class:`numpy.ndarray` of :class:`numpy.uint8`
+            The grid, as returned by :func:`get_grid`.
+
+        cell_size : :class:`int`
+            The width and height, in pixels, of each position.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        pixels = scale(grid, cell_size)
+        if self._previous is None:
+            top, left = 0, 0
+            changed = pixels
+        else:
+            rows, columns = np.nonzero(pixels != self._previous)
+            if len(rows) == 0:
+                rows, columns = np.zeros(1, dtype=int), np.zeros(1, int)
+            top, left = rows.min(), columns.min()
+            changed = pixels[top:rows.max()+1, left:columns.max()+1]
+        self._previous = pixels
+
+        height, width = changed.shape
+        # Graphic control extension, leaving the previous frame in
+        # place so that only the changed rectangle is drawn.
+        self._file.write(
+            struct.pack('<BBBBHBB', 0x21, 0xF9, 4, 0x04, self._delay, 0, 0)
+        )
+        self._file.write(
+            struct.pack('<BHHHHB', 0x2C, left, top, width, height, 0)
+        )
+        self._file.write(b'\x03')
+        data = _encode_pixels(changed.ravel())
+        for start in range(0, len(data), 255):
+            block = data[start:start+255]
+            self._file.write(bytes((len(block), )))
+            self._file.write(block)
+        self._file.write(b'\x00')
+
+    def close(self):
+        """
+        Finish and close the GIF file.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        self._file.write(b'\x3B')
+        self._file.close()
+
+
+def _encode_pixels(pixels):
+    """
+    Encode pixels as uncompressed GIF image data.
+
+    With a minimum code size of 3, every pixel is a 4 bit code. A
+    clear code is written before every 6 pixels, which stops the
+    decoder from increasing the code size, so the codes can be
+    packed two to a byte.
+
+    Parameters
+    ----------
+    pixels : :class:`numpy.ndarray` of :class:`numpy.uint8`
+        The palette index of every pixel.
+
+    Returns
+    -------
+    :class:`bytes`
+        The image data, without the sub-block lengths.
+
+    """
+
+    clear, end = 8, 9
+    num_chunks = -(-len(pixels) // 6)
+    codes = np.zeros((num_chunks, 7), dtype=np.uint8)
+    codes[:, 0] = clear
+    codes[:, 1:].flat[:len(pixels)] = pixels
+    num_codes = len(pixels) + num_chunks
+    codes = np.append(codes.ravel()[:num_codes], end)
+    if len(codes) % 2:
+        codes = np.append(codes, 0)
+    return (codes[0::2] | (codes[1::2] << 4)).astype(np.uint8).tobytes()
+
+
+def export_replay(replay, path, cell_size=8, delay=0.1):
+    """
+    Export a replay as a GIF or raw video.
+
+    Parameters
+    ----------
+    replay : :class:`.Replay`
+        The replay.
+
+    path : :class:`str`
+        The path to the exported file. If it ends with ``'.gif'``, a
+        GIF is written, otherwise a raw video, see
+        :class:`RawVideoWriter`.
+
+    cell_size : :class:`int`, optional
+        The width and height, in pixels, of each position.
+
+    delay : :class:`float`, optional
+        The time in seconds between frames of a GIF.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    board_x, board_y = replay.board_size
+    if path.endswith('.gif'):
+        writer = GifWriter(
+            path=path,
+            frame_size=(board_x*cell_size, board_y*cell_size),
+            delay=delay,
+        )
+    else:
+        writer = RawVideoWriter(path)
+
+    for grid in iter_grids(replay):
+        writer.write_grid(grid, cell_size)
+    writer.close()
+
+
+def export_replays(
+    replays,
+    paths,
+    cell_size=8,
+    delay=0.1,
+    processes=None,
+):
+    """
+    Export many replays in parallel.
+
+    Parameters
+    ----------
+    replays : :class:`list` of :class:`.Replay`
+        The replays.
+
+    paths : :class:`list` of :class:`str`
+        The path to the exported file of each replay, see
+        :func:`export_replay`.
+
+    cell_size : :class:`int`, optional
+        The width and height, in pixels, of each position.
+
+    delay : :class:`float`, optional
+        The time in seconds between frames of a GIF.
+
+    processes : :class:`int`, optional
+        The number of processes to use. If ``None``, one process per
+        CPU is used.
+
+    Returns
+    -------
+    None : :class:`NoneType`
+
+    """
+
+    with multiprocessing.Pool(processes) as pool:
+        pool.starmap(
+            export_replay,
+            (
+                (replay, path, cell_size, delay)
+                for replay, path in zip(replays, paths)
+            ),
+        )
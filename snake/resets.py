@@ -0,0 +1,746 @@
+"""
+Holds reset pools, which store many starting states of games.
+
+A fresh :class:`.SnakeGame` always starts with a snake of length one
+at ``(0, 0)``, moving right. A reset pool instead holds many starting
+states, each with a snake of random length and placement on one of a
+list of levels, so that episodes start from diverse states. A state
+is restored into an existing game with :meth:`.SnakeGame.reset`,
+which only costs as much as the length of the snake.
+
+Every state is stored as a fixed size record of cells, so a
+:class:`ResetPool` memory-maps the file and reads any state without
+reading the others. Any number of worker processes can sample from
+the same pool, and if the file is on a memory backed file system,
+such as ``/dev/shm``, the pool never touches the disk.
+
+The pool also holds a weight for every level, which sets how often
+states of that level are sampled. The weights can be changed by one
+process, for example to follow a curriculum while training runs,
+and every worker sampling from the pool picks up the new mix.
+
+A reset pool can be created from the command line with::
+
+    $ python -m snake.resets resets.pool --levels levels.pool
+
+"""
+
+import argparse
+import bisect
+import itertools
+import mmap
+import random
+import struct
+
+import numpy as np
+
+from .game import (
+    ACTIONS,
+    _find_free_cell,
+    _get_board,
+    _get_blocked_cells,
+)
+from .levels import LevelPool, _pack_level, _unpack_level
+
+
+# The header of a reset pool holds the magic bytes, format version,
+# board size, number of levels, number of states of every level and
+# the maximum length of a snake. The last field counts the changes
+# made to the weights of the levels.
+_POOL_HEADER = struct.Struct('<4sBHHIIIQ')
+_POOL_MAGIC = b'SNKR'
+_POOL_VERSION = 2
+_WEIGHTS_VERSION_OFFSET = _POOL_HEADER.size - 8
+_WEIGHTS_VERSION = struct.Struct('<Q')
+
+# Every state is stored as a record of int64 values holding the
+# index of its level, the index of its direction in ACTIONS, the
+# length of the snake, the cell of the apple, the random seed of the
+# game and the cells of the snake, from the tail to the head. The
+# values are 64-bit so that any seed in the range of _RECORD can be
+# stored.
+_RECORD = np.dtype('<i8')
+_RECORD_FIELDS = 5
+
+
+def _align(offset):
+    """
+    Round `offset` up to a multiple of 8.
+
+    Parameters
+    ----------
+    offset : :class:`int`
+        The offset.
+
+    Returns
+    -------
+    :class:`int`
+        The aligned offset.
+
+    """
+
+    return -(-offset // 8) * 8
+
+
+def _get_layout(board_size, num_levels, num_states, max_length):
+    """
+    Return the offsets of the sections of a reset pool.
+
+    Parameters
+    ----------
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    num_levels : :class:`int`
+        The number of levels.
+
+    num_states : :class:`int`
+        The number of states of every level.
+
+    max_length : :class:`int`
+        The maximum length of a snake.
+
+    Returns
+    -------
+    :class:`tuple`
+        A :class:`tuple` of the form
+        ``(weights, levels, states, size)`` giving the offsets of the
+        weights, levels and states and the size of the file.
+
+    """
+
+    board_x, board_y = board_size
+    level_size = -(-board_x*board_y // 8)
+    weights = _align(_POOL_HEADER.size)
+    levels = weights + 8*num_levels
+    states = _align(levels + level_size*num_levels)
+    record_size = _RECORD.itemsize * (_RECORD_FIELDS+max_length)
+    size = states + record_size*num_levels*num_states
+    return weights, levels, states, size
+
+
+def _get_random_body(board, blocked, length, generator, max_attempts=100):
+    """
+    Place a snake of a given length at random.
+
+    The snake is grown from its tail with a random walk which never
+    crosses a wall or itself. The snake moves towards a free
+    position next to its head, so unless it eats an apple which
+    makes it grow into a wall or itself, it survives its first step.
+
+    Parameters
+    ----------
+    board : :class:`._Board`
+        The board.
+
+    blocked : :class:`bytes`
+        Holds ``1`` for every cell of `board` which cannot be
+        entered, including the padding.
+
+    length : :class:`int`
+        The length of the snake.
+
+    generator : :class:`random.Random`
+        The random number generator.
+
+    max_attempts : :class:`int`, optional
+        The number of random walks tried before giving up.
+
+    Returns
+    -------
+    :class:`tuple`
+        A :class:`tuple` of the form ``(body, direction)``, where
+        `body` holds the cells of the snake from the tail to the head,
+        or ``None`` if no snake was placed.
+
+    """
+
+    num_free = blocked.count(0)
+    if num_free < length + 1:
+        return None
+
+    directions = list(range(len(ACTIONS)))
+    for attempt in range(max_attempts):
+        occupied = bytearray(blocked)
+        cell = _find_free_cell(blocked, generator.randrange(num_free))
+        occupied[cell] = 1
+        body = [cell]
+        while True:
+            generator.shuffle(directions)
+            for direction in directions:
+                neighbour = board.neighbours[direction][cell]
+                if not occupied[neighbour]:
+                    break
+            else:
+                break
+            if len(body) == length:
+                return body, ACTIONS[direction]
+            cell = neighbour
+            occupied[cell] = 1
+            body.append(cell)
+
+    return None
+
+
+def _get_random_apple(blocked, body, generator):
+    """
+    Place an apple at random.
+
+    Parameters
+    ----------
+    blocked : :class:`bytes`
+        Holds ``1`` for every cell which cannot be entered.
+
+    body : :class:`list` of :class:`int`
+        The cells of the snake.
+
+    generator : :class:`random.Random`
+        The random number generator.
+
+    Returns
+    -------
+    :class:`int`
+        The cell of the apple, or ``-1`` if there is no free cell.
+
+    """
+
+    occupied = bytearray(blocked)
+    for cell in body:
+        occupied[cell] = 1
+    num_free = occupied.count(0)
+    if num_free == 0:
+        return -1
+    return _find_free_cell(occupied, generator.randrange(num_free))
+
+
+def write_reset_pool(
+    path,
+    board_size,
+    levels=(frozenset(), ),
+    num_states=100,
+    random_seed=0,
+    min_length=1,
+    max_length=10,
+):
+    """
+    Generate starting states and write them into a reset pool.
+
+    Parameters
+    ----------
+    path : :class:`str`
+        The path to the reset pool file.
+
+    board_size : :class:`tuple`
+        A :class:`tuple` of the form ``(23, 12)`` which represents
+        the size of the board in the x and y directions.
+
+    levels : :class:`iterable`, optional
+        Holds the positions of the walls of every level, such as the
+        levels of a :class:`.LevelPool`.
+
+    num_states : :class:`int`, optional
+        The number of states generated for every level.
+
+    random_seed : :class:`int`, optional
+        The random seed of the first state. The i-th state uses
+        ``random_seed + i``, both to be generated and as the random
+        seed of its game.
+
+    min_length : :class:`int`, optional
+        The minimum length of a snake.
+
+    max_length : :class:`int`, optional
+        The maximum length of a snake.
+
+    Returns
+    -------
+    :class:`int`
+        The number of states written.
+
+    Raises
+    ------
+    :class:`ValueError`
+        If there are no levels or no states, if a random seed does
+        not fit into 64 bits, or if a level has no room for a snake
+        of the chosen length.
+
+    """
+
+    board = _get_board(board_size)
+    levels = [frozenset(walls) for walls in levels]
+    if not levels or num_states < 1:
+        raise ValueError(
+            'A reset pool needs at least one level and one state.'
+        )
+    seed_range = np.iinfo(_RECORD)
+    last_seed = random_seed + len(levels)*num_states - 1
+    if random_seed < seed_range.min or last_seed > seed_range.max:
+        raise ValueError(
+            f'The random seeds {random_seed} to {last_seed} do not fit '
+            'into 64 bits.'
+        )
+    weights, levels_offset, states_offset, size = _get_layout(
+        board_size=board_size,
+        num_levels=len(levels),
+        num_states=num_states,
+        max_length=max_length,
+    )
+    records = np.full(
+        (num_states, _RECORD_FIELDS+max_length), -1, dtype=_RECORD
+    )
+    seeds = itertools.count(random_seed)
+
+    with open(path, 'wb') as f:
+        f.write(_POOL_HEADER.pack(_POOL_MAGIC, 0, 0, 0, 0, 0, 0, 0))
+        f.seek(weights)
+        f.write(np.ones(len(levels), dtype='<f8').tobytes())
+        for walls in levels:
+            f.write(_pack_level(board_size, walls))
+
+        f.seek(states_offset)
+        for level, walls in enumerate(levels):
+            blocked = _get_blocked_cells(board, walls)
+            records[:] = -1
+            for record in records:
+                seed = next(seeds)
+                generator = random.Random(seed)
+                length = generator.randint(min_length, max_length)
+                snake = _get_random_body(board, blocked, length, generator)
+                if snake is None:
+                    raise ValueError(
+                        f'Level {level} has no room for a snake of '
+                        f'length {length}.'
+                    )
+                body, direction = snake
+                record[:_RECORD_FIELDS] = (
+                    level,
+                    ACTIONS.index(direction),
+                    length,
+                    _get_random_apple(blocked, body, generator),
+                    seed,
+                )
+                record[_RECORD_FIELDS:_RECORD_FIELDS+length] = body
+            f.write(records.tobytes())
+
+        # Only write a valid header once every state is written, so
+        # that an interrupted pool cannot be read.
+        f.truncate(size)
+        f.seek(0)
+        f.write(_POOL_HEADER.pack(
+            _POOL_MAGIC,
+            _POOL_VERSION,
+            *board_size,
+            len(levels),
+            num_states,
+            max_length,
+            0,
+        ))
+    return len(levels) * num_states
+
+
+class ResetPool:
+    """
+    Samples the starting states of a reset pool.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        pool = ResetPool('/dev/shm/resets.pool')
+        generator = random.Random(12)
+        game = SnakeGame(
+            board_size=pool.get_board_size(),
+            walls=(),
+            random_seed=12,
+        )
+        while True:
+            pool.reset(game, generator)
+            for step in game.run_stepwise():
+                ...
+
+    The trainer can open the same pool with ``writable=True`` and
+    change the mix of levels which every worker samples:
+
+    .. code-block:: python
+
+        pool = ResetPool('/dev/shm/resets.pool', writable=True)
+        # Only sample the first 10 levels.
+        weights = pool.get_weights()
+        weights[10:] = 0
+        pool.set_weights(weights)
+
+    """
+
+    def __init__(self, path, writable=False):
+        """
+        Initialize a :class:`ResetPool`.
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path to the reset pool file, written by
+            :func:`write_reset_pool`.
+
+        writable : :class:`bool`, optional
+            If ``True``, the weights of the levels can be changed
+            with :meth:`set_weights`.
+
+        """
+
+        mode = 'r+b' if writable else 'rb'
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        with open(path, mode) as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=access)
+        (
+            magic,
+            version,
+            board_x,
+            board_y,
+            self._num_levels,
+            self._num_states,
+            max_length,
+            _,
+        ) = _POOL_HEADER.unpack_from(self._buffer)
+        if magic != _POOL_MAGIC:
+            raise ValueError(f'{path} does not hold a reset pool.')
+        if version != _POOL_VERSION:
+            raise ValueError(
+                f'{path} has unsupported version {version}.'
+            )
+
+        if not self._num_levels or not self._num_states:
+            raise ValueError(f'{path} holds no states.')
+
+        self._board_size = board_x, board_y
+        self._board = _get_board(self._board_size)
+        self._weights_offset, self._levels_offset, states, _ = _get_layout(
+            board_size=self._board_size,
+            num_levels=self._num_levels,
+            num_states=self._num_states,
+            max_length=max_length,
+        )
+        self._level_size = -(-board_x*board_y // 8)
+        self._weights = np.frombuffer(
+            self._buffer,
+            dtype='<f8',
+            count=self._num_levels,
+            offset=self._weights_offset,
+        )
+        self._states = np.frombuffer(
+            self._buffer,
+            dtype=_RECORD,
+            count=self._num_levels*self._num_states*(
+                _RECORD_FIELDS+max_length
+            ),
+            offset=states,
+        ).reshape(-1, _RECORD_FIELDS+max_length)
+
+        # The levels which have been read so far, so that games reset
+        # to the same level share the same walls.
+        self._levels = {}
+        # The cumulative weights of the levels, and the version of
+        # the weights they were computed from.
+        self._cumulative_weights = None
+        self._weights_version = None
+
+    def __len__(self):
+        return len(self._states)
+
+    def get_board_size(self):
+        """
+        Return the board size of the states.
+
+        Returns
+        -------
+        :class:`tuple`
+            A :class:`tuple` of the form ``(23, 12)`` which represents
+            the size of the board in the x and y directions.
+
+        """
+
+        return self._board_size
+
+    def get_num_levels(self):
+        """
+        Return the number of levels.
+
+        Returns
+        -------
+        :class:`int`
+            The number of levels.
+
+        """
+
+        return self._num_levels
+
+    def get_level(self, index):
+        """
+        Return a level.
+
+        Parameters
+        ----------
+        index : :class:`int`
+            The index of the level.
+
+        Returns
+        -------
+        :class:`frozenset` of :class:`tuple`
+            The positions of the walls of the level.
+
+        """
+
+        walls = self._levels.get(index)
+        if walls is None:
+            if not 0 <= index < self._num_levels:
+                raise IndexError(f'Level {index} is not in the pool.')
+            walls = self._levels[index] = _unpack_level(
+                board_size=self._board_size,
+                buffer=self._buffer,
+                offset=self._levels_offset + index*self._level_size,
+            )
+        return walls
+
+    def get_weights(self):
+        """
+        Return the weights of the levels.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            A copy of the weight of every level.
+
+        """
+
+        return self._weights.copy()
+
+    def set_weights(self, weights):
+        """
+        Set the weights of the levels.
+
+        States are sampled by picking a level with a probability
+        proportional to its weight, and then one of its states
+        uniformly. Every process sampling from the pool uses the new
+        weights from its next sample on.
+
+        Parameters
+        ----------
+        weights : :class:`iterable` of :class:`float`
+            The weight of every level. Weights must not be negative,
+            and at least one must be positive.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        Raises
+        ------
+        :class:`ValueError`
+            If the weights are not valid.
+
+        """
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if (
+            weights.shape != (self._num_levels, )
+            or (weights < 0).any()
+            or not weights.sum() > 0
+        ):
+            raise ValueError(
+                f'Expected {self._num_levels} non-negative weights '
+                'with a positive sum.'
+            )
+        self._buffer[
+            self._weights_offset:self._weights_offset+weights.nbytes
+        ] = weights.astype('<f8').tobytes()
+        (version, ) = _WEIGHTS_VERSION.unpack_from(
+            self._buffer, _WEIGHTS_VERSION_OFFSET
+        )
+        _WEIGHTS_VERSION.pack_into(
+            self._buffer, _WEIGHTS_VERSION_OFFSET, version+1
+        )
+
+    def sample(self, generator):
+        """
+        Return the index of a random state.
+
+        Parameters
+        ----------
+        generator : :class:`random.Random`
+            The random number generator used to pick the state.
+
+        Returns
+        -------
+        :class:`int`
+            The index of the state.
+
+        """
+
+        (version, ) = _WEIGHTS_VERSION.unpack_from(
+            self._buffer, _WEIGHTS_VERSION_OFFSET
+        )
+        if version != self._weights_version:
+            self._cumulative_weights = np.cumsum(self._weights).tolist()
+            self._weights_version = version
+
+        cumulative_weights = self._cumulative_weights
+        level = bisect.bisect_right(
+            cumulative_weights,
+            generator.random() * cumulative_weights[-1],
+        )
+        # Guard against rounding picking the end of the last level.
+        level = min(level, self._num_levels-1)
+        return (
+            level*self._num_states
+            + generator.randrange(self._num_states)
+        )
+
+    def restore(self, game, index):
+        """
+        Reset `game` to a state of the pool.
+
+        Parameters
+        ----------
+        game : :class:`.SnakeGame`
+            The game, which must have the board size of the pool.
+
+        index : :class:`int`
+            The index of the state.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        Raises
+        ------
+        :class:`ValueError`
+            If `game` does not have the board size of the pool.
+
+        """
+
+        if game.get_board_size() != self._board_size:
+            raise ValueError(
+                f'The pool holds states of a {self._board_size} board, '
+                f'not {game.get_board_size()}.'
+            )
+
+        record = self._states[index]
+        length = int(record[2])
+        level, direction, _, apple, random_seed, *body = (
+            record[:_RECORD_FIELDS+length].tolist()
+        )
+        positions = self._board.positions
+        game.reset(
+            body=[positions[cell] for cell in body],
+            direction=ACTIONS[direction],
+            apple=None if apple < 0 else positions[apple],
+            random_seed=random_seed,
+            walls=self.get_level(level),
+        )
+
+    def reset(self, game, generator):
+        """
+        Reset `game` to a random state of the pool.
+
+        Parameters
+        ----------
+        game : :class:`.SnakeGame`
+            The game, which must have the board size of the pool.
+
+        generator : :class:`random.Random`
+            The random number generator used to pick the state.
+
+        Returns
+        -------
+        :class:`int`
+            The index of the state.
+
+        """
+
+        index = self.sample(generator)
+        self.restore(game, index)
+        return index
+
+    def close(self):
+        """
+        Close the reset pool.
+
+        Returns
+        -------
+        None : :class:`NoneType`
+
+        """
+
+        del self._weights
+        del self._states
+        self._buffer.close()
+
+
+def _get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'path',
+        help='The path to the reset pool file which is written.'
+    )
+    parser.add_argument(
+        '--levels',
+        help='The path to a level pool holding the levels to use.',
+        default=None
+    )
+    parser.add_argument(
+        '--board_size',
+        type=int,
+        nargs=2,
+        help='The size of the board, if no level pool is given.',
+        default=[25, 25]
+    )
+    parser.add_argument(
+        '--num_states',
+        type=int,
+        help='The number of states to generate for every level.',
+        default=100
+    )
+    parser.add_argument(
+        '--min_length',
+        type=int,
+        help='The minimum length of a snake.',
+        default=1
+    )
+    parser.add_argument(
+        '--max_length',
+        type=int,
+        help='The maximum length of a snake.',
+        default=10
+    )
+    parser.add_argument(
+        '--random_seed',
+        type=int,
+        help='The random seed of the first state.',
+        default=0
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _get_args()
+    if args.levels is None:
+        board_size = tuple(args.board_size)
+        levels = [frozenset()]
+    else:
+        level_pool = LevelPool(args.levels)
+        board_size = level_pool.get_board_size()
+        levels = [
+            level_pool.get_level(index)
+            for index in range(len(level_pool))
+        ]
+        level_pool.close()
+    write_reset_pool(
+        path=args.path,
+        board_size=board_size,
+        levels=levels,
+        num_states=args.num_states,
+        random_seed=args.random_seed,
+        min_length=args.min_length,
+        max_length=args.max_length,
+    )
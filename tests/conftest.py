@@ -1,12 +1,27 @@
-from snake.age import Snake
-from collections import deque
+from snake.game import SnakeGame, _Snake, _get_board, _get_blocked_cells
 import pytest
 
 
-@pytest.fixture(scope='session')
+def _make_snake(body, walls=()):
+    board = _get_board((10, 10))
+    s = _Snake(
+        board=board,
+        walls=_get_blocked_cells(board, frozenset(walls)),
+        cell=board.get_cell(body[0]),
+        velocity=(1, 0),
+    )
+    s.set_body(board.get_cell(position) for position in body)
+    return s
+
+
+@pytest.fixture
+def make_snake():
+    return _make_snake
+
+
+@pytest.fixture
 def snake():
-    s = Snake()
-    s.body = deque([
+    return _make_snake([
         (0, 1),
         (0, 2),
         (0, 3),
@@ -15,18 +30,23 @@ def snake():
         (3, 3),
         (4, 3)
     ])
-    return s
 
 
+@pytest.fixture
 def bit_snake():
-    s = Snake()
-    s.body = deque([
+    return _make_snake([
         (0, 1),
         (0, 2),
-        (0, 3),
-        (1, 3),
-        (2, 3),
-        (3, 3),
-        (4, 3)
+        (1, 2),
+        (1, 1),
+        (0, 1),
     ])
-    return s
+
+
+@pytest.fixture
+def game():
+    return SnakeGame(
+        board_size=(10, 10),
+        walls=((5, 5), (6, 6)),
+        random_seed=12,
+    )
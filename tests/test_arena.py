@@ -0,0 +1,117 @@
+import random
+
+import pytest
+from snake.arena import Arena
+
+
+def check_arena(arena):
+    walls = frozenset(arena.get_walls())
+    apples = list(arena.get_apples())
+    assert None not in apples
+    occupied = {}
+    for snake in range(arena.get_num_snakes()):
+        if not arena.is_alive(snake):
+            continue
+        for position in arena.get_snake(snake):
+            assert arena.get_occupant(position) == snake
+            occupied[position] = snake
+    for apple in apples:
+        assert apple not in walls
+        assert apple not in occupied
+        assert arena.get_occupant(apple) is None
+
+
+def test_start():
+    with pytest.raises(ValueError):
+        Arena((5, 5), [(1, 1)], [((1, 1), 'up')], 1)
+    with pytest.raises(ValueError):
+        Arena((5, 5), [], [((1, 1), 'up'), ((1, 1), 'down')], 1)
+    with pytest.raises(ValueError):
+        Arena((5, 5), [], [((5, 1), 'up')], 1)
+
+
+def test_head_on_collision():
+    arena = Arena((5, 1), [], [((0, 0), 'right'), ((2, 0), 'left')], 1)
+    arena._apples.clear()
+    assert sorted(arena.step()) == [0, 1]
+    assert arena.get_num_alive() == 0
+    assert arena.get_occupant((1, 0)) is None
+
+
+def test_swap_collision():
+    arena = Arena((5, 1), [], [((1, 0), 'right'), ((2, 0), 'left')], 1)
+    arena._apples.clear()
+    assert sorted(arena.step()) == [0, 1]
+
+
+def test_body_collision():
+    arena = Arena(
+        board_size=(6, 6),
+        walls=[],
+        snakes=[((2, 2), 'right'), ((2, 4), 'down')],
+        random_seed=1,
+    )
+    arena._apples.clear()
+    board = arena._board
+    body = [board.get_cell(position) for position in [(0, 2), (1, 2), (2, 2)]]
+    arena._snakes[0].set_body(body)
+    arena._occupancy.update((cell, 0) for cell in body)
+
+    assert arena.step() == []
+    # The head of snake 1 moves onto the middle of snake 0.
+    assert arena.step() == [1]
+    assert arena.is_alive(0)
+    assert list(arena.get_snake(0)) == [(2, 2), (3, 2), (4, 2)]
+    check_arena(arena)
+
+
+def test_eat_onto_apple():
+    arena = Arena((8, 1), [], [((0, 0), 'right')], 1, num_apples=3)
+    board = arena._board
+    arena._apples.clear()
+    arena._apples.update(
+        board.get_cell(position) for position in [(1, 0), (2, 0), (5, 0)]
+    )
+    arena.step()
+    assert list(arena.get_snake(0)) == [(1, 0), (2, 0)]
+    apples = list(arena.get_apples())
+    assert len(apples) == 3
+    assert (1, 0) not in apples and (2, 0) not in apples
+    assert (5, 0) in apples
+    check_arena(arena)
+
+
+@pytest.mark.parametrize('random_seed', [143, 177, *range(20)])
+def test_multiple_apples(random_seed):
+    generator = random.Random(random_seed)
+    arena = Arena(
+        board_size=(8, 8),
+        walls=[(4, 4), (3, 5)],
+        snakes=[((0, 0), 'right'), ((7, 7), 'left'), ((0, 7), 'down')],
+        random_seed=random_seed,
+        num_apples=3,
+    )
+    check_arena(arena)
+    assert len(list(arena.get_apples())) == 3
+    while arena.get_num_alive():
+        arena.step([
+            generator.choice(['up', 'down', 'left', 'right', None])
+            for snake in range(arena.get_num_snakes())
+        ])
+        check_arena(arena)
+
+
+def test_snake_memory():
+    arena = Arena((50, 50), [], [((0, 0), 'up'), ((9, 9), 'left')], 1)
+    # The snakes share the occupancy index, rather than each keeping
+    # counts for every cell of the board.
+    for snake in arena._snakes:
+        assert snake._counts is None
+
+    arena.step()
+    state = arena.get_state()
+    arena.step(['right', 'down'])
+    arena.set_state(state)
+    assert list(arena.get_snake(0)) == [(0, 1)]
+    assert list(arena.get_snake(1)) == [(8, 9)]
+    check_arena(arena)
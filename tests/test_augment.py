@@ -0,0 +1,174 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+from snake.augment import (
+    NO_APPLE,
+    Symmetry,
+    Transitions,
+    augment,
+    get_action_map,
+    get_symmetries,
+    transform,
+    transform_grids,
+    transform_positions,
+)
+from snake.game import ACTIONS, SnakeGame, _VELOCITIES
+from snake.render import get_grid
+
+
+def test_get_symmetries():
+    symmetries = get_symmetries((5, 5))
+    assert len(set(symmetries)) == 8
+    assert symmetries[0] == Symmetry(False, False, False)
+
+    symmetries = get_symmetries((5, 4))
+    assert len(set(symmetries)) == 4
+    assert not any(symmetry.transpose for symmetry in symmetries)
+
+
+@pytest.mark.parametrize('board_size', [(5, 5), (6, 3)])
+def test_transform_positions(board_size):
+    board_x, board_y = board_size
+    positions = np.array(list(itertools.product(
+        range(board_x),
+        range(board_y),
+    )))
+    for symmetry in get_symmetries(board_size):
+        transformed = transform_positions(positions, symmetry, board_size)
+        # Every symmetry maps the board onto itself.
+        assert (
+            sorted(map(tuple, transformed.tolist()))
+            == sorted(map(tuple, positions.tolist()))
+        )
+        # The action map is a permutation which moves the same way
+        # as the positions.
+        action_map = get_action_map(symmetry)
+        assert sorted(action_map.tolist()) == list(range(len(ACTIONS)))
+        for action, new_action in enumerate(action_map):
+            velocity = np.array(_VELOCITIES[ACTIONS[action]])
+            new_velocity = np.array(_VELOCITIES[ACTIONS[new_action]])
+            assert (
+                transform_positions(positions+velocity, symmetry, board_size)
+                == transformed+new_velocity
+            ).all()
+
+
+def test_transform_off_board_heads():
+    heads = np.array([[-1, 2], [5, 1], [3, -1], [2, 4]])
+    symmetry = Symmetry(False, True, True)
+    assert transform_positions(heads, symmetry, (5, 4)).tolist() == [
+        [5, 1],
+        [-1, 2],
+        [1, 4],
+        [2, -1],
+    ]
+
+    transitions = Transitions(
+        heads=heads,
+        apples=np.array([NO_APPLE, [0, 0], NO_APPLE, [4, 3]]),
+    )
+    transformed = transform(transitions, symmetry, (5, 4))
+    assert transformed.apples.tolist() == [
+        list(NO_APPLE),
+        [4, 3],
+        list(NO_APPLE),
+        [0, 0],
+    ]
+
+
+@pytest.mark.parametrize('board_size', [(5, 5), (6, 3)])
+def test_transform_grids(board_size):
+    grid = np.arange(board_size[0]*board_size[1]).reshape(
+        board_size[1],
+        board_size[0],
+    )
+    grids = np.stack([grid, grid+100])
+    positions = np.array(list(itertools.product(
+        range(board_size[0]),
+        range(board_size[1]),
+    )))
+    for symmetry in get_symmetries(board_size):
+        transformed = transform_grids(grids, symmetry)
+        assert np.shares_memory(transformed, grids)
+        new_positions = transform_positions(positions, symmetry, board_size)
+        for (x, y), (new_x, new_y) in zip(positions, new_positions):
+            assert (transformed[:, new_y, new_x] == grids[:, y, x]).all()
+
+
+def get_transformed_game(game, symmetry):
+    board_size = game.get_board_size()
+
+    def transform_all(positions):
+        positions = np.array(positions, dtype=np.int64).reshape(-1, 2)
+        return [
+            tuple(position) for position in
+            transform_positions(positions, symmetry, board_size).tolist()
+        ]
+
+    velocity_x, velocity_y = game.get_snake_velocity()
+    if symmetry.transpose:
+        velocity_x, velocity_y = velocity_y, velocity_x
+    velocity = (
+        -velocity_x if symmetry.flip_x else velocity_x,
+        -velocity_y if symmetry.flip_y else velocity_y,
+    )
+    new_game = SnakeGame(board_size, transform_all(list(game.get_walls())), 0)
+    new_game.reset(
+        body=transform_all(list(game.get_snake())),
+        direction=ACTIONS[[
+            _VELOCITIES[action] for action in ACTIONS
+        ].index(velocity)],
+        apple=transform_all(game.get_apple())[0],
+    )
+    return new_game
+
+
+@pytest.mark.parametrize('board_size', [(7, 7), (8, 5)])
+def test_augment(board_size):
+    generator = random.Random(2)
+    walls = [(3, 3), (4, 1), (1, 4)]
+    grids, features, actions, heads, apples = [], [], [], [], []
+    checkpoints = []
+    for random_seed in range(5):
+        game = SnakeGame(board_size, walls, random_seed)
+        while not game.is_game_over():
+            action = generator.randrange(len(ACTIONS))
+            grids.append(get_grid(game))
+            features.append(game.get_features())
+            actions.append(action)
+            heads.append(game.get_snake_head())
+            apples.append(game.get_apple())
+            checkpoints.append(game.to_bytes())
+            game.step(action)
+
+    transitions = Transitions(*map(np.array, [
+        grids, features, actions, heads, apples,
+    ]))
+    symmetries = get_symmetries(board_size)
+    augmented_transitions = augment(transitions, board_size)
+    for symmetry, augmented in zip(symmetries, augmented_transitions):
+        for i, checkpoint in enumerate(checkpoints):
+            game = SnakeGame.from_bytes(checkpoint, walls=walls)
+            # The augmented transition matches the transition of the
+            # game rebuilt under the symmetry.
+            new_game = get_transformed_game(game, symmetry)
+            assert (get_grid(new_game) == augmented.grids[i]).all()
+            assert (
+                tuple(new_game.get_features())
+                == tuple(augmented.features[i])
+            )
+            assert new_game.get_snake_head() == tuple(augmented.heads[i])
+            assert new_game.get_apple() == tuple(augmented.apples[i])
+
+            game.step(actions[i])
+            new_game.step(int(augmented.actions[i]))
+            assert game.is_game_over() == new_game.is_game_over()
+            # This also holds for heads which left the board.
+            head = transform_positions(
+                np.array(game.get_snake_head()),
+                symmetry,
+                board_size,
+            )
+            assert tuple(head.tolist()) == new_game.get_snake_head()
@@ -0,0 +1,49 @@
+import warnings
+
+import numpy as np
+from snake.batch import counter_randint, counter_random, fill_features
+from snake.game import FEATURES, CounterRandom, SnakeGame
+from snake.game import counter_random as scalar_counter_random
+
+
+def test_fill_features():
+    games = [
+        SnakeGame((8, 6), ((3, 3), ), random_seed)
+        for random_seed in range(6)
+    ]
+    out = np.full((len(games), len(FEATURES)), -100, dtype=np.int32)
+    for step in range(10):
+        assert fill_features(games, out) is out
+        for row, game in zip(out, games):
+            assert tuple(row) == game.get_features()
+        for i, game in enumerate(games):
+            if not game.is_game_over():
+                game.step((i+step) % 4)
+
+    features = fill_features(games)
+    assert features.dtype == np.int32
+    assert features.tolist() == [list(game.get_features()) for game in games]
+
+
+def test_counter_random():
+    seeds = np.array([0, 1, 7, 2**31, 2**40+5])
+    counters = np.array([0, 3, 100, 1, 2**33])
+    values = counter_random(seeds, counters)
+    assert values.dtype == np.uint64
+    for seed, counter, value in zip(seeds, counters, values):
+        assert int(value) == scalar_counter_random(int(seed), int(counter))
+
+    # Scalars wrap around without a warning.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        for seed in range(20):
+            value = counter_random(seed, 5)
+            assert int(value) == scalar_counter_random(seed, 5)
+
+
+def test_counter_randint():
+    for seed in range(10):
+        generator = CounterRandom(seed)
+        expected = [generator.randint(2, 9) for counter in range(50)]
+        values = counter_randint(np.full(50, seed), np.arange(50), 2, 9)
+        assert values.tolist() == expected
@@ -0,0 +1,94 @@
+import socket
+
+import pytest
+from snake.broadcast import Broadcaster, Spectator
+from snake.game import SnakeGame
+
+
+def check_spectator(spectator, game):
+    assert list(spectator.get_snake()) == list(game.get_snake())
+    assert spectator.get_apple() == game.get_apple()
+    assert spectator.get_snake_length() == game.get_snake_length()
+    assert spectator.get_num_steps() == game.get_num_steps()
+    assert spectator.is_game_over() == game.is_game_over()
+
+
+def get_cycle(board_x, board_y):
+    # Returns the next position of a path which visits every position
+    # of a board with an even board_y and returns to its start.
+    path = []
+    for y in range(board_y):
+        xs = range(1, board_x) if y % 2 == 0 else range(board_x-1, 0, -1)
+        path.extend((x, y) for x in xs)
+    path.extend((0, y) for y in range(board_y-1, -1, -1))
+    return dict(zip(path, path[1:] + path[:1]))
+
+
+def test_spectator():
+    walls = frozenset((x, y) for x in range(12) for y in (8, 9))
+    game = SnakeGame((12, 10), walls, 3)
+    broadcaster = Broadcaster(game, keyframe_interval=1000)
+    for action in ['right', 'right', 'up']:
+        game.step(action)
+        broadcaster.publish()
+
+    # The spectator joins in the middle of the game.
+    spectator = Spectator(broadcaster.get_address(), timeout=5)
+    broadcaster.publish()
+    assert broadcaster.get_num_spectators() == 1
+    assert spectator.receive() == 3
+    assert spectator.get_board_size() == (12, 10)
+    assert frozenset(spectator.get_walls()) == walls
+    check_spectator(spectator, game)
+
+    # Follow a path over every free position, so that the snake eats
+    # apples, starting while it has a single segment. Each step is
+    # sent as a delta.
+    cycle = get_cycle(12, 8)
+    actions = {(1, 0): 'right', (-1, 0): 'left', (0, 1): 'up', (0, -1): 'down'}
+    num_growths = 0
+    while not game.is_game_over():
+        head_x, head_y = game.get_snake_head()
+        next_x, next_y = cycle[head_x, head_y]
+        length = game.get_snake_length()
+        game.step(actions[next_x-head_x, next_y-head_y])
+        num_growths += game.get_snake_length() > length
+        broadcaster.publish()
+        assert spectator.receive() == game.get_num_steps()
+        check_spectator(spectator, game)
+    assert num_growths > 1
+
+    spectator.close()
+    broadcaster.close()
+
+
+def test_drop_slow_spectator():
+    walls = [(x, y) for x in range(20, 100) for y in range(20, 100)]
+    game = SnakeGame((100, 100), walls, 3)
+    game.reset([(5, 5)], 'up', (0, 99))
+    broadcaster = Broadcaster(game, keyframe_interval=1, max_pending=1 << 14)
+
+    # The spectator never reads, so the messages pile up.
+    connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 12)
+    connection.connect(broadcaster.get_address())
+    broadcaster.publish()
+    assert broadcaster.get_num_spectators() == 1
+
+    actions = ['up', 'right', 'down', 'left']
+    for step in range(1000):
+        game.step(actions[step % 4])
+        broadcaster.publish()
+        if not broadcaster.get_num_spectators():
+            break
+    assert not game.is_game_over()
+    assert broadcaster.get_num_spectators() == 0
+
+    connection.close()
+    broadcaster.close()
+
+
+def test_board_too_large():
+    game = SnakeGame((1 << 15, 1), (), 3)
+    with pytest.raises(ValueError):
+        Broadcaster(game)
@@ -0,0 +1,45 @@
+import pytest
+from snake.crosscheck import ENGINES, find_divergence, get_case, run
+from snake.game import SnakeGame
+
+
+class LateGame(SnakeGame):
+    """
+    Ignores every direction queued after the first 10 steps.
+
+    """
+
+    __slots__ = ()
+
+    def queue_snake_movement_direction(self, direction):
+        if self.get_num_steps() < 10:
+            return super().queue_snake_movement_direction(direction)
+        return True
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_engines(engine):
+    report = run(ENGINES[engine], num_cases=20)
+    assert report.divergence is None
+    assert report.num_cases == 20
+    assert report.num_steps > 0
+
+
+def test_no_cases():
+    report = run(SnakeGame, num_cases=0)
+    assert report.num_cases == 0
+    assert report.divergence is None
+
+
+def test_divergence():
+    report = run(LateGame, num_cases=50)
+    divergence = report.divergence
+    assert divergence is not None
+    assert report.num_cases < 50
+    # The minimized case still diverges, and only holds what is
+    # needed to make it diverge.
+    assert find_divergence(SnakeGame, LateGame, divergence.case) is not None
+    assert divergence.index == len(divergence.case.ops) - 1
+    assert divergence.case.walls == frozenset()
+    original = get_case(divergence.case.random_seed)
+    assert len(divergence.case.ops) < len(original.ops)
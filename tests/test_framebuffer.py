@@ -0,0 +1,146 @@
+import threading
+
+from snake.framebuffer import (
+    APPLE,
+    EMPTY,
+    HEAD,
+    SNAKE,
+    WALL,
+    FramebufferReader,
+    FramebufferWriter,
+    _SEQUENCE,
+    _SEQUENCE_OFFSET,
+)
+from snake.game import SnakeGame
+
+
+def get_cells(game):
+    board_x, board_y = game.get_board_size()
+    cells = [EMPTY] * (board_x*board_y)
+    for x, y in game.get_walls():
+        cells[y*board_x + x] = WALL
+    for x, y in game.get_snake():
+        cells[y*board_x + x] = SNAKE
+    x, y = game.get_apple()
+    cells[y*board_x + x] = APPLE
+    x, y = game.get_snake_head()
+    cells[y*board_x + x] = HEAD
+    return cells
+
+
+def read(reader, last_sequence=None):
+    frames = []
+
+    def callback(cells, score, game_over):
+        frames.append((list(cells), score, game_over))
+
+    sequence = reader.read(callback, last_sequence)
+    return sequence, frames
+
+
+def get_cycle(board_x, board_y):
+    # Returns the next position of a path which visits every position
+    # of a board with an even board_y and returns to its start.
+    path = []
+    for y in range(board_y):
+        xs = range(1, board_x) if y % 2 == 0 else range(board_x-1, 0, -1)
+        path.extend((x, y) for x in xs)
+    path.extend((0, y) for y in range(board_y-1, -1, -1))
+    return dict(zip(path, path[1:] + path[:1]))
+
+
+def test_publish(tmp_path):
+    path = str(tmp_path / 'framebuffer')
+    game = SnakeGame((8, 6), (), 0)
+    writer = FramebufferWriter(path, game)
+    reader = FramebufferReader(path)
+    assert reader.get_board_size() == (8, 6)
+
+    sequence, frames = read(reader)
+    assert frames == [(get_cells(game), 1, False)]
+
+    # No new frame was written.
+    assert read(reader, sequence) == (sequence, [])
+
+    # The positions which changed are written one step at a time,
+    # including when the snake eats an apple and grows.
+    cycle = get_cycle(8, 6)
+    actions = {(1, 0): 'right', (-1, 0): 'left', (0, 1): 'up', (0, -1): 'down'}
+    while True:
+        x, y = game.get_snake_head()
+        next_x, next_y = cycle[x, y]
+        if not game.step(actions[next_x-x, next_y-y])[1]:
+            break
+        writer.publish()
+        new_sequence, frames = read(reader, sequence)
+        assert new_sequence > sequence
+        assert new_sequence % 2 == 0
+        sequence = new_sequence
+        assert frames == [(get_cells(game), game.get_snake_length(), False)]
+    assert game.get_snake_length() > 10
+
+    # The frame of a finished game is written in full.
+    writer.publish()
+    assert read(reader, sequence)[1][0][1:] == (
+        game.get_snake_length(),
+        True,
+    )
+
+    writer.close()
+    reader.close()
+
+
+def test_read_retries(tmp_path):
+    path = str(tmp_path / 'framebuffer')
+    game = SnakeGame((8, 8), ((5, 5), (6, 1)), 2)
+    writer = FramebufferWriter(path, game)
+    reader = FramebufferReader(path)
+    sequences = []
+
+    def callback(cells, score, game_over):
+        sequences.append(reader.get_sequence())
+        # A frame is written while the first one is being read.
+        if len(sequences) == 1:
+            game.step()
+            writer.publish()
+
+    sequence = reader.read(callback)
+    assert len(sequences) == 2
+    assert sequence == sequences[1] == sequences[0] + 2
+    assert read(reader)[1][0][0] == get_cells(game)
+
+    # A reader waits while a frame is being written, which is when the
+    # sequence counter is odd.
+    _SEQUENCE.pack_into(writer._buffer, _SEQUENCE_OFFSET, sequence + 1)
+    timer = threading.Timer(
+        0.05,
+        _SEQUENCE.pack_into,
+        (writer._buffer, _SEQUENCE_OFFSET, sequence + 2),
+    )
+    timer.start()
+    assert read(reader)[0] == sequence + 2
+    timer.join()
+
+    writer.close()
+    reader.close()
+
+
+def test_replace(tmp_path):
+    path = str(tmp_path / 'framebuffer')
+    game = SnakeGame((8, 8), (), 2)
+    writer = FramebufferWriter(path, game)
+    reader = FramebufferReader(path)
+    cells = get_cells(game)
+
+    # A new writer replaces the file rather than truncating it, so
+    # the old reader can still read its frame.
+    new_game = SnakeGame((3, 4), (), 2)
+    new_writer = FramebufferWriter(path, new_game)
+    assert read(reader)[1] == [(cells, 1, False)]
+    new_reader = FramebufferReader(path)
+    assert new_reader.get_board_size() == (3, 4)
+    assert read(new_reader)[1] == [(get_cells(new_game), 1, False)]
+    assert [p.name for p in tmp_path.iterdir()] == ['framebuffer']
+
+    for closable in (writer, reader, new_writer, new_reader):
+        closable.close()
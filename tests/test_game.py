@@ -1,25 +1,61 @@
-def test_take_step(snake):
-    assert False
+import random
 
+import pytest
 
-def test_valid_velocity(snake):
-    assert False
+from snake.game import ACTIONS, FEATURES, SnakeGame, _VELOCITY_ACTIONS
+
+
+def positions(snake):
+    board = snake._board
+    return [board.positions[cell] for cell in snake.get_body()]
 
 
-def test_hit(snake):
-    assert not snake.hit(frozenset())
+def test_take_step(snake):
+    snake.take_step()
+    assert positions(snake) == [
+        (0, 2),
+        (0, 3),
+        (1, 3),
+        (2, 3),
+        (3, 3),
+        (4, 3),
+        (5, 3),
+    ]
+
+    snake.queue_velocity((0, 1))
+    snake.take_step()
+    assert positions(snake)[-1] == (5, 4)
+    assert snake.get_velocity() == (0, 1)
+
+
+def test_valid_velocity(snake):
+    assert snake._is_valid_velocity((1, 0))
+    assert snake._is_valid_velocity((0, 1))
+    assert snake._is_valid_velocity((0, -1))
+    assert not snake._is_valid_velocity((-1, 0))
+    assert not snake._is_valid_velocity((2, 0))
 
-    walls = frozenset({
+    # Reversing is ignored, so the snake keeps moving right.
+    snake.queue_velocity((-1, 0))
+    snake.take_step()
+    assert snake.get_velocity() == (1, 0)
+    assert positions(snake)[-1] == (5, 3)
 
-    })
 
-    assert snake.hit(walls)
+def test_hit(make_snake):
+    body = [(0, 1), (0, 2), (0, 3), (1, 3)]
 
-    walls = frozenset({
+    s = make_snake(body)
+    s.take_step()
+    assert not s.hit()
 
-    })
+    s = make_snake(body, walls=frozenset({(2, 3)}))
+    s.take_step()
+    assert s.hit()
 
-    assert not snake.hit(walls)
+    s = make_snake(body, walls=frozenset({(2, 4), (3, 3)}))
+    s.take_step()
+    assert not s.hit()
 
 
 def test_bite(snake, bit_snake):
@@ -27,50 +63,431 @@ def test_bite(snake, bit_snake):
     assert bit_snake.bite()
 
 
-def test_escape(snake):
-    max_x = max(x for x, y in snake.body)
-    max_y = max(y for x, y in snake.body)
+def test_escape(make_snake):
+    s = make_snake([(7, 3), (8, 3)])
+    s.take_step()
+    assert not s.is_escaped()
+    s.take_step()
+    assert s.is_escaped()
 
-    assert not snake.escape((max_x-1, max_y-1))
-    assert snake.escape((max_x-1, max_y))
-    assert snake.escape((max_x, max_y-1))
+    s = make_snake([(0, 1)])
+    s.queue_velocity((0, -1))
+    s.take_step()
+    assert not s.is_escaped()
+    s.take_step()
+    assert s.is_escaped()
 
 
 def test_eat(snake):
-    head = snake.body[-1]
+    head = snake.get_head()
     assert snake.eat(head)
+    assert snake.get_length() == 8
+    assert positions(snake)[-1] == (5, 3)
 
-    apple = (head[0]+1, head[1]+1)
-    assert not snake.eat(apple)
+    assert not snake.eat(head)
+    assert snake.get_length() == 8
 
 
 def test_generate_new_apple(game):
-    ...
+    walls = frozenset(game.get_walls())
+    for i in range(100):
+        apple = game._board.positions[game._get_new_apple()]
+        assert apple not in walls
+        assert not game.snake_occupies(apple)
+        x, y = apple
+        assert 0 <= x < 10 and 0 <= y < 10
 
 
 def test_run(game):
-    ...
+    for direction in ('up', 'up', 'right'):
+        game.queue_snake_movement_direction(direction)
+    num_steps = game.run()
+    assert game.is_game_over()
+    assert num_steps == game.get_num_steps()
 
 
 def test_snake_velocity(game):
-    ...
+    assert game.get_snake_velocity() == (1, 0)
+    game.queue_snake_movement_direction('up')
+    assert game.get_snake_velocity(1) == (0, 1)
+    game.step()
+    assert game.get_snake_velocity() == (0, 1)
 
 
 def test_queue_snake_movement_direction(game):
-    ...
+    for i in range(5):
+        assert game.queue_snake_movement_direction('up')
+    assert not game.queue_snake_movement_direction('up')
+    assert game.get_num_queued_directions() == 5
+    assert game.get_num_dropped_directions() == 1
 
 
 def test_get_snake(game):
-    ...
+    assert list(game.get_snake()) == [(0, 0)]
+    game.step('up')
+    assert list(game.get_snake()) == [(0, 1)]
 
 
 def test_get_walls(game):
-    ...
+    assert frozenset(game.get_walls()) == frozenset({(5, 5), (6, 6)})
 
 
 def test_get_apple(game):
-    ...
+    apple = game.get_apple()
+    assert apple not in frozenset(game.get_walls())
+    assert apple != (0, 0)
 
 
 def test_get_board_size(game):
-    ...
+    assert game.get_board_size() == (10, 10)
+
+
+def test_run_actions():
+    for random_seed in range(20):
+        actions = [
+            (random_seed*7 + i*i) % len(ACTIONS)
+            for i in range(200)
+        ]
+        game1 = SnakeGame((8, 6), ((3, 3), ), random_seed)
+        game2 = SnakeGame((8, 6), ((3, 3), ), random_seed)
+
+        alive, num_steps, num_apples = game1.run_actions(actions)
+
+        apples = 0
+        for action in actions[:num_steps]:
+            apples += game2.step(action)[0]
+        assert list(game1.get_snake()) == list(game2.get_snake())
+        assert game1.get_apple() == game2.get_apple()
+        assert alive == (not game2.is_game_over())
+        assert num_apples == apples
+        assert num_steps == game2.get_num_steps()
+        if not alive:
+            assert num_steps < len(actions)
+
+
+def test_run_actions_names():
+    game1 = SnakeGame((10, 10), (), 3)
+    game2 = SnakeGame((10, 10), (), 3)
+    game1.run_actions(['up', 'right', 'left', 'up'])
+    game2.run_actions([0, 2, 3, 0])
+    assert list(game1.get_snake()) == list(game2.get_snake())
+    # 'left' reverses the snake, so it is ignored.
+    assert list(game1.get_snake()) == [(2, 2)]
+
+
+def test_run_actions_game_over():
+    game = SnakeGame((3, 3), (), 3)
+    assert game.run_actions(['down']) == (False, 1, 0)
+    assert game.run_actions(['up']) == (False, 0, 0)
+
+
+@pytest.mark.parametrize('counter_rng', [True, False])
+@pytest.mark.parametrize('include_walls', [True, False])
+def test_to_bytes(counter_rng, include_walls):
+    walls = ((3, 3), (4, 1))
+    game = SnakeGame(
+        board_size=(9, 7),
+        walls=walls,
+        random_seed=5,
+        counter_rng=counter_rng,
+        reachable_apples=True,
+    )
+    for action in ['up', 'up', 'right', 'right', 'down']:
+        game.step(action)
+    game.queue_snake_movement_direction('right')
+    game.queue_snake_movement_direction('up')
+
+    checkpoint = game.to_bytes(include_walls=include_walls)
+    loaded = SnakeGame.from_bytes(
+        checkpoint,
+        walls=None if include_walls else walls,
+    )
+    assert loaded.to_bytes(include_walls=include_walls) == checkpoint
+    assert frozenset(loaded.get_walls()) == frozenset(walls)
+
+    actions = [None, None, 'left', 'up', 'up', 'right'] * 10
+    for action in actions:
+        game.step(action)
+        loaded.step(action)
+        assert list(loaded.get_snake()) == list(game.get_snake())
+        assert loaded.get_apple() == game.get_apple()
+        assert loaded.is_game_over() == game.is_game_over()
+        assert loaded.get_num_steps() == game.get_num_steps()
+
+
+@pytest.mark.parametrize('random_seed', [2**63, 2**64-1, 2**70+3, -5])
+def test_to_bytes_large_seed(random_seed):
+    game = SnakeGame((9, 7), (), random_seed, counter_rng=True)
+    game.step('up')
+    loaded = SnakeGame.from_bytes(game.to_bytes(), walls=())
+    for i in range(20):
+        game.reset(random_seed=None)
+        loaded.reset(random_seed=None)
+        assert loaded.get_apple() == game.get_apple()
+
+
+def test_to_bytes_dropped_directions(game):
+    for i in range(7):
+        game.queue_snake_movement_direction('up')
+    loaded = SnakeGame.from_bytes(game.to_bytes(), walls=game.get_walls())
+    assert loaded.get_num_queued_directions() == 5
+    assert loaded.get_num_dropped_directions() == 2
+
+
+def test_to_bytes_size():
+    game = SnakeGame((9, 7), (), 5, counter_rng=True)
+    game.reset([(0, 0), (1, 0), (2, 0)])
+    game.queue_snake_movement_direction('up')
+    assert len(game.to_bytes()) == 36 + 1 + 3*2 + 16
+    game = SnakeGame((9, 7), (), 5)
+    assert len(game.to_bytes()) == 36 + 2 + 2510
+
+
+def test_from_bytes_errors():
+    walls = ((3, 3), )
+    game = SnakeGame((9, 7), walls, 5, counter_rng=True)
+    game.step('up')
+    checkpoint = game.to_bytes()
+
+    for size in range(len(checkpoint)):
+        with pytest.raises(ValueError):
+            SnakeGame.from_bytes(checkpoint[:size], walls=walls)
+    with pytest.raises(ValueError):
+        SnakeGame.from_bytes(b'XXXX' + checkpoint[4:], walls=walls)
+    with pytest.raises(ValueError):
+        SnakeGame.from_bytes(checkpoint)
+    with pytest.raises(ValueError):
+        SnakeGame.from_bytes(checkpoint, walls=((3, 4), ))
+
+
+def reachable_positions(game):
+    board_x, board_y = game.get_board_size()
+    blocked = frozenset(game.get_walls()) | frozenset(game.get_snake())
+    head_x, head_y = game.get_snake_head()
+    stack = [(head_x, head_y)]
+    reachable = set()
+    while stack:
+        x, y = stack.pop()
+        for position in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            nx, ny = position
+            if (
+                0 <= nx < board_x
+                and 0 <= ny < board_y
+                and position not in blocked
+                and position not in reachable
+            ):
+                reachable.add(position)
+                stack.append(position)
+    return reachable
+
+
+def test_reachable_apples():
+    # The walls split the board in two.
+    walls = [(3, y) for y in range(5)]
+    game = SnakeGame((7, 5), walls, 1, reachable_apples=True)
+    for random_seed in range(50):
+        game.reset(random_seed=random_seed)
+        assert game.get_apple()[0] < 3
+
+    # The body of the snake closes the gap in the walls.
+    walls = [(3, y) for y in range(1, 5)]
+    game = SnakeGame((7, 5), walls, 1, reachable_apples=True)
+    for random_seed in range(50):
+        game.reset([(3, 0), (4, 0), (4, 1)], 'up', random_seed=random_seed)
+        assert game.get_apple()[0] > 3
+
+    # With nothing reachable, the apple goes on any free position.
+    game = SnakeGame((5, 5), [(1, 0), (1, 1)], 1, reachable_apples=True)
+    game.reset([(0, 2), (0, 1), (0, 0)], 'down', random_seed=3)
+    assert reachable_positions(game) == set()
+    assert game.get_apple() is not None
+
+
+@pytest.mark.parametrize('random_seed', range(10))
+def test_reachable_apples_while_playing(random_seed):
+    generator = random.Random(random_seed)
+    walls = [(2, 2), (2, 3), (5, 4)]
+    game = SnakeGame((8, 8), walls, random_seed, reachable_apples=True)
+    num_apples = 0
+    while not game.is_game_over() and game.get_num_steps() < 2000:
+        # Head for the apple, avoiding death where possible.
+        head_x, head_y = game.get_snake_head()
+        apple_x, apple_y = game.get_apple()
+        reachable = reachable_positions(game)
+        moves = {
+            'right': (head_x+1, head_y),
+            'left': (head_x-1, head_y),
+            'up': (head_x, head_y+1),
+            'down': (head_x, head_y-1),
+        }
+        velocity_x, velocity_y = game.get_snake_velocity()
+        # Reversing is ignored.
+        del moves[ACTIONS[_VELOCITY_ACTIONS[-velocity_x, -velocity_y]]]
+        actions = [
+            action for action, position in moves.items()
+            if position in reachable
+        ] or list(moves)
+
+        def get_distance(action):
+            x, y = moves[action]
+            return abs(apple_x-x) + abs(apple_y-y) + 3*generator.random()
+
+        ate, alive = game.step(min(actions, key=get_distance))
+        num_apples += ate
+        if not alive:
+            break
+        reachable = reachable_positions(game)
+        # The reachable positions are updated step by step, rather
+        # than found from scratch, unless they are stale.
+        if not game._reachable_stale:
+            assert reachable == {
+                game._board.positions[cell]
+                for cell, value in enumerate(game._reachable)
+                if value
+            }
+        if ate and game.get_apple() is not None:
+            assert not reachable or game.get_apple() in reachable
+    assert num_apples > 0
+
+
+def test_get_death_cause():
+    game = SnakeGame((3, 3), [(1, 1)], 1)
+    assert game.get_death_cause() is None
+    game.step('down')
+    assert game.get_death_cause() == 'escape'
+
+    game = SnakeGame((3, 3), [(1, 0)], 1)
+    game.step('right')
+    assert game.get_death_cause() == 'wall'
+
+    game = SnakeGame((5, 5), [], 1)
+    game.reset([(0, 0), (1, 0), (2, 0), (2, 1), (1, 1)], 'left', (4, 4))
+    game.step('down')
+    assert game.get_death_cause() == 'bite'
+
+
+def test_actions_bypass_queue(game):
+    game.queue_snake_movement_direction('up')
+    assert game.step('right') == (0, True)
+    assert list(game.get_snake()) == [(1, 0)]
+    assert game.get_num_queued_directions() == 1
+
+    assert game.run_actions(['right', 'right']) == (True, 2, 0)
+    assert list(game.get_snake()) == [(3, 0)]
+    assert game.get_num_queued_directions() == 1
+
+    # The queued direction is taken by the next step without an action.
+    game.step()
+    assert list(game.get_snake()) == [(3, 1)]
+    assert game.get_num_queued_directions() == 0
+
+
+def test_run_policy(game):
+    game.queue_snake_movement_direction('up')
+    game.queue_snake_movement_direction('up')
+    actions = iter(['right', 'right', None])
+    events = []
+    num_steps = game.run(
+        policy=lambda game: next(actions),
+        max_steps=3,
+        on_event=lambda event, game: events.append(event),
+    )
+    assert num_steps == 3
+    # The policy overrides the queue, which is only taken from for
+    # the step the policy returns None for.
+    assert list(game.get_snake()) == [(2, 1)]
+    assert game.get_num_queued_directions() == 1
+    assert events == ['max_steps']
+
+
+def test_run_action_repeat(game):
+    calls = []
+
+    def policy(game):
+        calls.append(game.get_num_steps())
+        return 'up'
+
+    assert game.run(policy, max_steps=5, action_repeat=2) == 5
+    assert calls == [0, 2, 4]
+    assert list(game.get_snake()) == [(0, 5)]
+
+
+def test_run_events():
+    game = SnakeGame((10, 10), (), 3)
+    game.reset([(0, 0)], 'right', (3, 0))
+    events = []
+    num_steps = game.run(
+        policy=lambda game: 'right',
+        on_event=lambda event, game: events.append(
+            (event, game.get_num_steps())
+        ),
+    )
+    assert num_steps == 9
+    assert game.is_game_over()
+    assert events == [('apple', 3), ('death', 9)]
+
+
+def test_run_starvation():
+    game = SnakeGame((10, 10), (), 3)
+    game.reset([(0, 0)], 'up', (3, 0))
+    events = []
+    num_steps = game.run(
+        max_steps_without_apple=4,
+        on_event=lambda event, game: events.append(event),
+    )
+    assert num_steps == 4
+    assert not game.is_game_over()
+    assert events == ['starvation']
+
+    # Eating an apple resets the count.
+    game.reset([(0, 0)], 'right', (3, 0))
+    events.clear()
+    num_steps = game.run(
+        max_steps_without_apple=4,
+        on_event=lambda event, game: events.append(event),
+    )
+    assert num_steps == 7
+    assert events == ['apple', 'starvation']
+
+
+def test_get_features():
+    game = SnakeGame((10, 10), [(4, 3)], 1)
+    game.reset([(1, 3), (2, 3), (3, 3)], 'right', (3, 7))
+    features = dict(zip(FEATURES, game.get_features()))
+    assert features == {
+        'danger_ahead': 1,
+        'danger_left': 0,
+        'danger_right': 0,
+        'apple_direction_x': 0,
+        'apple_direction_y': 1,
+        'free_up': 6,
+        'free_down': 3,
+        'free_right': 0,
+        'free_left': 0,
+        'snake_length': 3,
+    }
+
+    game.reset([(0, 3), (0, 4), (0, 5)], 'up', (8, 1))
+    assert game.get_features() == (0, 1, 0, 1, -1, 4, 0, 9, 0, 3)
+
+    # The features follow the game step by step.
+    game.step('right')
+    assert game.get_features() == (0, 0, 0, 1, -1, 4, 5, 8, 0, 3)
+
+
+def test_step_repeat():
+    game = SnakeGame((10, 3), (), 1)
+    game.reset([(0, 1)], 'right', (2, 1))
+    # The snake eats the apple on the second step, grows onto (3, 1),
+    # and then escapes the board on the ninth step.
+    num_apples, alive = game.step('right', repeat=20)
+    assert (num_apples, alive) == (1, False)
+    assert game.get_num_steps() == 9
+    assert game.get_death_cause() == 'escape'
+    assert game.step('right', repeat=3) == (0, False)
+    assert game.get_num_steps() == 9
+
+    game.reset([(0, 1)], 'right', (2, 1))
+    assert game.step(repeat=2) == (1, True)
+    assert game.get_num_steps() == 2
+    assert list(game.get_snake()) == [(2, 1), (3, 1)]
@@ -0,0 +1,236 @@
+import os
+import select
+import threading
+import time
+
+import pytest
+from snake.game import SnakeGame
+from snake.game_io import AnsiBackend, GameIO, LatencyTracer
+
+
+class Backend(AnsiBackend):
+    # Draws into memory only, without taking over the terminal.
+
+    def wrapper(self, function):
+        pass
+
+
+def make_game_io(game, lines, columns, minimap=False, trace_latency=False):
+    backend = Backend()
+    game_io = GameIO(
+        game,
+        minimap=minimap,
+        trace_latency=trace_latency,
+        backend=backend,
+    )
+    game_io._stdscr = backend.newwin(lines, columns, 0, 0)
+    game_io._create_game_window()
+    game_io._create_score_window()
+    game_io._minimap_window = None
+    if minimap:
+        game_io._create_minimap_window()
+    return game_io
+
+
+def get_characters(window):
+    return {
+        (y, x): character
+        for y, line in enumerate(window.cells[1:-1], 1)
+        for x, character in enumerate(line[1:-1], 1)
+        if character != ' '
+    }
+
+
+@pytest.mark.parametrize('head', [(0, 0), (20, 31), (70, 5), (99, 59)])
+def test_viewport(head):
+    walls = {
+        (x, y)
+        for x in range(100)
+        for y in range(60)
+        if (x*7 + y*3) % 11 == 0 and (x, y) != head
+    }
+    game = SnakeGame((100, 60), walls, 1)
+    game.reset([head], 'right', (head[0], (head[1]+2) % 60))
+    game_io = make_game_io(game, lines=30, columns=70)
+    view_x, view_y = game_io._view_size
+    assert (view_x, view_y) == (70-32-2, 30-4-2)
+    assert game_io._game_window.getmaxyx() == (view_y+2, view_x+2)
+
+    game_io._render()
+    min_x, min_y = game_io._get_view_origin()
+    assert 0 <= min_x <= 100-view_x and 0 <= min_y <= 60-view_y
+    assert min_x <= head[0] < min_x+view_x
+    assert min_y <= head[1] < min_y+view_y
+
+    # Only the walls in view are drawn, whichever tiles they are on.
+    expected = {
+        (y-min_y+1, x-min_x+1): '█'
+        for x, y in walls
+        if min_x <= x < min_x+view_x and min_y <= y < min_y+view_y
+    }
+    expected[head[1]-min_y+1, head[0]-min_x+1] = 'X'
+    apple_x, apple_y = game.get_apple()
+    if min_y <= apple_y < min_y+view_y:
+        expected[apple_y-min_y+1, apple_x-min_x+1] = 'O'
+    assert get_characters(game_io._game_window) == expected
+
+
+def test_small_board():
+    game = SnakeGame((5, 4), [(1, 1)], 1)
+    game_io = make_game_io(game, lines=30, columns=70)
+    assert game_io._view_size == (5, 4)
+    assert game_io._get_view_origin() == (0, 0)
+
+
+def test_minimap():
+    walls = [(0, 0), (3, 4), (4, 5), (99, 59), (50, 30)]
+    game = SnakeGame((100, 60), walls, 1)
+    game.reset([(40, 20), (41, 20)], 'right', (97, 2))
+    game_io = make_game_io(game, lines=60, columns=100, minimap=True)
+
+    # 30 by 12 positions are available for the minimap.
+    assert game_io._minimap_scale == (4, 5)
+    assert game_io._minimap_size == (25, 12)
+    window = game_io._minimap_window
+    assert window.getmaxyx() == (12+2, 25+2)
+
+    game_io._render()
+    # (0, 0) and (3, 4) share a minimap position.
+    assert get_characters(window) == {
+        (1, 1): '█',
+        (2, 2): '█',
+        (12, 25): '█',
+        (7, 13): '█',
+        (1, 25): 'O',
+        (5, 11): 'X',
+    }
+
+
+def test_no_minimap():
+    # There is no space for a minimap.
+    game = SnakeGame((100, 60), (), 1)
+    game_io = make_game_io(game, lines=30, columns=70, minimap=True)
+    assert game_io._minimap_window is None
+    game_io._render()
+
+
+def test_latency_tracer():
+    tracer = LatencyTracer()
+    start = time.perf_counter()
+    tracer.key_pressed(start, True)
+    tracer.key_pressed(start, False)
+    tracer.key_pressed(start, True)
+
+    # Each step applies one queued key press.
+    tracer.step_taken()
+    tracer.frame_shown()
+    tracer.step_taken()
+    tracer.step_taken()
+    tracer.frame_shown()
+    latencies = tracer._latencies
+    assert len(latencies['key_to_step']) == 2
+    assert len(latencies['step_to_frame']) == 2
+    assert len(latencies['key_to_frame']) == 2
+    assert latencies['key_to_step'] == sorted(latencies['key_to_step'])
+    for latency in latencies.values():
+        assert all(0 <= value < 10 for value in latency)
+
+    assert tracer.get_percentile('key_to_step', 0) == (
+        latencies['key_to_step'][0]
+    )
+    assert tracer.get_percentile('key_to_step', 100) == (
+        latencies['key_to_step'][1]
+    )
+    report = tracer.get_report(num_dropped=1)
+    assert report.startswith('key presses: 3, dropped by a full queue: 1')
+    assert 'key_to_frame (2 samples)' in report
+
+    assert LatencyTracer().get_percentile('key_to_step', 50) is None
+    assert 'key_to_step: no samples' in LatencyTracer().get_report()
+
+
+def test_latency_tracer_steps():
+    game = SnakeGame((30, 30), (), 1)
+    game.reset([(15, 15)], 'right', (0, 0))
+    game_io = make_game_io(game, lines=40, columns=70, trace_latency=True)
+    tracer = game_io._latency_tracer
+    # The snake goes round in a square, so it never dies.
+    directions = ['up', 'left', 'down', 'right']
+
+    # Key presses and steps happen in different threads. A key press
+    # is credited to the step which applies it, so the key presses
+    # waiting for a step always match the queued directions.
+    def press_keys():
+        for i in range(2000):
+            game_io._queue_direction(directions[i % 4], time.perf_counter())
+
+    thread = threading.Thread(target=press_keys)
+    thread.start()
+    while thread.is_alive():
+        game_io._take_step()
+        with game_io._lock:
+            assert len(tracer._pending) == game.get_num_queued_directions()
+            assert len(tracer._applied) == len(
+                tracer._latencies['key_to_step']
+            )
+    thread.join()
+    assert not game.is_game_over()
+    assert len(tracer._pending) == game.get_num_queued_directions()
+
+
+def read_output(fd):
+    output = b''
+    while select.select([fd], [], [], 0)[0]:
+        output += os.read(fd, 1 << 16)
+    return output.decode()
+
+
+def test_ansi_backend():
+    read_fd, write_fd = os.pipe()
+    backend = AnsiBackend(output_fd=write_fd)
+    backend._lines, backend._columns = 5, 10
+    backend._screen = [[' ']*10 for line in range(5)]
+    backend._shown = [[' ']*10 for line in range(5)]
+
+    window = backend.newwin(3, 4, 1, 2)
+    assert window.getmaxyx() == (3, 4)
+    window.addch(0, 0, 'a')
+    window.addch(2, 3, 'b')
+    # Positions outside the window are clipped, rather than wrapping
+    # around or raising an error.
+    for y, x in [(3, 0), (-1, 0), (0, 4), (0, -1), (2, -4)]:
+        window.addch(y, x, 'c')
+    window.addstr(1, 2, 'xyz')
+    window.addstr(1, -2, 'pqr')
+    window.addstr(3, 0, 'd')
+    window.addstr(-1, 0, 'd')
+    window.addstr(0, 5, 'd')
+    assert [''.join(line) for line in window.cells] == [
+        'a   ',
+        'r xy',
+        '   b',
+    ]
+
+    # Only the changed characters are written, in one write.
+    window.refresh()
+    assert read_output(read_fd) == (
+        '\x1b[2;3Ha'
+        '\x1b[3;3Hr'
+        '\x1b[3;5Hxy'
+        '\x1b[4;6Hb'
+    )
+    window.refresh()
+    assert read_output(read_fd) == ''
+    window.erase()
+    window.addch(0, 0, 'a')
+    window.refresh()
+    assert read_output(read_fd) == '\x1b[3;3H \x1b[3;5H  \x1b[4;6H '
+
+    # Windows which do not fit on the screen are cut off.
+    window = backend.newwin(3, 4, 4, 8)
+    window.border()
+    window.refresh()
+    assert read_output(read_fd) == '\x1b[5;9H┌─'
+
+    os.close(read_fd)
+    os.close(write_fd)
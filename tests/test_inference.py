@@ -0,0 +1,73 @@
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+from snake.game import FEATURES
+from snake.inference import InferenceScheduler, NumpyPolicy, RemotePolicy
+
+
+def test_get_action():
+    policy = NumpyPolicy()
+    scheduler = InferenceScheduler(policy, max_batch_size=8)
+    observations = np.random.default_rng(1).random((50, len(FEATURES)))
+    futures = [scheduler.submit(observation) for observation in observations]
+    actions = [future.result(timeout=5) for future in futures]
+    scheduler.close()
+    assert actions == policy(observations).tolist()
+    assert scheduler.get_mean_batch_size() > 1
+
+
+def test_invalid_observation():
+    scheduler = InferenceScheduler(NumpyPolicy(), max_wait=0.05)
+    future = scheduler.submit(np.zeros(len(FEATURES)))
+    with pytest.raises(ValueError):
+        scheduler.submit(np.zeros(len(FEATURES)+1))
+    with pytest.raises(ValueError):
+        scheduler.submit(['a'] * len(FEATURES))
+    assert future.result(timeout=5) in range(4)
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(np.zeros(len(FEATURES)))
+
+
+def test_close_while_submitting():
+    for i in range(20):
+        scheduler = InferenceScheduler(NumpyPolicy(), max_wait=0.)
+        futures = []
+
+        def submit():
+            try:
+                for j in range(200):
+                    futures.append(scheduler.submit(np.zeros(len(FEATURES))))
+            except RuntimeError:
+                pass
+
+        threads = [threading.Thread(target=submit) for j in range(4)]
+        for thread in threads:
+            thread.start()
+        scheduler.close()
+        for thread in threads:
+            thread.join()
+        # Every request queued before the scheduler closed is answered.
+        for future in futures:
+            assert future.result(timeout=5) in range(4)
+
+
+def test_serve():
+    scheduler = InferenceScheduler(NumpyPolicy())
+    connection, remote_connection = multiprocessing.Pipe()
+    thread = scheduler.serve(connection)
+    policy = RemotePolicy(remote_connection)
+    assert policy.get_action(np.zeros(len(FEATURES))) in range(4)
+    # A failed request is raised in the caller and the connection
+    # keeps working.
+    with pytest.raises(ValueError):
+        policy.get_action(np.zeros(3))
+    assert policy.get_action(np.ones(len(FEATURES))) in range(4)
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        policy.get_action(np.zeros(len(FEATURES)))
+    remote_connection.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
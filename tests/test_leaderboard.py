@@ -0,0 +1,69 @@
+import os
+
+from snake.leaderboard import Leaderboard, PlayerStats
+
+
+def write(path, text, mode='a'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def test_update(tmp_path):
+    path1 = str(tmp_path / 'scores1')
+    path2 = str(tmp_path / 'scores2')
+    write(path1, 'alice 5\nbob 3\n')
+    leaderboard = Leaderboard([path1, path2], top_k=3)
+    assert leaderboard.get_top_scores() == [(5, 'alice'), (3, 'bob')]
+
+    # Only complete lines are read.
+    write(path1, 'bob 7\nalice 4')
+    write(path2, 'carol 6\nnot a score\n')
+    assert leaderboard.update() == 2
+    assert leaderboard.get_top_scores() == [
+        (7, 'bob'),
+        (6, 'carol'),
+        (5, 'alice'),
+    ]
+    assert leaderboard.update() == 0
+
+    write(path1, '\n')
+    assert leaderboard.update() == 1
+    assert leaderboard.get_num_scores() == 5
+    assert leaderboard.get_player_stats('alice') == PlayerStats(2, 9, 5)
+    assert leaderboard.get_player_stats('bob') == PlayerStats(2, 10, 7)
+    assert leaderboard.get_player_stats('dave') is None
+    assert sorted(leaderboard.get_players()) == ['alice', 'bob', 'carol']
+
+
+def test_truncated_file(tmp_path):
+    path1 = str(tmp_path / 'scores1')
+    path2 = str(tmp_path / 'scores2')
+    write(path1, 'alice 9\nbob 8\nalice 1\n')
+    write(path2, 'alice 2\ncarol 3\n')
+    leaderboard = Leaderboard([path1, path2], top_k=2)
+    assert leaderboard.get_num_scores() == 5
+
+    write(path1, 'bob 4\n', mode='w')
+    assert leaderboard.update() == 1
+    assert leaderboard.get_num_scores() == 3
+    assert leaderboard.get_top_scores() == [(4, 'bob'), (3, 'carol')]
+    assert leaderboard.get_player_stats('alice') == PlayerStats(1, 2, 2)
+    assert leaderboard.get_player_stats('bob') == PlayerStats(1, 4, 4)
+    assert leaderboard.get_player_stats('carol') == PlayerStats(1, 3, 3)
+
+
+def test_replaced_file(tmp_path):
+    path = str(tmp_path / 'scores')
+    write(path, 'alice 9\n')
+    leaderboard = Leaderboard([path])
+
+    # The new file is longer than the old one, so only its inode
+    # shows that it was replaced.
+    new_path = str(tmp_path / 'new_scores')
+    write(new_path, 'bob 1\nbob 2\n')
+    os.replace(new_path, path)
+    assert leaderboard.update() == 2
+    assert leaderboard.get_num_scores() == 2
+    assert leaderboard.get_top_scores() == [(2, 'bob'), (1, 'bob')]
+    assert leaderboard.get_player_stats('alice') is None
+    assert list(leaderboard.get_players()) == ['bob']
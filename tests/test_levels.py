@@ -0,0 +1,98 @@
+import random
+
+import pytest
+from snake.game import SnakeGame
+from snake.levels import (
+    LevelPool,
+    generate_level,
+    generate_levels,
+    is_connected,
+    write_level_pool,
+)
+
+
+def test_is_connected():
+    assert is_connected((5, 5), [])
+    assert is_connected((5, 5), [(2, y) for y in range(4)])
+    assert not is_connected((5, 5), [(2, y) for y in range(5)])
+    assert not is_connected((5, 5), [(0, 0)])
+    # The corner (4, 4) is cut off.
+    assert not is_connected((5, 5), [(3, 4), (4, 3)])
+
+
+@pytest.mark.parametrize('random_seed', range(10))
+def test_generate_level(random_seed):
+    walls = generate_level((15, 10), 0.2, random_seed)
+    assert walls == generate_level((15, 10), 0.2, random_seed)
+    assert len(walls) == 30
+    assert (0, 0) not in walls and (1, 0) not in walls
+    assert all(0 <= x < 15 and 0 <= y < 10 for x, y in walls)
+    assert is_connected((15, 10), walls)
+
+    # Every free position can be reached from the start, so every
+    # apple is reachable.
+    reachable = {(0, 0)}
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack.pop()
+        for position in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            nx, ny = position
+            if (
+                0 <= nx < 15
+                and 0 <= ny < 10
+                and position not in walls
+                and position not in reachable
+            ):
+                reachable.add(position)
+                stack.append(position)
+    assert len(reachable) == 15*10 - len(walls)
+    game = SnakeGame((15, 10), walls, random_seed)
+    assert game.get_apple() in reachable
+
+
+def test_generate_level_dense():
+    # Not every position can be covered without cutting the board
+    # in two, so fewer walls are placed.
+    walls = generate_level((6, 6), 0.9, 1, max_failures=20)
+    assert 0 < len(walls) < 32
+    assert is_connected((6, 6), walls)
+
+
+def test_level_pool(tmp_path):
+    path = str(tmp_path / 'levels.pool')
+    levels = list(generate_levels((13, 7), 20, 5, density=0.15))
+    levels.append(frozenset())
+    levels.append(frozenset(
+        (x, y) for x in range(13) for y in range(7) if (x, y) != (0, 0)
+    ))
+    assert write_level_pool(path, (13, 7), iter(levels)) == len(levels)
+
+    pool = LevelPool(path)
+    assert len(pool) == len(levels)
+    assert pool.get_board_size() == (13, 7)
+    for index, walls in enumerate(levels):
+        assert pool.get_level(index) == walls
+    with pytest.raises(IndexError):
+        pool.get_level(len(levels))
+    with pytest.raises(IndexError):
+        pool.get_level(-1)
+
+    generator = random.Random(3)
+    for i in range(20):
+        assert pool.sample(generator) in levels
+    pool.close()
+
+
+def test_level_pool_errors(tmp_path):
+    path = str(tmp_path / 'levels.pool')
+    for walls in ([(-1, 0)], [(0, -1)], [(13, 0)], [(0, 7)]):
+        with pytest.raises(ValueError):
+            write_level_pool(path, (13, 7), [[(1, 1)], walls])
+        # The pool was not completely written, so it cannot be read.
+        with pytest.raises(ValueError):
+            LevelPool(path)
+
+    with open(path, 'wb') as f:
+        f.write(b'XXXX' + bytes(100))
+    with pytest.raises(ValueError):
+        LevelPool(path)
@@ -0,0 +1,26 @@
+import pytest
+from snake.lockstep import run_match
+
+
+@pytest.mark.parametrize('random_seed', [0, 1])
+def test_run_match(random_seed):
+    report = run_match(
+        num_steps=200,
+        delay=0.02,
+        jitter=0.01,
+        loss=0.1,
+        step_time=1/200,
+        turn_probability=0.3,
+        random_seed=random_seed,
+    )
+    assert report.in_sync
+    assert report.num_steps == 200
+    # The remote actions arrive late, so the peers mispredict them and
+    # have to roll back.
+    assert report.num_rollbacks > 0
+    assert report.num_resimulated_steps >= report.num_rollbacks
+
+
+def test_run_match_no_delay():
+    report = run_match(num_steps=50, delay=0., step_time=1/500)
+    assert report.in_sync
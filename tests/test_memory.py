@@ -0,0 +1,8 @@
+import pytest
+from snake.memory import run
+
+
+@pytest.mark.parametrize('counter_rng', [True, False])
+def test_run(counter_rng, capsys):
+    assert run(num_games=50, counter_rng=counter_rng)
+    assert 'OVER BUDGET' not in capsys.readouterr().out
@@ -0,0 +1,30 @@
+from snake.framebuffer import EMPTY, WALL, SNAKE, HEAD, APPLE
+from snake.game import SnakeGame
+from snake.render import get_grid, get_walls_grid
+
+
+def test_get_grid():
+    game = SnakeGame((4, 3), [(3, 2)], 1)
+    game.reset([(0, 0), (0, 1)], 'up', apple=(2, 0))
+    assert get_walls_grid(game).tolist() == [
+        [EMPTY, EMPTY, EMPTY, EMPTY],
+        [EMPTY, EMPTY, EMPTY, EMPTY],
+        [EMPTY, EMPTY, EMPTY, WALL],
+    ]
+    # Row y holds the positions with the y coordinate y, like GameIO.
+    assert get_grid(game).tolist() == [
+        [SNAKE, EMPTY, APPLE, EMPTY],
+        [HEAD, EMPTY, EMPTY, EMPTY],
+        [EMPTY, EMPTY, EMPTY, WALL],
+    ]
+
+
+def test_get_grid_without_apple():
+    game = SnakeGame((3, 2), [], 1)
+    game.reset([(0, 1), (0, 0), (1, 0), (2, 0), (2, 1), (1, 1)], 'left')
+    assert game.get_apple() is None
+    assert not game.is_game_over()
+    assert get_grid(game).tolist() == [
+        [SNAKE, SNAKE, SNAKE],
+        [SNAKE, HEAD, SNAKE],
+    ]
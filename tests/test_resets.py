@@ -0,0 +1,115 @@
+import os
+import random
+
+import pytest
+from snake.game import (
+    SnakeGame,
+    _VELOCITIES,
+    _get_blocked_cells,
+    _get_board,
+)
+from snake.levels import generate_levels
+from snake.resets import (
+    ResetPool,
+    _get_random_apple,
+    _get_random_body,
+    write_reset_pool,
+)
+
+
+def get_source_state(board_size, walls, random_seed, max_length):
+    # Generate a state the way write_reset_pool does.
+    board = _get_board(board_size)
+    blocked = _get_blocked_cells(board, walls)
+    generator = random.Random(random_seed)
+    length = generator.randint(1, max_length)
+    body, direction = _get_random_body(board, blocked, length, generator)
+    apple = _get_random_apple(blocked, body, generator)
+    return (
+        [board.positions[cell] for cell in body],
+        direction,
+        board.positions[apple],
+    )
+
+
+@pytest.mark.parametrize('random_seed', [0, 2**31 - 5, 2**40])
+def test_round_trip(tmp_path, random_seed):
+    path = str(tmp_path / 'resets.pool')
+    board_size = (11, 9)
+    levels = list(generate_levels(board_size, 3, 1, density=0.15))
+    num_states = write_reset_pool(
+        path=path,
+        board_size=board_size,
+        levels=levels,
+        num_states=10,
+        random_seed=random_seed,
+        max_length=8,
+    )
+    assert num_states == 30
+
+    pool = ResetPool(path)
+    assert len(pool) == 30
+    assert pool.get_board_size() == board_size
+    assert pool.get_num_levels() == 3
+    game = SnakeGame(board_size, (), 0)
+    generator = random.Random(2)
+    for i in range(50):
+        index = pool.sample(generator)
+        pool.restore(game, index)
+
+        level = index // 10
+        seed = random_seed + index
+        body, direction, apple = get_source_state(
+            board_size, levels[level], seed, 8
+        )
+        assert frozenset(game.get_walls()) == levels[level]
+        assert list(game.get_snake()) == body
+        assert game.get_snake_velocity() == _VELOCITIES[direction]
+        assert game.get_apple() == apple
+        assert game.get_num_steps() == 0
+        assert game._generator.getstate() == random.Random(seed).getstate()
+    pool.close()
+
+
+def test_weights(tmp_path):
+    path = str(tmp_path / 'resets.pool')
+    write_reset_pool(path, (8, 8), [frozenset()]*4, num_states=5)
+    writer = ResetPool(path, writable=True)
+    pool = ResetPool(path)
+    generator = random.Random(3)
+    assert {pool.sample(generator) // 5 for i in range(200)} == {0, 1, 2, 3}
+
+    writer.set_weights([0, 0, 1, 0])
+    assert {pool.sample(generator) // 5 for i in range(50)} == {2}
+    assert pool.get_weights().tolist() == [0, 0, 1, 0]
+    for weights in ([0, 0, 0, 0], [1, -1, 1, 1], [1, 1, 1]):
+        with pytest.raises(ValueError):
+            writer.set_weights(weights)
+    writer.close()
+    pool.close()
+
+
+def test_errors(tmp_path):
+    path = str(tmp_path / 'resets.pool')
+    with pytest.raises(ValueError):
+        write_reset_pool(path, (8, 8), levels=[])
+    with pytest.raises(ValueError):
+        write_reset_pool(path, (8, 8), num_states=0)
+    with pytest.raises(ValueError):
+        write_reset_pool(path, (8, 8), num_states=10, random_seed=2**63-5)
+    with pytest.raises(ValueError):
+        write_reset_pool(path, (8, 8), random_seed=-2**63-1)
+    assert not os.path.exists(path)
+
+    # There is no room for a snake.
+    walls = [(x, y) for x in range(3) for y in range(3) if (x, y) != (0, 0)]
+    with pytest.raises(ValueError):
+        write_reset_pool(path, (3, 3), [walls])
+    with pytest.raises(ValueError):
+        ResetPool(path)
+
+    write_reset_pool(path, (8, 8), num_states=2)
+    pool = ResetPool(path)
+    with pytest.raises(ValueError):
+        pool.restore(SnakeGame((8, 9), (), 0), 0)
+    pool.close()